@@ -0,0 +1,103 @@
+import functools
+import importlib
+import re
+import zlib
+from openai import DefaultAsyncHttpxClient
+from .model_router import annotate_llm_span
+
+# DeepSeek reports prompt_cache_hit_tokens, OpenAI prompt_tokens_details.cached_tokens
+CACHE_HIT_RE = re.compile(rb'"(?:prompt_cache_hit_tokens|cached_tokens)"\s*:\s*(\d+)')
+# Response encodings the usage can be read through, with zlib's automatic gzip/zlib header detection
+SCANNED_ENCODINGS = {"identity": None, "gzip": zlib.MAX_WBITS | 32, "deflate": zlib.MAX_WBITS | 32}
+
+
+def record_cache_hits(data):
+    match = CACHE_HIT_RE.search(data)
+    if match is not None:
+        annotate_llm_span(prompt_cache_hit_tokens=int(match.group(1)))
+
+
+def reports_cache_hits(request):
+    """Whether the response of a request carries a usage, i.e. it creates a (chat) completion."""
+    return request.method == "POST" and request.url.path.endswith("/completions")
+
+
+@functools.lru_cache(maxsize=None)
+def transport_class(httpx):
+    """
+    The CacheHitTransport class over an httpx package: the SDK's client and its transports
+    must come from the same one, which is httpx or, in recent SDK releases, httpx2.
+    """
+    class CacheHitStream(httpx.AsyncByteStream):
+        """
+        Pass the bytes of a response through unchanged, recording the prompt cache hits of its usage line by line.
+        Compressed bodies are scanned through a decompressed copy; a body that does not decompress is no longer scanned.
+        """
+        def __init__(self, stream, encoding="identity"):
+            self.stream = stream
+            self.partial = b""
+            self.scanning = encoding in SCANNED_ENCODINGS
+            wbits = SCANNED_ENCODINGS.get(encoding)
+            self.decoder = zlib.decompressobj(wbits) if wbits else None
+
+        def scan(self, data):
+            # Whole lines only, so that a field split over two chunks is still found, and found once
+            lines = (self.partial + data).split(b"\n")
+            self.partial = lines.pop()
+            for line in lines:
+                record_cache_hits(line)
+
+        def decode(self, chunk):
+            try:
+                return self.decoder.decompress(chunk) if self.decoder is not None else chunk
+            except zlib.error:
+                self.scanning = False
+                return b""
+
+        async def __aiter__(self):
+            async for chunk in self.stream:
+                if self.scanning:
+                    self.scan(self.decode(chunk))
+                yield chunk
+            if self.scanning:
+                self.scan(self.decoder.flush() if self.decoder is not None else b"")
+                record_cache_hits(self.partial)
+            self.partial = b""
+
+        async def aclose(self):
+            await self.stream.aclose()
+
+    class CacheHitTransport(httpx.AsyncBaseTransport):
+        """
+        httpx transport of an OpenAI-compatible client that records the prompt cache hits the provider
+        reports on the 'llm' span of the call. autogen's RequestUsage drops them, so they are read from
+        the response bodies, streamed or not, as they pass through.
+        """
+        def __init__(self, transport=None):
+            self.transport = transport or httpx.AsyncHTTPTransport()
+
+        async def handle_async_request(self, request):
+            if not reports_cache_hits(request):
+                return await self.transport.handle_async_request(request)
+            # Still compressed, but only with the encodings that the usage can be read through
+            request.headers["Accept-Encoding"] = "gzip, deflate"
+            response = await self.transport.handle_async_request(request)
+            encoding = response.headers.get("Content-Encoding", "identity").strip().lower()
+            return httpx.Response(response.status_code, headers=response.headers, stream=CacheHitStream(response.stream, encoding),
+                                  extensions=response.extensions)
+
+        async def aclose(self):
+            await self.transport.aclose()
+
+    return CacheHitTransport
+
+
+def sdk_httpx():
+    """The httpx package the installed OpenAI SDK is built on."""
+    base = next(c for c in DefaultAsyncHttpxClient.__mro__[1:] if c.__name__ == "AsyncClient")
+    return importlib.import_module(base.__module__.split('.')[0])
+
+
+def cache_hit_http_client():
+    """The SDK's default httpx client, over a transport that records the prompt cache hits."""
+    return DefaultAsyncHttpxClient(transport=transport_class(sdk_httpx())())
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+from .file_writer import atomic_write
+from .workspace_io import hash_file
+
+
+def hash_path(workspace, rel_path):
+    """Content hash of a file, 'dir' for a directory and None if the path does not exist."""
+    full_path = os.path.join(workspace, rel_path)
+    if os.path.isdir(full_path):
+        return "dir"
+    try:
+        return hash_file(full_path)
+    except FileNotFoundError:
+        return None
+
+
+class RunCheckpoint:
+    """
+    Streaming log and checkpoint of the coding steps of a plan.
+
+    Every finished step is appended to run_log.jsonl as soon as it completes, and checkpoint.json
+    records the plan hash with the input and output hashes of the finished steps. On resume, a step
+    is skipped when its inputs are unchanged and its outputs are still on disk as written.
+    When steps start while the plan is still being generated, plan is None until set_plan().
+    Concurrent steps record from worker threads, so the log and the checkpoint are written under a lock.
+    """
+    def __init__(self, log_path, plan, resume=False):
+        self.log_path = log_path
+        self.run_log_path = os.path.join(log_path, 'run_log.jsonl')
+        self.checkpoint_path = os.path.join(log_path, 'checkpoint.json')
+        self.plan_hash = self.hash_plan(plan) if plan is not None else None
+        self.finished = {}
+        self.lock = threading.RLock()
+        if resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("plan_hash") == self.plan_hash:
+                self.finished = checkpoint.get("finished", {})
+        self.save()
+
+    def hash_plan(self, plan):
+        return hashlib.sha256(json.dumps(plan, sort_keys=True).encode()).hexdigest()
+
+    def set_plan(self, plan):
+        """Record the hash of a plan that was completed after the run started."""
+        self.plan_hash = self.hash_plan(plan)
+        self.save()
+
+    def save(self):
+        with self.lock:
+            atomic_write(self.checkpoint_path, json.dumps({"plan_hash": self.plan_hash, "finished": self.finished}, indent=4))
+
+    def log(self, event, **record):
+        """Append one record to run_log.jsonl and flush it to disk."""
+        line = json.dumps(dict(event=event, plan_hash=self.plan_hash, **record)) + '\n'
+        with self.lock, open(self.run_log_path, 'a') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def hash_inputs(self, workspace, coding_step):
+        return {f: hash_path(workspace, f) for f in coding_step.get('dependencies', [])}
+
+    def is_done(self, workspace, coding_step):
+        entry = self.finished.get(str(coding_step['step']))
+        if entry is None:
+            return False
+        # Inputs and outputs may since have been rewritten by this or another finished step, which is expected
+        written = {}
+        with self.lock:
+            finished_steps = list(self.finished.values())
+        for finished in finished_steps:
+            for f, h in finished["outputs"].items():
+                written.setdefault(f, set()).add(h)
+        if any(hash_path(workspace, f) not in written[f] for f in entry["outputs"]):
+            return False
+        current = self.hash_inputs(workspace, coding_step)
+        return all(h == entry["inputs"].get(f) or h in written.get(f, ()) for f, h in current.items())
+
+    def output(self, coding_step):
+        return self.finished[str(coding_step['step'])]["execution_output"]
+
+    def record(self, workspace, coding_step, inputs, execution_output, done=True):
+        """Log a finished step and, if it is done, mark it as done in the checkpoint."""
+        outputs = {f: hash_path(workspace, f) for f in execution_output.get("saved_paths", [])}
+        self.log("step", step=coding_step['step'], execution_output=execution_output)
+        if not done:
+            return
+        with self.lock:
+            self.finished[str(coding_step['step'])] = {"inputs": inputs, "outputs": outputs, "execution_output": execution_output}
+            self.save()
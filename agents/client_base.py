@@ -0,0 +1,39 @@
+from autogen_core.models import ChatCompletionClient
+
+
+class ChatCompletionClientWrapper(ChatCompletionClient):
+    """
+    A ChatCompletionClient that forwards everything to a wrapped client.
+    Subclasses override create/create_stream to add behavior around model calls.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    async def create(self, messages, **kwargs):
+        return await self.client.create(messages, **kwargs)
+
+    def create_stream(self, messages, **kwargs):
+        return self.client.create_stream(messages, **kwargs)
+
+    async def close(self):
+        await self.client.close()
+
+    def actual_usage(self):
+        return self.client.actual_usage()
+
+    def total_usage(self):
+        return self.client.total_usage()
+
+    def count_tokens(self, messages, **kwargs):
+        return self.client.count_tokens(messages, **kwargs)
+
+    def remaining_tokens(self, messages, **kwargs):
+        return self.client.remaining_tokens(messages, **kwargs)
+
+    @property
+    def capabilities(self):
+        return self.client.capabilities
+
+    @property
+    def model_info(self):
+        return self.client.model_info
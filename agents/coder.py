@@ -3,10 +3,26 @@ import os
 from .common_agents import FileSystemAgent
 from .utils import print_colored
 from autogen_agentchat.ui import Console
+from .scheduler import run_steps_streaming
+from .file_writer import CODE_BLOCK_RE, SHELL_LANGUAGES, atomic_write, parse_code_output, resolve_in_workspace, write_code_output
+from .patching import PatchError, apply_edits, parse_edits, strip_edits
+from .symbol_index import SymbolIndex
+from .context_packer import ContextPacker
+from .tracing import tracer
+from .model_router import model_role
+from .checkpoint import RunCheckpoint
+from .workspace_io import WorkspaceIO
+from .verify import Verifier
+from .snapshots import SnapshotStore
+import asyncio
+import datetime
+import functools
 import json
+from collections import Counter
 
 class CoderAgent(AssistantAgent):
-    def __init__(self, name, model_client, tools, reflect_on_tool_use=True, workspace='./executions/test/', log_dir='ca_logs'):
+    def __init__(self, name, model_client, tools, reflect_on_tool_use=True, workspace='./executions/test/', log_dir='ca_logs', max_concurrency=1, context_budget=24000, edit_mode='full',
+                 verify=True, test_command=None, max_repairs=1, snapshots=True, keep_snapshots=50):
         super().__init__(
             name=name, model_client=model_client, tools=tools, reflect_on_tool_use=reflect_on_tool_use)
         """
@@ -15,17 +31,78 @@ class CoderAgent(AssistantAgent):
             1. Read the specified dependencies (files).
             2. Modify or create code as described.
             3. Save the modified code to the specified path.
+        Steps that do not depend on each other run concurrently, up to max_concurrency at a time.
+        Every step starts from an empty model context, and the dependencies of a step are packed into context_budget tokens.
+        The prompts start with the parts shared by the steps (mission goal, instructions, definitions) so that
+        the provider can serve them from its prompt prefix cache.
+        With edit_mode='diff', existing files are changed through SEARCH/REPLACE blocks or unified diffs
+        that are applied locally, falling back to full files when they do not apply.
+        With verify=True, the Python files saved by a step are compiled and their imports of workspace modules
+        resolved (see agents.verify.Verifier), and test_command is run once no other step is outstanding.
+        A step that fails verification gets up to max_repairs repair turns with the problems found.
+        While the plan is still being generated, imports that do not resolve may be of modules that later
+        steps create, so a step with such imports waits for the complete plan before they are reported.
+        With snapshots=True, the files a step is about to write are recorded in its snapshot first
+        (see agents.snapshots.SnapshotStore): a step that raises is rolled back, and any step of the last
+        keep_snapshots can be rolled back later.
         """
         self.workspace = workspace
         self.log_dir = log_dir
+        assert edit_mode in ('full', 'diff'), f"Unknown edit mode {edit_mode}, expected 'full' or 'diff'."
+        self.edit_mode = edit_mode
+        self.max_concurrency = max_concurrency
+        self.worker_kwargs = dict(model_client=model_client, tools=tools, reflect_on_tool_use=reflect_on_tool_use)
+        self.definitions_lock = asyncio.Lock()
+        self.context_packer = ContextPacker(self.workspace, budget_tokens=context_budget)
+        self.symbol_index = SymbolIndex(self.workspace, os.path.join(self.workspace, self.log_dir, 'symbol_index.json'))
+        self.io = WorkspaceIO(self.workspace)
+        self.verifier = Verifier(self.workspace, os.path.join(self.workspace, self.log_dir, 'verify_cache.json'), test_command=test_command) if verify else None
+        self.max_repairs = max_repairs
+        self.snapshots = SnapshotStore(self.workspace, os.path.join(self.workspace, self.log_dir, 'snapshots'), keep=keep_snapshots) if snapshots else None
+        self.run_id = None
+        # Save paths of the steps that are scheduled but not finished, and whether every step of the plan is known
+        self.pending_paths = Counter()
+        self.plan_complete = False
+        # Set once no more steps will arrive, whether or not the plan is complete
+        self.plan_done = asyncio.Event()
+        # Stable parts first and step-specific parts last, so that steps share the longest prompt prefix
         self.step1_prompt = f"""
             The mission goal is: MISSION_GOAL
-            Now you need to modify or create code files or directories as described in MODIFICATION.
-            The files you may need to read are: DEPENDENCIES
-            Any extra information: EXTRA_INFO
+            Now you need to modify or create code files or directories as described in the modification below.
             1. Give your final full code files, DO NOT use ANY ellipsis! Write the simplest code that can achieve the goal, do not add any unnecessary code.
             Return the combined code if you are asked to add some code to existing files.
             Or 2. give the information of directories to create.
+            The classes, functions and files implemented so far are: EXTRA_DEFINITIONS
+            The files you may need to read are: DEPENDENCIES
+            The modification is: MODIFICATION
+            Any extra information: EXTRA_INFO
+            """
+        self.step1_diff_prompt = f"""
+            The mission goal is: MISSION_GOAL
+            Now you need to modify or create code files or directories as described in the modification below.
+            1. To change an existing file, return ONLY the changes as SEARCH/REPLACE blocks, one block per change:
+            path/to/file.py
+            <<<<<<< SEARCH
+            the exact current lines to replace, with enough context to be unique
+            =======
+            the new lines
+            >>>>>>> REPLACE
+            Or 2. to create a new file, give its full code in a fenced code block with its path on the line above, DO NOT use ANY ellipsis!
+            Or 3. give the information of directories to create.
+            Write the simplest code that can achieve the goal, do not add any unnecessary code.
+            The classes, functions and files implemented so far are: EXTRA_DEFINITIONS
+            The files you may need to read are: DEPENDENCIES
+            The modification is: MODIFICATION
+            Any extra information: EXTRA_INFO
+            """
+        self.full_file_retry_prompt = f"""
+            Your edits could not be applied to the current files: PATCH_ERROR
+            Give your final full code files instead, DO NOT use ANY ellipsis!
+            """
+        self.repair_prompt = f"""
+            The code you saved does not pass verification:
+            PROBLEMS
+            Fix only these problems. Give the final full code of every file you change, DO NOT use ANY ellipsis!
             """
         self.save_code_prompt = f"""
             The given code is in the following message: \nBEGIN MODIFIED_CODE \n TERMINATE
@@ -87,87 +164,289 @@ class CoderAgent(AssistantAgent):
             }}
             ```
             """
-        self.save_extra_definition_prompt = f"""
-            The current definitions are: EXTRA_DEFINITIONS
-            The extra definitions are: \nBEGIN MODIFIED_CODE\n TERMINATE
-            Now merge these definitions as a whole and save to the specified path: SAVE_PATH under root: SAVE_ROOT (already created).
-            The directory is already created, you just need to save the code to the specified file.
-            """
-        self.save_code_agent = FileSystemAgent(
-            name="save_code_agent",
-            model_client=model_client,
+        os.makedirs(os.path.join(self.workspace, self.log_dir), exist_ok=True)
+
+    def step_agents(self, step_idx):
+        """
+        Return new (coder, saver) agents for a step. Their model contexts only hold the turns of the step,
+        so the prompts and full-file outputs of earlier steps are not sent again with every later step,
+        and concurrent steps do not interleave. Earlier steps reach the prompt through the definitions.
+        """
+        coder = AssistantAgent(name=f"{self.name}_step_{step_idx}", **self.worker_kwargs)
+        saver = FileSystemAgent(
+            name=f"save_code_agent_step_{step_idx}",
+            model_client=self.worker_kwargs['model_client'],
             workspace=self.workspace,
             system_message=f"""Save the code to the specified path under specified root directory."""
         )
-        os.makedirs(os.path.join(self.workspace, self.log_dir), exist_ok=True)
+        return coder, saver
 
-    async def run(self, mission_goal, stream_output=False):
-        plan = json.load(open(os.path.join(self.workspace, self.log_dir, 'plan.json'), 'r'))
-        coding_steps = plan['plan']
-        execution_outputs = []
+    async def run(self, mission_goal, stream_output=False, resume=False, plan_steps=None):
+        """
+        Code every step of the plan. Finished steps are streamed to the run log as they complete;
+        with resume=True, steps already finished by a previous run of the same plan are skipped.
+        plan_steps is an optional async iterator of the steps as the planner generates them, followed by
+        the complete plan ({"plan": [...]}) if planning succeeds: each step is scheduled on arrival, and
+        the plan is only marked complete and recorded in the checkpoint once the complete plan arrives.
+        """
+        plan_path = os.path.join(self.log_dir, 'plan.json')
         extra_definition_file = "extra_definitions.json"
-        if not os.path.exists(os.path.join(self.workspace, self.log_dir, extra_definition_file)):
-            with open(os.path.join(self.workspace, self.log_dir, extra_definition_file), 'w') as f:
-                json.dump({"classes": [], "functions": [], "files": []}, f, indent=4)
-        # Get file structure for context
-        for coding_step in coding_steps:
-            step_idx = coding_step['step']
-            dependencies = coding_step.get('dependencies', [])
-            modification = coding_step['modification']
-            save_path = coding_step['save_path']
-            extra_info = coding_step.get('extra_info', {})
-
-            print_colored("#"*50+f"[Coder] Step {step_idx}"+"#"*50+" Settings", "blue")
-            print_colored("Target:", "blue"); print_colored(str(modification), "green")
-            print_colored("Dependencies:", "blue"); print_colored(str(dependencies), "green")
-            print_colored("Save Path:", "blue"); print_colored(str(save_path), "green")
-            print_colored("Extra Info:", "blue"); print_colored(str(extra_info), "green")
-            print_colored("#"*120)
-
-            # Read dependencies
-            dependencies_content = {
-                f: open(os.path.join(self.workspace, f), 'r').read()
-                if os.path.exists(os.path.join(self.workspace, f)) else f"{f} Not found"
-                for f in dependencies
-            }
-            dependencies_str = json.dumps(dependencies_content, indent=2)
-
-            coding_prompt = self.step1_prompt \
-                .replace('MISSION_GOAL', mission_goal) \
-                .replace('MODIFICATION', modification) \
-                .replace('DEPENDENCIES', dependencies_str) \
-                .replace('EXTRA_INFO', str(extra_info)) \
-                .replace('EXTRA_DEFINITIONS', open(os.path.join(self.workspace, self.log_dir, extra_definition_file), 'r').read())
-
-            print_colored(f"[Coder] Coding ...", "yellow")
-            coding_output = await Console(self.run_stream(task=coding_prompt)) if stream_output else await super().run(task=coding_prompt)
-            modified_code_info = coding_output.messages[-1].content
+        self.run_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.plan_complete, self.plan_done = False, asyncio.Event()
+        # Pick up files edited since the last run before writing the definitions the coder starts from
+        await self.io.run(self.symbol_index.update, list(self.symbol_index.entries))
+        await self.write_definitions(extra_definition_file)
+
+        if plan_steps is None:
+            plan = await self.io.read_json(plan_path)
+            checkpoint = await self.io.run(RunCheckpoint, os.path.join(self.workspace, self.log_dir), plan, resume=resume)
+
+            async def coding_steps():
+                self.plan_complete = True
+                self.plan_done.set()
+                for coding_step in plan['plan']:
+                    self.pending_paths[os.path.normpath(coding_step['save_path'])] += 1
+                    yield coding_step
+        else:
+            checkpoint = await self.io.run(RunCheckpoint, os.path.join(self.workspace, self.log_dir), None)
+
+            async def coding_steps():
+                plan = None
+                try:
+                    async for item in plan_steps:
+                        if isinstance(item.get('plan'), list):
+                            plan = item
+                            continue
+                        self.pending_paths[os.path.normpath(item['save_path'])] += 1
+                        yield item
+                finally:
+                    # Also wakes the steps waiting for the rest of the plan when planning fails
+                    self.plan_complete = plan is not None
+                    self.plan_done.set()
+                if plan is None:
+                    # Planning failed: plan.json may still hold the plan of an earlier run, which these steps are not part of
+                    print_colored("[Coder] The plan is incomplete, only the steps generated so far are coded.", "red")
+                    return
+                # The plan is complete, so a later run can resume from it
+                await self.io.run(checkpoint.set_plan, plan)
+
+        async def run_step(coding_step):
+            try:
+                if resume and await self.io.run(checkpoint.is_done, self.workspace, coding_step):
+                    print_colored(f"[Coder] Step {coding_step['step']} already done with unchanged inputs, skipping.", "yellow")
+                    return checkpoint.output(coding_step)
+                inputs = await self.io.run(checkpoint.hash_inputs, self.workspace, coding_step)
+                try:
+                    execution_output = await self.run_step(coding_step, mission_goal, extra_definition_file, stream_output)
+                except Exception:
+                    # Undo what the failed step wrote, so that a resumed run starts it again from the files before it
+                    await self.rollback_step(coding_step['step'])
+                    raise
+                # A step that still fails verification is logged, but not skipped by a resumed run
+                verified = execution_output.get("verification", {}).get("ok", True)
+                await self.io.run(checkpoint.record, self.workspace, coding_step, inputs, execution_output, verified)
+                return execution_output
+            finally:
+                self.pending_paths[os.path.normpath(coding_step['save_path'])] -= 1
+                if self.snapshots is not None:
+                    await self.io.run(self.snapshots.finish, self.snapshot_id(coding_step['step']))
+
+        try:
+            execution_outputs = await run_steps_streaming(coding_steps(), run_step, max_concurrency=self.max_concurrency)
+        finally:
+            if self.verifier is not None:
+                self.verifier.close()
+            if self.snapshots is not None:
+                await self.io.run(self.snapshots.gc)
+        print_colored(f"[Coder] All coding steps completed. {len(execution_outputs)} steps executed.", "green")
+        return execution_outputs
+
+    def snapshot_id(self, step_idx):
+        return f"{self.run_id}/step-{step_idx}"
+
+    def record_snapshot(self, step_idx, rel_paths, link=None):
+        """Record the files a step is about to write in the snapshot of the step."""
+        if self.snapshots is not None:
+            self.snapshots.record(self.snapshot_id(step_idx), rel_paths, run=self.run_id, step=step_idx, link=link)
+
+    async def rollback_step(self, step_idx):
+        """Restore the files written by a step of this run, except the ones that later steps also wrote."""
+        if self.snapshots is None or not any(s["id"] == self.snapshot_id(step_idx) for s in self.snapshots.snapshots):
+            return None
+        result = await self.io.run(self.snapshots.rollback, self.snapshot_id(step_idx), False)
+        self.io.invalidate(result["restored"])
+        print_colored(f"[Coder] Rolled back step {step_idx}: restored {result['restored']}" + (f", left {result['skipped']} written by later steps" if result["skipped"] else ""), "yellow")
+        return result
+
+    async def write_definitions(self, extra_definition_file):
+        """Write the indexed definitions; they stay in the read cache, so steps do not re-read them from disk."""
+        definitions = await self.io.run(self.symbol_index.definitions)
+        await self.io.write_json(os.path.join(self.log_dir, extra_definition_file), definitions, indent=4)
+
+    async def run_step(self, coding_step, mission_goal, extra_definition_file, stream_output=False):
+        with tracer.span("coder: step", "step", step=coding_step['step']), model_role("code"):
+            return await self.code_step(coding_step, mission_goal, extra_definition_file, stream_output)
+
+    async def code_step(self, coding_step, mission_goal, extra_definition_file, stream_output=False):
+        step_idx = coding_step['step']
+        dependencies = coding_step.get('dependencies', [])
+        modification = coding_step['modification']
+        save_path = coding_step['save_path']
+        extra_info = coding_step.get('extra_info', {})
+        coder, save_code_agent = self.step_agents(step_idx)
+
+        print_colored("#"*50+f"[Coder] Step {step_idx}"+"#"*50+" Settings", "blue")
+        print_colored("Target:", "blue"); print_colored(str(modification), "green")
+        print_colored("Dependencies:", "blue"); print_colored(str(dependencies), "green")
+        print_colored("Save Path:", "blue"); print_colored(str(save_path), "green")
+        print_colored("Extra Info:", "blue"); print_colored(str(extra_info), "green")
+        print_colored("#"*120)
+
+        # Read dependencies, reduced to the relevant symbols when they do not fit the budget
+        dependencies_content = await self.io.run(self.context_packer.pack, dependencies, modification, keep_full=[save_path])
+        dependencies_str = json.dumps(dependencies_content, indent=2)
+
+        coding_prompt = (self.step1_diff_prompt if self.edit_mode == 'diff' else self.step1_prompt) \
+            .replace('MISSION_GOAL', mission_goal) \
+            .replace('MODIFICATION', modification) \
+            .replace('DEPENDENCIES', dependencies_str) \
+            .replace('EXTRA_INFO', str(extra_info)) \
+            .replace('EXTRA_DEFINITIONS', await self.io.read_text(os.path.join(self.log_dir, extra_definition_file)))
+
+        print_colored(f"[Coder] Coding step {step_idx} ...", "yellow")
+        coding_output = await Console(coder.run_stream(task=coding_prompt)) if stream_output else await coder.run(task=coding_prompt)
+        coding_output, saved_paths, applied_as, save_output = await self.save_step_output(
+            coding_output, step_idx, save_path, extra_info, coder, save_code_agent, stream_output)
+
+        verification, repairs = await self.verify_step(coding_step, saved_paths), 0
+        while verification is not None and not verification["ok"] and repairs < self.max_repairs:
+            repairs += 1
+            print_colored(f"[Coder] Step {step_idx} does not pass verification, repair turn {repairs}/{self.max_repairs}:", "yellow")
+            print_colored("\n".join(verification["problems"]), "red")
+            repair_prompt = self.repair_prompt.replace('PROBLEMS', "\n".join(verification["problems"]))
+            coding_output = await Console(coder.run_stream(task=repair_prompt)) if stream_output else await coder.run(task=repair_prompt)
+            coding_output, repaired_paths, applied_as, save_output = await self.save_step_output(
+                coding_output, step_idx, save_path, extra_info, coder, save_code_agent, stream_output)
+            saved_paths = saved_paths + [p for p in repaired_paths if p not in saved_paths]
+            verification = await self.verify_step(coding_step, saved_paths)
+        if verification is not None:
+            verification["repairs"] = repairs
+            print_colored(f"[Coder] Step {step_idx} verification: " + ("passed" if verification["ok"] else "failed"), "green" if verification["ok"] else "red")
+            if verification["provisional"]:
+                print_colored(f"[Coder] Imports of step {step_idx} left unchecked, the plan is incomplete:\n" + "\n".join(verification["provisional"]), "yellow")
+        modified_code_info = coding_output.messages[-1].content
 
+        # Only the files saved in this step are re-parsed, the rest of the index is reused.
+        print_colored(f"[Coder] Updating extra definitions in {os.path.join(self.workspace, self.log_dir, extra_definition_file)} ...", "yellow")
+        async with self.definitions_lock:
+            await self.io.run(self.symbol_index.update, saved_paths)
+            await self.write_definitions(extra_definition_file)
+        execution_output = {
+            "step": step_idx,
+            "modified_code_info": modified_code_info,
+            "save_path": save_path,
+            "extra_info": extra_info,
+            "coding_output": coding_output.messages[-1].content,
+            "saved_paths": saved_paths,
+            "applied_as": applied_as,
+            "save_output": save_output,
+            "verification": verification,
+            "snapshot": self.snapshot_id(step_idx) if self.snapshots is not None else None
+        }
+        print_colored("[Coder]" + json.dumps(execution_output, indent=4), "green")
+        print_colored(f"[Coder] Step {step_idx} completed.", "yellow")
+        return execution_output
+
+    async def save_step_output(self, coding_output, step_idx, save_path, extra_info, coder, save_code_agent, stream_output=False):
+        """
+        Save the code of a coder output: edits are applied locally (asking for full files when they do not apply),
+        full files are written locally, and anything else is handed to the save agent.
+
+        Returns:
+            tuple: (the final coding output, saved paths, how the output was applied, save message)
+        """
+        modified_code_info = coding_output.messages[-1].content
+        print_colored(f"[Coder] Saving code to {os.path.join(self.workspace, save_path)} ...", "yellow")
+        saved_paths, applied_as = None, "full"
+        before_write = functools.partial(self.record_snapshot, step_idx)
+        if self.edit_mode == 'diff':
+            try:
+                saved_paths = await self.io.run(self.save_edits, modified_code_info, save_path, extra_info, before_write)
+                applied_as = "diff" if saved_paths is not None else "full"
+            except PatchError as e:
+                print_colored(f"[Coder] Edits of step {step_idx} do not apply ({e}), asking for full files ...", "yellow")
+                retry_prompt = self.full_file_retry_prompt.replace('PATCH_ERROR', str(e))
+                coding_output = await Console(coder.run_stream(task=retry_prompt)) if stream_output else await coder.run(task=retry_prompt)
+                modified_code_info = coding_output.messages[-1].content
+                applied_as = "full (diff fallback)"
+        if saved_paths is None:
+            saved_paths = await self.io.run(write_code_output, self.workspace, modified_code_info, save_path, extra_info, before_write)
+        if saved_paths is not None:
+            save_output = f"Saved {saved_paths} locally."
+        else:
+            print_colored(f"[Coder] Could not parse the code of step {step_idx}, saving through {save_code_agent.name} ...", "yellow")
             save_code_prompt = self.save_code_prompt \
                 .replace('MODIFIED_CODE', modified_code_info) \
                 .replace('SAVE_PATH', save_path) \
                 .replace('SAVE_ROOT', self.workspace)
+            # The save agent may write in place, so the snapshot gets a copy rather than a link
+            await self.io.run(self.record_snapshot, step_idx, [save_path], False)
+            with model_role("save"):
+                save_code_output = await Console(save_code_agent.run_stream(task=save_code_prompt)) if stream_output else await save_code_agent.run(task=save_code_prompt)
+            save_output = save_code_output.messages[-1].content
+            saved_paths = [save_path]
+        self.io.invalidate(saved_paths)
+        return coding_output, saved_paths, applied_as, save_output
 
-            print_colored(f"[Coder] Saving code to {os.path.join(self.workspace, save_path)} ...", "yellow")
-            extra_definition_output = await Console(self.save_code_agent.run_stream(task=save_code_prompt)) if stream_output else await self.save_code_agent.run(task=save_code_prompt)
-            save_definition_prompt = self.save_extra_definition_prompt \
-                .replace('EXTRA_DEFINITIONS', open(os.path.join(self.workspace, self.log_dir, extra_definition_file), 'r').read()) \
-                .replace('MODIFIED_CODE', extra_definition_output.messages[-1].content) \
-                .replace('SAVE_PATH', extra_definition_file) \
-                .replace('SAVE_ROOT', os.path.join(self.workspace, self.log_dir))
-
-            print_colored(f"[Coder] Saving extra definitions to {os.path.join(self.workspace, self.log_dir, extra_definition_file)} ...", "yellow")
-            save_extra_difinition_output = await Console(self.save_code_agent.run_stream(task=save_definition_prompt)) if stream_output else await self.save_code_agent.run(task=save_definition_prompt)
-            execution_outputs.append({
-                "step": step_idx,
-                "modified_code_info": modified_code_info,
-                "save_path": save_path,
-                "extra_info": extra_info,
-                "coding_output": coding_output.messages[-1].content,
-                "extra_definition_output": extra_definition_output.messages[-1].content,
-                "save_extra_difinition_output": save_extra_difinition_output.messages[-1].content
-            })
-            print_colored("[Coder]" + json.dumps(execution_outputs[-1], indent=4), "green")
-            print_colored(f"[Coder] Step {step_idx} completed.", "yellow")
-        print_colored(f"[Coder] All coding steps completed. {len(execution_outputs)} steps executed.", "green")
-        return execution_outputs
\ No newline at end of file
+    async def verify_step(self, coding_step, saved_paths):
+        """
+        Verify the files saved by a step, or return None without a verifier.
+        Imports that do not resolve before the plan is complete are provisional: the step waits for the rest of
+        the plan and is verified again, so a module that a later step creates does not cost a repair turn.
+        """
+        if self.verifier is None:
+            return None
+        pending = self.pending_paths.copy()
+        pending[os.path.normpath(coding_step['save_path'])] -= 1
+        pending = {p for p, count in pending.items() if count > 0}
+        with tracer.span("coder: verify", "stage", step=coding_step['step']):
+            # Tests only run once the plan is known and no other step is outstanding, earlier failures may be steps not coded yet
+            verification = await self.verifier.verify(saved_paths, pending=pending, run_tests=self.plan_complete and not pending,
+                                                      provisional_imports=not self.plan_complete)
+        if verification["provisional"] and not self.plan_done.is_set():
+            print_colored(f"[Coder] Step {coding_step['step']} waits for the rest of the plan before reporting its imports:", "yellow")
+            print_colored("\n".join(verification["provisional"]), "yellow")
+            await self.plan_done.wait()
+            return await self.verify_step(coding_step, saved_paths)
+        return verification
+
+    def save_edits(self, output, save_path, extra_info, before_write=None):
+        """
+        Apply the SEARCH/REPLACE blocks and diffs of a coder output, then write the full files next to them.
+        All edits are validated before anything is written, and before_write is called with the paths to write.
+        Raises PatchError if the edits do not apply or a full file cannot be mapped to its path.
+
+        Returns:
+            list or None: The saved paths, or None if the output holds no edits.
+        """
+        edits = parse_edits(output, save_path)
+        if not edits:
+            return None
+        patched = apply_edits(self.workspace, edits)
+        rest = strip_edits(output)
+        parsed = parse_code_output(rest, save_path, extra_info, require_paths=True) if CODE_BLOCK_RE.search(rest) else None
+        if parsed is None and any(b.group(1).strip().split(':')[0].lower() not in SHELL_LANGUAGES for b in CODE_BLOCK_RE.finditer(rest)):
+            # A full file next to the edits that cannot be mapped to its path must not be dropped
+            raise PatchError("The code blocks next to the edits do not name their file paths.")
+        files, directories = parsed if parsed is not None else ({}, [])
+        contents = list(patched.items()) + [(p, c) for p, c in files.items() if p not in patched]
+        for rel_path, _ in contents:
+            if resolve_in_workspace(self.workspace, rel_path) is None:
+                raise PatchError(f"{rel_path} is outside of the workspace.")
+        if before_write is not None:
+            before_write([p for p, _ in contents] + directories)
+        for rel_path in directories:
+            os.makedirs(resolve_in_workspace(self.workspace, rel_path), exist_ok=True)
+        for rel_path, content in contents:
+            atomic_write(resolve_in_workspace(self.workspace, rel_path), content)
+        return list(patched) + [p for p in files if p not in patched] + directories
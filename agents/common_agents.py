@@ -1,20 +1,24 @@
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.tools.mcp import McpWorkbench, StdioServerParams
+from .mcp_pool import workbench_pool
 
 class FileSystemAgent(AssistantAgent):
-    def __init__(self, name, model_client, workspace='./executions/test/', system_message=None):
-        filesys_mcp_server = StdioServerParams(
-            command="npx",
-            args=["@modelcontextprotocol/server-filesystem", workspace], read_timeout_seconds=60,
-        )
+    def __init__(self, name, model_client, workspace='./executions/test/', system_message=None, pool=None):
+        # The filesystem MCP server of a workspace is shared with the other agents through the pool
+        self.pool = pool or workbench_pool
         super().__init__(
             name=name,
             model_client=model_client,
-            workbench=McpWorkbench(filesys_mcp_server),
+            workbench=self.pool.get(workspace),
             reflect_on_tool_use=True,
             system_message=system_message or """Save files as requested. Use the correct function provided in workbench."""
         )
         self.workspace = workspace
 
-    async def run(self, task):
-        return await super().run(task=task)
\ No newline at end of file
+    async def run(self, task, cancellation_token=None):
+        await self.pool.ready(self.workspace)
+        return await super().run(task=task, cancellation_token=cancellation_token)
+
+    async def run_stream(self, task, cancellation_token=None):
+        await self.pool.ready(self.workspace)
+        async for message in super().run_stream(task=task, cancellation_token=cancellation_token):
+            yield message
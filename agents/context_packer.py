@@ -0,0 +1,198 @@
+import ast
+import hashlib
+import os
+import re
+from .tracing import tracer
+
+ENCODING = None
+ENCODING_LOADED = False
+
+OUTLINE_NOTE = "# NOTE: outline only, the bodies of symbols not mentioned in the modification are omitted.\n"
+TRUNCATED_NOTE = "\n# NOTE: truncated to fit the context budget.\n"
+
+
+def get_encoding():
+    """Load the tiktoken encoding on first use, it may have to be read or downloaded."""
+    global ENCODING, ENCODING_LOADED
+    if not ENCODING_LOADED:
+        ENCODING_LOADED = True
+        try:
+            import tiktoken
+            ENCODING = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # tiktoken is optional, fall back to an estimate
+            ENCODING = None
+    return ENCODING
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when it is installed, otherwise estimate ~4 characters per token."""
+    if get_encoding() is not None:
+        return len(ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def node_start(node):
+    decorators = getattr(node, 'decorator_list', [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def signature_lines(node, lines):
+    """The decorators, def/class line(s) and docstring of a node, followed by '...'."""
+    body_start = node.body[0].lineno
+    first = node.body[0]
+    if isinstance(first, ast.Expr) and isinstance(getattr(first, 'value', None), ast.Constant) and isinstance(first.value.value, str):
+        # Keep the docstring with the signature
+        header = lines[node_start(node) - 1:first.end_lineno]
+    else:
+        header = lines[node_start(node) - 1:body_start - 1] or lines[node_start(node) - 1:node_start(node)]
+    indent = re.match(r"\s*", lines[body_start - 1]).group(0) if body_start > node.lineno else " " * (node.col_offset + 4)
+    return header + [f"{indent}...\n"]
+
+
+def outline_source(source, keep_names):
+    """
+    Reduce a Python module to its imports, short constants, and signatures, keeping the full
+    source of the classes and functions named in keep_names.
+
+    Returns:
+        str or None: The outline, or None if the source cannot be parsed.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    lines = source.splitlines(keepends=True)
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += '\n'
+    pieces = []
+    for node in tree.body:
+        full = lines[node_start(node) - 1:node.end_lineno]
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            pieces += full
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            if len(full) <= 3:
+                pieces += full
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            pieces += full if node.name in keep_names else signature_lines(node, lines)
+        elif isinstance(node, ast.ClassDef):
+            if node.name in keep_names:
+                pieces += full
+                continue
+            members = [item for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            first_member = min([node_start(item) for item in members] + [node.end_lineno + 1])
+            # Class header, docstring and class attributes up to the first method
+            pieces += lines[node_start(node) - 1:first_member - 1]
+            for item in members:
+                item_lines = lines[node_start(item) - 1:item.end_lineno]
+                pieces += item_lines if item.name in keep_names else signature_lines(item, lines)
+        elif isinstance(node, ast.Expr) and node is tree.body[0]:
+            pieces += full  # module docstring
+    return OUTLINE_NOTE + ''.join(pieces)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Keep the leading lines of text that fit in max_tokens."""
+    kept, used = [], count_tokens(TRUNCATED_NOTE)
+    for line in text.splitlines(keepends=True):
+        used += count_tokens(line)
+        if used > max_tokens:
+            break
+        kept.append(line)
+    return ''.join(kept) + TRUNCATED_NOTE
+
+
+class ContextPacker:
+    """
+    Fit the dependency files of a step into a token budget. Files that do not fit are reduced to the
+    symbols the modification mentions plus the signatures of everything else. File contents, token
+    counts and outlines are cached in memory by content hash for the rest of the run.
+    """
+    def __init__(self, workspace, budget_tokens=24000):
+        self.workspace = workspace
+        self.budget_tokens = budget_tokens
+        self.stat_hashes = {}
+        self.contents = {}
+
+    def read(self, rel_path):
+        """
+        Read a file through the cache.
+
+        Returns:
+            str or None: The content hash, or None if the file does not exist.
+        """
+        full_path = os.path.join(self.workspace, rel_path)
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
+            return None
+        stat_key = (full_path, stat.st_mtime_ns, stat.st_size)
+        digest = self.stat_hashes.get(stat_key)
+        if digest is None:
+            with tracer.span("read", "io", path=rel_path, bytes=stat.st_size):
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+            digest = hashlib.sha1(data).hexdigest()
+            if digest not in self.contents:
+                text = data.decode('utf-8', errors='replace')
+                self.contents[digest] = {"text": text, "tokens": count_tokens(text), "outlines": {}}
+            # Published last, packs running in other threads only see hashes whose content is cached
+            self.stat_hashes[stat_key] = digest
+        return digest
+
+    def outline(self, rel_path, digest, keep_names):
+        entry = self.contents[digest]
+        key = tuple(sorted(keep_names & set(re.findall(r"\w+", entry["text"]))))
+        if key not in entry["outlines"]:
+            text = outline_source(entry["text"], set(key)) if rel_path.endswith('.py') else None
+            entry["outlines"][key] = (text, count_tokens(text) if text is not None else None)
+        return entry["outlines"][key]
+
+    def pack(self, dependencies, modification, keep_full=()):
+        """
+        Build the {path: content} mapping of the dependencies of a step within the token budget.
+
+        Args:
+            dependencies (list): Paths relative to the workspace.
+            modification (str): The modification of the step, used to pick the relevant symbols.
+            keep_full (list): Paths that must never be reduced, e.g. the file the step rewrites.
+
+        Returns:
+            dict: Maps each dependency to its content, outline, or a 'Not found' note.
+        """
+        keep_names = set(re.findall(r"[A-Za-z_]\w*", modification))
+        keep_full = {os.path.normpath(p) for p in keep_full}
+        packed, tokens, digests = {}, {}, {}
+        for f in dependencies:
+            full_path = os.path.join(self.workspace, f)
+            if os.path.isdir(full_path):
+                packed[f] = "Directory containing: " + ", ".join(sorted(os.listdir(full_path)))
+            else:
+                digest = self.read(f)
+                if digest is None:
+                    packed[f] = f"{f} Not found"
+                else:
+                    digests[f] = digest
+                    packed[f] = self.contents[digest]["text"]
+            tokens[f] = count_tokens(packed[f])
+
+        # Reduce the largest reducible files first until everything fits
+        over = sum(tokens.values()) - self.budget_tokens
+        for f in sorted(digests, key=lambda f: -tokens[f]):
+            if over <= 0:
+                break
+            if os.path.normpath(f) in keep_full:
+                continue
+            text, outline_tokens = self.outline(f, digests[f], keep_names)
+            if text is None or outline_tokens >= tokens[f]:
+                continue
+            over -= tokens[f] - outline_tokens
+            packed[f], tokens[f] = text, outline_tokens
+        # Still too large: cut the reducible files to an equal share of what is left
+        reducible = [f for f in digests if os.path.normpath(f) not in keep_full]
+        if over > 0 and reducible:
+            fixed = sum(t for f, t in tokens.items() if f not in reducible)
+            share = max(0, self.budget_tokens - fixed) // len(reducible)
+            for f in reducible:
+                if tokens[f] > share:
+                    packed[f] = truncate_to_tokens(packed[f], share)
+        return packed
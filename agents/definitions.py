@@ -0,0 +1,82 @@
+import ast
+
+
+def empty_definitions():
+    return {"classes": [], "functions": [], "files": []}
+
+
+def describe_args(args, skip_self=False):
+    """Describe function arguments as [{"name", "type", "default"}, ...]."""
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    pairs = list(zip(positional, defaults))
+    if args.vararg:
+        pairs.append((args.vararg, None))
+    pairs += list(zip(args.kwonlyargs, args.kw_defaults))
+    if args.kwarg:
+        pairs.append((args.kwarg, None))
+    if skip_self and pairs and pairs[0][0].arg in ('self', 'cls'):
+        pairs = pairs[1:]
+    described = []
+    for arg, default in pairs:
+        name = arg.arg
+        if arg is args.vararg:
+            name = '*' + name
+        elif arg is args.kwarg:
+            name = '**' + name
+        described.append({
+            "name": name,
+            "type": ast.unparse(arg.annotation) if arg.annotation is not None else "",
+            "default": ast.unparse(default) if default is not None else "",
+        })
+    return described
+
+
+def extract_definitions(rel_path, source):
+    """
+    Extract the top-level classes and functions of a Python source file.
+
+    Args:
+        rel_path (str): Path of the file relative to the workspace.
+        source (str): The file content.
+
+    Returns:
+        dict: {"classes", "functions", "files"} in the extra_definitions.json schema.
+    """
+    definitions = empty_definitions()
+    tree = ast.parse(source, filename=rel_path)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            init_args, methods = [], []
+            for item in node.body:
+                if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    continue
+                if item.name == '__init__':
+                    init_args = describe_args(item.args, skip_self=True)
+                else:
+                    methods.append({
+                        "name": item.name,
+                        "args": describe_args(item.args, skip_self=True),
+                        "docstring": ast.get_docstring(item) or "",
+                    })
+            definitions["classes"].append({
+                "location": rel_path,
+                "name": node.name,
+                "init args": init_args,
+                "methods": methods,
+                "docstring": ast.get_docstring(node) or "",
+            })
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            definitions["functions"].append({
+                "location": rel_path,
+                "name": node.name,
+                "args": describe_args(node.args),
+                "docstring": ast.get_docstring(node) or "",
+            })
+    module_doc = ast.get_docstring(tree) or ""
+    definitions["files"].append({
+        "path": rel_path,
+        "description": module_doc.strip().split('\n')[0],
+    })
+    return definitions
+
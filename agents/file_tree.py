@@ -0,0 +1,116 @@
+import os
+from collections import Counter
+from .context_packer import count_tokens
+
+COLLAPSED = "[collapsed]"
+
+
+def extension_summary(extensions, top=3):
+    """e.g. '.py 1100, .json 80, other 20' for the most common extensions of a set of files."""
+    common = extensions.most_common(top)
+    other = sum(extensions.values()) - sum(count for _, count in common)
+    parts = [f"{ext} {count}" for ext, count in common] + ([f"other {other}"] if other else [])
+    return ", ".join(parts)
+
+
+class FileTree:
+    """
+    Compact encoding of the file structure of a workspace for the planner prompts.
+
+    Every directory holding files is written once, as its relative path followed by the names of its
+    files, so a path prefix is not repeated for each file. Directories deeper than max_depth are
+    collapsed to one line with their file and directory counts and most common extensions, and
+    directories with more than max_files files only list the first ones. Collapsed parts are marked
+    with COLLAPSED and can be expanded with their own encode(root=...) on request. The prompt size
+    then follows the number of directories rather than the number of files.
+
+    Args:
+        paths (list): Relative paths of the directories and files, e.g. from walk_workspace.
+        dirs (iterable): The paths that are directories. Directories holding entries are known from
+            their children, so this is needed for the empty ones.
+    """
+    def __init__(self, paths, dirs=()):
+        paths = [p.replace(os.sep, '/') for p in paths]
+        self.dirs = {''} | {d.replace(os.sep, '/').strip('/') for d in dirs}
+        for path in list(self.dirs) + paths:
+            parent = os.path.dirname(path)
+            while parent not in self.dirs:
+                self.dirs.add(parent)
+                parent = os.path.dirname(parent)
+        self.subdirs = {d: [] for d in self.dirs}
+        self.files = {d: [] for d in self.dirs}
+        for path in sorted(set(paths) | self.dirs):
+            if not path:
+                continue
+            parent = os.path.dirname(path)
+            (self.subdirs if path in self.dirs else self.files)[parent].append(path)
+        # Files, directories and extensions of every subtree, summed from the deepest directories up
+        self.totals = {}
+        for d in sorted(self.dirs, key=lambda d: -d.count('/') if d else 1):
+            extensions = Counter(os.path.splitext(f)[1] or os.path.basename(f) for f in self.files[d])
+            num_dirs = len(self.subdirs[d])
+            for sub in self.subdirs[d]:
+                _, sub_dirs, sub_extensions = self.totals[sub]
+                num_dirs += sub_dirs
+                extensions.update(sub_extensions)
+            self.totals[d] = (sum(extensions.values()), num_dirs, extensions)
+
+    def is_dir(self, path):
+        return path.replace(os.sep, '/').strip('/') in self.dirs
+
+    def summary(self, d):
+        num_files, num_dirs, extensions = self.totals[d]
+        where = f" in {num_dirs} directories" if num_dirs else ""
+        return f"{num_files} files{where} ({extension_summary(extensions)}) {COLLAPSED}"
+
+    def encode(self, root='', max_depth=3, max_files=30):
+        """
+        Encode the subtree of root, one line per directory holding files:
+            pkg/sub/: a.py, b.py, ... (+120 files: .py 100, .json 20) [collapsed]
+            pkg/deep/: 1200 files in 45 directories (.py 1100, .json 100) [collapsed]
+        Directories that only hold directories get no line of their own, their path is the prefix of the lines below.
+        """
+        root = root.replace(os.sep, '/').strip('/')
+        lines = []
+        pending = [(root, 0)]
+        while pending:
+            d, depth = pending.pop()
+            label = f"{d}/" if d else "./"
+            if depth > max_depth and self.totals[d][0]:
+                lines.append(f"{label}: {self.summary(d)}")
+                continue
+            files = self.files[d]
+            names = [os.path.basename(f) for f in files[:max_files]]
+            if len(files) > max_files:
+                rest = Counter(os.path.splitext(f)[1] or os.path.basename(f) for f in files[max_files:])
+                names.append(f"... (+{len(files) - max_files} files: {extension_summary(rest)}) {COLLAPSED}")
+            if names:
+                lines.append(f"{label}: " + ", ".join(names))
+            elif not self.subdirs[d]:
+                lines.append(f"{label}: (empty)")
+            pending.extend((sub, depth + 1) for sub in reversed(self.subdirs[d]))
+        return "\n".join(lines)
+
+    def fit(self, budget_tokens, root='', max_depth=6, max_files=50):
+        """
+        The most detailed encoding of root within budget_tokens: the depth and then the number of listed
+        files per directory are lowered until it fits, down to the top-level summary.
+        """
+        limits = [(depth, max_files) for depth in range(max_depth, 0, -1)] + \
+                 [(1, files) for files in (max_files // 2, max_files // 5, 3)] + [(0, 3)]
+        for depth, files in limits:
+            text = self.encode(root, max_depth=depth, max_files=max(files, 1))
+            if count_tokens(text) <= budget_tokens:
+                return text
+        return text
+
+    def expand(self, requested, budget_tokens):
+        """
+        Encode the directories a model asked to see, each within its share of budget_tokens.
+
+        Returns:
+            tuple: (the encoding, the expanded directories). Paths that are not directories of the tree are ignored.
+        """
+        roots = list(dict.fromkeys(p.replace(os.sep, '/').strip('/') for p in requested if isinstance(p, str) and self.is_dir(p)))
+        share = budget_tokens // max(1, len(roots))
+        return "\n".join(self.fit(share, root=d) for d in roots), roots
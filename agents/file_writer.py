@@ -0,0 +1,148 @@
+import os
+import re
+import shlex
+import tempfile
+
+CODE_BLOCK_RE = re.compile(r"```([^\n`]*)\n(.*?)```", re.DOTALL)
+# A path-like token: at least one name with an extension or a separator, e.g. `pkg/mod.py` or **setup.cfg**
+PATH_TOKEN_RE = re.compile(r"[`*'\"]*((?:[\w.\-]+/)*[\w\-]+(?:\.[\w\-]+)+|(?:[\w.\-]+/)+[\w.\-]*)[`*'\":]*")
+# A first-line comment naming the file, e.g. "# file: pkg/mod.py" or "// src/index.js"
+PATH_HINT_RE = re.compile(r"^\s*(?:#|//|--|<!--)\s*(?:(?:file(?:name)?|path)\s*:\s*)?([\w.\-/]+\.[\w\-]+)\s*(?:-->)?\s*$", re.IGNORECASE)
+SHELL_LANGUAGES = {"bash", "sh", "shell", "console", "zsh"}
+
+
+def resolve_in_workspace(workspace, rel_path):
+    """
+    Resolve a relative path under the workspace, refusing paths that escape it.
+
+    Returns:
+        str or None: The absolute path, or None if it points outside the workspace.
+    """
+    root = os.path.realpath(workspace)
+    full = os.path.realpath(os.path.join(root, rel_path))
+    if full != root and not full.startswith(root + os.sep):
+        return None
+    return full
+
+
+def atomic_write(path, content):
+    """Write text to path through a temporary file in the same directory and an atomic rename."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def is_directory_step(save_path, extra_info):
+    """A step creates directories when its save_path has no file extension and it is marked as 'create'."""
+    info_type = extra_info.get('type') if isinstance(extra_info, dict) else None
+    return save_path.endswith('/') or (info_type == 'create' and not os.path.splitext(save_path.rstrip('/'))[1])
+
+
+def block_path(info, code, preceding_text):
+    """Find the target path of a code block from its info string, its first line or the text just before it."""
+    parts = info.strip().split(None, 1)
+    for token in [p for part in parts for p in part.split(':')]:
+        match = PATH_TOKEN_RE.fullmatch(token)
+        if match and ('/' in token or '.' in token):
+            return match.group(1)
+    first_line = code.split('\n', 1)[0]
+    match = PATH_HINT_RE.match(first_line)
+    if match:
+        return match.group(1)
+    lines = [line for line in preceding_text.splitlines() if line.strip()]
+    if lines:
+        tokens = PATH_TOKEN_RE.findall(lines[-1])
+        tokens = [t for t in tokens if '.' in os.path.basename(t)]
+        if tokens:
+            return tokens[-1]
+    return None
+
+
+def parse_code_output(output, save_path, extra_info=None, require_paths=False):
+    """
+    Parse the coder output into files to write and directories to create.
+
+    Args:
+        output (str): The last message of the coder.
+        save_path (str): The save_path of the plan step, relative to the workspace.
+        extra_info (dict): The extra_info of the plan step.
+        require_paths (bool): Map a single code block to its own path instead of save_path.
+
+    Returns:
+        tuple or None: (files, directories) where files maps relative paths to contents,
+            or None if the output cannot be mapped to paths unambiguously.
+    """
+    extra_info = extra_info or {}
+    files, directories = {}, []
+    if is_directory_step(save_path, extra_info):
+        directories.append(save_path.rstrip('/'))
+    blocks = list(CODE_BLOCK_RE.finditer(output))
+    code_blocks = []
+    for block in blocks:
+        language = block.group(1).strip().split(':')[0].lower()
+        if language in SHELL_LANGUAGES:
+            # Only directory instructions are taken from shell blocks
+            for line in block.group(2).splitlines():
+                try:
+                    args = shlex.split(line)
+                except ValueError:
+                    return None
+                if args[:1] == ['mkdir']:
+                    directories.extend(a for a in args[1:] if not a.startswith('-'))
+            continue
+        code_blocks.append(block)
+
+    if not code_blocks:
+        return (files, directories) if directories else None
+    if len(code_blocks) == 1 and not directories and not require_paths:
+        files[save_path] = code_blocks[0].group(2)
+        return files, directories
+    previous_end = 0
+    for block in code_blocks:
+        path = block_path(block.group(1), block.group(2), output[previous_end:block.start()])
+        previous_end = block.end()
+        if path is None or path in files:
+            return None
+        code = block.group(2)
+        first_line, _, rest = code.partition('\n')
+        hint = PATH_HINT_RE.match(first_line)
+        files[path] = rest if hint and hint.group(1) == path else code
+    return files, directories
+
+
+def write_code_output(workspace, output, save_path, extra_info=None, before_write=None):
+    """
+    Write the files and directories described by the coder output under the workspace.
+    before_write, if given, is called with the relative paths just before anything is written, e.g. to snapshot them.
+
+    Returns:
+        list or None: The relative paths of the written files and created directories,
+            or None if nothing could be parsed and the caller should fall back to the save agent.
+    """
+    parsed = parse_code_output(output, save_path, extra_info)
+    if parsed is None:
+        return None
+    files, directories = parsed
+    targets = {}
+    for rel_path in list(files) + directories:
+        full = resolve_in_workspace(workspace, rel_path)
+        if full is None:
+            return None
+        targets[rel_path] = full
+    if before_write is not None:
+        before_write(list(targets))
+    for rel_path in directories:
+        os.makedirs(targets[rel_path], exist_ok=True)
+    for rel_path, content in files.items():
+        atomic_write(targets[rel_path], content)
+    return list(files) + directories
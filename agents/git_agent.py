@@ -1,61 +1,203 @@
-import subprocess
+import asyncio
+import os
+import time
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.ui import Console
-from model_api import model_client  # Assuming model_client is defined in model_api.py
-import asyncio
 
-def run_git_command(args: list[str], cwd: str = ".") -> dict:
-    """Run a git command and return output or error."""
-    try:
-        result = subprocess.run(
-            ["git"] + args,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True
-        )
-        return {"success": True, "output": result.stdout.strip()}
-    except subprocess.CalledProcessError as e:
-        return {"success": False, "error": e.stderr.strip()}
+
+async def run_git_command(args: list[str], cwd: str = ".") -> dict:
+    """Run a git command without blocking the event loop and return output or error."""
+    process = await asyncio.create_subprocess_exec(
+        "git", *args,
+        cwd=cwd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        return {"success": False, "error": stderr.decode(errors="replace").strip()}
+    return {"success": True, "output": stdout.decode(errors="replace").strip()}
+
+
+class GitCatFile:
+    """
+    A long-lived `git cat-file --batch` process of one repository, answering object reads without
+    forking git for every query. Requests are serialized, and the process is restarted if it exits.
+    """
+    def __init__(self, cwd):
+        self.cwd = cwd
+        self.process = None
+        self.lock = asyncio.Lock()
+
+    async def ensure_started(self):
+        if self.process is None or self.process.returncode is not None:
+            self.process = await asyncio.create_subprocess_exec(
+                "git", "cat-file", "--batch",
+                cwd=self.cwd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        return self.process
+
+    async def read(self, object_name):
+        """
+        Read an object, e.g. 'HEAD:path/to/file.py' or a commit hash.
+
+        Returns:
+            tuple or None: (object type, content bytes), or None if the object does not exist.
+        """
+        assert "\n" not in object_name, "Object names cannot contain newlines."
+        async with self.lock:
+            process = await self.ensure_started()
+            process.stdin.write(object_name.encode() + b"\n")
+            await process.stdin.drain()
+            header = (await process.stdout.readline()).decode(errors="replace").split()
+            # "<oid> <type> <size>" for found objects, "<name> missing" or "<name> ambiguous" otherwise
+            if len(header) != 3 or not header[2].isdigit():
+                return None
+            content = await process.stdout.readexactly(int(header[2]) + 1)
+            return header[1], content[:-1]
+
+    async def close(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.stdin.close()
+            await self.process.wait()
+        self.process = None
+
+
+class GitRepoCache:
+    """
+    Per-repository state of the git tools: the cat-file process and cached command outputs.
+    Cached outputs are keyed by the stat of the index, HEAD and the ref HEAD points to, so any
+    commit, checkout, add or reset invalidates them. Working tree edits do not touch the index,
+    so `git status` output additionally expires after status_ttl seconds.
+    """
+    def __init__(self, cwd, git_dir, status_ttl=2.0):
+        self.cwd = cwd
+        self.git_dir = git_dir
+        self.status_ttl = status_ttl
+        self.cat_file = GitCatFile(cwd)
+        self.outputs = {}
+
+    def state(self):
+        paths = [os.path.join(self.git_dir, 'index'), os.path.join(self.git_dir, 'HEAD'), os.path.join(self.git_dir, 'packed-refs')]
+        try:
+            with open(paths[1], 'r') as f:
+                head = f.read().strip()
+        except OSError:
+            head = ""
+        if head.startswith("ref: "):
+            paths.append(os.path.join(self.git_dir, head[5:]))
+        signature = [head]
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    async def cached(self, args, ttl=None):
+        """Run a read-only git command, reusing its output while the repository state is unchanged."""
+        key = tuple(args)
+        state = self.state()
+        entry = self.outputs.get(key)
+        if entry is not None and entry[0] == state and (ttl is None or time.monotonic() - entry[1] < ttl):
+            return entry[2]
+        result = await run_git_command(args, self.cwd)
+        if result["success"]:
+            self.outputs[key] = (state, time.monotonic(), result)
+        return result
+
+    def invalidate(self):
+        self.outputs.clear()
+
+
+git_repos = {}
+
+
+async def git_repo(cwd):
+    """The cache of the repository containing cwd, created on first use."""
+    key = os.path.realpath(cwd)
+    if key not in git_repos:
+        result = await run_git_command(["rev-parse", "--absolute-git-dir"], cwd)
+        if not result["success"]:
+            return None
+        git_repos[key] = GitRepoCache(cwd, result["output"])
+    return git_repos[key]
+
+
+async def close_git_processes():
+    for repo in git_repos.values():
+        await repo.cat_file.close()
+    git_repos.clear()
+
+
+async def run_cached_git_command(args, cwd, ttl=None):
+    repo = await git_repo(cwd)
+    if repo is None:
+        return await run_git_command(args, cwd)
+    return await repo.cached(args, ttl=ttl)
+
+
+async def run_mutating_git_command(args, cwd):
+    result = await run_git_command(args, cwd)
+    repo = git_repos.get(os.path.realpath(cwd))
+    if repo is not None:
+        repo.invalidate()
+    return result
 
 # Define common git command tools
-def git_status(cwd: str = ".") -> dict:
+async def git_status(cwd: str = ".") -> dict:
     """Get git status."""
-    return run_git_command(["status"], cwd)
+    repo = await git_repo(cwd)
+    return await run_cached_git_command(["status"], cwd, ttl=repo.status_ttl if repo else None)
 
-def git_add(files: list[str] | str, cwd: str = ".") -> dict:
+async def git_add(files: list[str] | str, cwd: str = ".") -> dict:
     """Add files to staging area."""
     if isinstance(files, str):
         files = [files]
-    return run_git_command(["add"] + files, cwd)
+    return await run_mutating_git_command(["add"] + files, cwd)
 
-def git_commit(message: str, cwd: str = ".") -> dict:
+async def git_commit(message: str, cwd: str = ".") -> dict:
     """Commit staged changes."""
-    return run_git_command(["commit", "-m", message], cwd)
+    return await run_mutating_git_command(["commit", "-m", message], cwd)
 
-def git_push(remote: str = "origin", branch: str = "main", cwd: str = ".") -> dict:
+async def git_push(remote: str = "origin", branch: str = "main", cwd: str = ".") -> dict:
     """Push commits to remote."""
-    return run_git_command(["push", remote, branch], cwd)
+    return await run_git_command(["push", remote, branch], cwd)
 
-def git_pull(remote: str = "origin", branch: str = "main", cwd: str = ".") -> dict:
+async def git_pull(remote: str = "origin", branch: str = "main", cwd: str = ".") -> dict:
     """Pull latest changes from remote."""
-    return run_git_command(["pull", remote, branch], cwd)
+    return await run_mutating_git_command(["pull", remote, branch], cwd)
 
-def git_checkout(branch: str, cwd: str = ".") -> dict:
+async def git_checkout(branch: str, cwd: str = ".") -> dict:
     """Checkout a branch."""
-    return run_git_command(["checkout", branch], cwd)
+    return await run_mutating_git_command(["checkout", branch], cwd)
 
-def git_branch(branch: str = None, cwd: str = ".") -> dict:
+async def git_branch(branch: str = None, cwd: str = ".") -> dict:
     """List or create branch."""
     if branch:
-        return run_git_command(["checkout", "-b", branch], cwd)
+        return await run_mutating_git_command(["checkout", "-b", branch], cwd)
     else:
-        return run_git_command(["branch"], cwd)
+        return await run_cached_git_command(["branch"], cwd)
 
-def git_log(n: int = 5, cwd: str = ".") -> dict:
+async def git_log(n: int = 5, cwd: str = ".") -> dict:
     """Show last n commits."""
-    return run_git_command(["log", f"-{n}", "--oneline"], cwd)
+    return await run_cached_git_command(["log", f"-{n}", "--oneline"], cwd)
+
+async def git_show_file(path: str, revision: str = "HEAD", cwd: str = ".") -> dict:
+    """Show the content of a file at a revision."""
+    repo = await git_repo(cwd)
+    if repo is None:
+        return {"success": False, "error": f"{cwd} is not in a git repository."}
+    # Paths in revision:path are relative to the repository root unless they start with ./
+    found = await repo.cat_file.read(f"{revision}:./{path}" if not path.startswith("./") else f"{revision}:{path}")
+    if found is None or found[0] != "blob":
+        return {"success": False, "error": f"{path} does not exist at {revision}."}
+    return {"success": True, "output": found[1].decode(errors="replace")}
 
 # Tool registry for the agent
 GIT_TOOLS = [
@@ -67,6 +209,7 @@ GIT_TOOLS = [
     git_checkout,
     git_branch,
     git_log,
+    git_show_file,
 ]
 
 class GitAgent(AssistantAgent):
@@ -93,11 +236,23 @@ class GitAgent(AssistantAgent):
         Please Help with TASK, the workspace is at WORKSPACE.
         """
 
+    async def close(self):
+        """Stop the `git cat-file --batch` processes started by the git tools, in the event loop that ran them."""
+        await close_git_processes()
+
 if __name__ == "__main__":
-    agent = GitAgent(name="git_agent", model_client=model_client, workspace=".")
-    print(agent.system_message)
-    response = Console(
-        agent.run_stream(
-            task="Check the git status and commit changes if any.",
-        )
-    )
\ No newline at end of file
+    from agents.model_api import get_model_client
+
+    async def main():
+        agent = GitAgent(name="git_agent", model_client=get_model_client(), workspace=".")
+        print(agent.system_message)
+        try:
+            return await Console(
+                agent.run_stream(
+                    task="Check the git status and commit changes if any.",
+                )
+            )
+        finally:
+            await agent.close()
+
+    response = asyncio.run(main())
\ No newline at end of file
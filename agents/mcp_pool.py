@@ -0,0 +1,137 @@
+import asyncio
+import os
+from autogen_ext.tools.mcp import McpWorkbench, StdioServerParams
+from .utils import print_colored
+from .tracing import tracer, current_span
+
+
+class TracedMcpWorkbench(McpWorkbench):
+    """McpWorkbench that records an 'mcp' span around every tool call."""
+    async def call_tool(self, name, arguments=None, cancellation_token=None, call_id=None):
+        parent = current_span.get()
+        with tracer.span(name, "mcp", caller=parent["name"] if parent else None):
+            return await super().call_tool(name, arguments, cancellation_token=cancellation_token, call_id=call_id)
+
+
+class McpWorkbenchPool:
+    """
+    One filesystem MCP workbench per workspace, shared by every FileSystemAgent of that workspace.
+    A workbench is started on first use (or ahead of time with prewarm), is health-checked and
+    restarted in place when it is handed out again (see ready), and all workbenches are stopped together by close().
+    workbench_factory(workspace) can replace the npx server, e.g. with a local stand-in for benchmarks.
+    """
+    def __init__(self, read_timeout_seconds=60, workbench_factory=None):
+        self.read_timeout_seconds = read_timeout_seconds
+        self.workbench_factory = workbench_factory or self.filesystem_workbench
+        self.workbenches = {}
+        self.started = set()
+        self.locks = {}
+        self.prewarm_tasks = {}
+
+    def key(self, workspace):
+        return os.path.realpath(workspace)
+
+    def get(self, workspace):
+        """Return the workbench of a workspace, creating it (not started) on first use."""
+        key = self.key(workspace)
+        if key not in self.workbenches:
+            self.workbenches[key] = self.workbench_factory(workspace)
+        return self.workbenches[key]
+
+    def filesystem_workbench(self, workspace):
+        filesys_mcp_server = StdioServerParams(
+            command="npx",
+            args=["@modelcontextprotocol/server-filesystem", workspace], read_timeout_seconds=self.read_timeout_seconds,
+        )
+        return TracedMcpWorkbench(filesys_mcp_server)
+
+    async def start(self, workspace):
+        """Start the workbench of a workspace if it is not running yet. Safe to call concurrently."""
+        key = self.key(workspace)
+        workbench = self.get(workspace)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key not in self.started:
+                await workbench.start()
+                self.started.add(key)
+                # Listing the tools waits until the server process is up and answering
+                await workbench.list_tools()
+        return workbench
+
+    async def ready(self, workspace):
+        """
+        The running workbench of a workspace: started if needed, otherwise health-checked first,
+        so that a server that died since its last use is restarted before it is handed out.
+        """
+        if self.key(workspace) not in self.started:
+            return await self.start(workspace)
+        await self.health_check(workspace)
+        return self.get(workspace)
+
+    def prewarm(self, workspace):
+        """Start the workbench in the background, e.g. while the planner is talking to the model."""
+        key = self.key(workspace)
+        if key not in self.prewarm_tasks:
+            self.prewarm_tasks[key] = asyncio.ensure_future(self.start(workspace))
+        return self.prewarm_tasks[key]
+
+    async def health_check(self, workspace, timeout=10):
+        """
+        Check that the server of a workspace still answers and restart it in place if it does not.
+
+        Returns:
+            bool: True if the server was healthy, False if it had to be restarted.
+        """
+        key = self.key(workspace)
+        workbench = await self.start(workspace)
+        try:
+            await asyncio.wait_for(workbench.list_tools(), timeout=timeout)
+            return True
+        except Exception as e:
+            print_colored(f"[MCP] Filesystem server for {workspace} is unhealthy ({e!r}), restarting ...", "red")
+            async with self.locks[key]:
+                self.started.discard(key)
+                try:
+                    await workbench.stop()
+                except Exception:
+                    pass
+            await self.start(workspace)
+            return False
+
+    async def release(self, workspace):
+        """Stop and forget the workbench of one workspace, leaving the other workspaces running."""
+        key = self.key(workspace)
+        task = self.prewarm_tasks.pop(key, None)
+        if task is not None and not task.done():
+            task.cancel()
+        elif task is not None and not task.cancelled():
+            task.exception()  # retrieved, so that a failed prewarm is not reported as never retrieved
+        if key in self.started:
+            self.started.discard(key)
+            try:
+                await self.workbenches[key].stop()
+            except Exception as e:
+                print_colored(f"[MCP] Failed to stop the filesystem server for {key}: {e!r}", "red")
+        self.workbenches.pop(key, None)
+        self.locks.pop(key, None)
+
+    async def close(self):
+        """Stop every started workbench and forget them."""
+        for task in self.prewarm_tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # a failed prewarm is retried by start(), do not report it twice
+        for key in list(self.started):
+            try:
+                await self.workbenches[key].stop()
+            except Exception as e:
+                print_colored(f"[MCP] Failed to stop the filesystem server for {key}: {e!r}", "red")
+        self.workbenches.clear()
+        self.started.clear()
+        self.locks.clear()
+        self.prewarm_tasks.clear()
+
+
+# Shared by all agents of a process
+workbench_pool = McpWorkbenchPool()
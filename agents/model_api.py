@@ -1,7 +1,8 @@
+import json
 import os
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-API_KEY = os.getenv("OPENAI_API_KEY")
-print("API_KEY:", API_KEY)
+from .client_base import ChatCompletionClientWrapper
+
+DEFAULT_MODEL = os.getenv("CA_MODEL", "deepseek-chat")
 model_info = {
     "name": "deepseek-chat", # 模型名称，可随意填写
     "parameters": {
@@ -19,7 +20,203 @@ model_info = {
     "function_calling": True  # 必填字段，模型是否支持函数调用，如果模型需要使用工具函数，该字段为true
 }
 
-model_client = OpenAIChatCompletionClient(model="deepseek-chat",
-                                          base_url="https://api.deepseek.com",
-                                          api_key=API_KEY,
-                                          model_info=model_info)
\ No newline at end of file
+# Model name -> (factory, model_info). Factories import their SDK when called, not when registered.
+MODEL_REGISTRY = {}
+model_clients = {}
+# Model name -> RateLimitedChatCompletionClient, for the rate limit metrics
+rate_limiters = {}
+
+
+def register_model(name, info):
+    """Register a factory that builds the raw client of a model from its model_info."""
+    def decorator(factory):
+        MODEL_REGISTRY[name] = (factory, info)
+        return factory
+    return decorator
+
+
+class StreamUsageChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Asks for the usage at the end of streams, which holds the prompt cache hits. It is only sent with streaming
+    calls: endpoints may reject stream_options on a request that does not stream, and non-streaming responses
+    always hold their usage.
+    """
+    def create_stream(self, messages, **kwargs):
+        extra_create_args = dict(kwargs.get("extra_create_args") or {})
+        extra_create_args.setdefault("stream_options", {"include_usage": True})
+        return self.client.create_stream(messages, **dict(kwargs, extra_create_args=extra_create_args))
+
+
+def openai_client(model, base_url, api_key, info):
+    """
+    An autogen client of an OpenAI-compatible endpoint whose calls record the provider's prompt cache hits
+    on their 'llm' span (see agents.cache_hits).
+    """
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+    from .cache_hits import cache_hit_http_client
+    return StreamUsageChatCompletionClient(OpenAIChatCompletionClient(model=model, base_url=base_url, api_key=api_key, model_info=info,
+                                                                      http_client=cache_hit_http_client()))
+
+
+@register_model("deepseek-chat", model_info)
+def deepseek_chat(info):
+    return openai_client("deepseek-chat", "https://api.deepseek.com", os.getenv("OPENAI_API_KEY"), info)
+
+
+class LazyChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Defers building the wrapped client to its first model call, so that importing the agents and
+    creating them does not load the model SDK. model_info is answered from the registry entry.
+    """
+    def __init__(self, factory, info):
+        self.factory = factory
+        self.info = info
+        self.built = None
+
+    @property
+    def client(self):
+        if self.built is None:
+            self.built = self.factory(self.info)
+        return self.built
+
+    async def close(self):
+        if self.built is not None:
+            await self.built.close()
+
+    @property
+    def capabilities(self):
+        return self.info
+
+    @property
+    def model_info(self):
+        return self.info
+
+
+def register_openai_endpoint(name, model, base_url, api_key_env="OPENAI_API_KEY", **info):
+    """
+    Register an OpenAI-compatible endpoint, e.g. a cheaper model for mechanical roles or a local stand-in server.
+    info overrides fields of the default model_info.
+    """
+    endpoint_info = dict(model_info, name=model, **info)
+
+    def factory(info):
+        return openai_client(model, base_url, os.getenv(api_key_env), info)
+    MODEL_REGISTRY[name] = (factory, endpoint_info)
+
+
+def default_limits():
+    """Rate limits and retries from the environment: CA_RPM, CA_TPM, CA_MAX_RETRIES and CA_REQUEST_TIMEOUT (seconds)."""
+    limits = {"max_retries": int(os.getenv("CA_MAX_RETRIES", "5"))}
+    for key, env, cast in (("requests_per_minute", "CA_RPM", int), ("tokens_per_minute", "CA_TPM", int), ("timeout", "CA_REQUEST_TIMEOUT", float)):
+        if os.getenv(env):
+            limits[key] = cast(os.getenv(env))
+    return limits
+
+
+def build_client(name, limits=None):
+    """
+    The lazy client of a registered model, behind the rate limiter and the optional response cache.
+    limits override the keyword arguments of RateLimitedChatCompletionClient taken from the environment.
+    """
+    from .rate_limit import RateLimitedChatCompletionClient
+    assert name in MODEL_REGISTRY, f"Unknown model {name}, registered models are {sorted(MODEL_REGISTRY)}."
+    factory, info = MODEL_REGISTRY[name]
+    client = LazyChatCompletionClient(factory, info)
+    # Retries and budgets apply to the calls that reach the provider, so cache hits skip them
+    client = RateLimitedChatCompletionClient(client, model_name=name, **dict(default_limits(), **(limits or {})))
+    rate_limiters[name] = client
+    # Optional response cache: CA_CACHE_MODE=read_through|record|replay, stored under CA_CACHE_DIR
+    cache_mode = os.getenv("CA_CACHE_MODE")
+    if cache_mode:
+        from .response_cache import CachingChatCompletionClient, DiskResponseStore
+        client = CachingChatCompletionClient(
+            client,
+            DiskResponseStore(os.getenv("CA_CACHE_DIR", ".ca_cache"), max_bytes=int(os.getenv("CA_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            model_name=name,
+            parameters=info["parameters"],
+            mode=cache_mode,
+        )
+    return client
+
+
+def create_routed_client(routes):
+    """
+    Build a client that routes each model role to its own model, with optional hedging.
+
+    Args:
+        routes (dict): Parsed routes file:
+            {
+                "models": {"fast": {"model": "deepseek-chat", "base_url": "https://...", "api_key_env": "FAST_API_KEY"}},
+                "default": "deepseek-chat",
+                "roles": {"relevance": "fast", "save": "fast", "plan": "deepseek-chat", "code": "deepseek-chat"},
+                "hedge": {"code": {"secondary": "fast", "quantile": 0.95, "min_samples": 20, "initial_delay": 30}},
+                "limits": {"fast": {"requests_per_minute": 60, "tokens_per_minute": 100000}}
+            }
+            Roles are the ones of agents.model_router.ROLES, models are registered names or entries of "models".
+    """
+    from .model_router import ROLES, HedgedChatCompletionClient, RoutedChatCompletionClient
+    for name, endpoint in routes.get("models", {}).items():
+        register_openai_endpoint(name, **endpoint)
+    clients = {}
+
+    def client_of(name):
+        if name not in clients:
+            clients[name] = build_client(name, limits=routes.get("limits", {}).get(name))
+        return clients[name]
+
+    default = routes.get("default", DEFAULT_MODEL)
+    roles, hedges = routes.get("roles", {}), routes.get("hedge", {})
+    role_clients = {}
+    for role in dict.fromkeys(list(roles) + list(hedges)):
+        assert role in ROLES, f"Unknown model role {role}, expected one of {ROLES}."
+        # A hedged role without a model of its own uses the default model as its primary
+        name = roles.get(role, default)
+        client = client_of(name)
+        if role in hedges:
+            hedge = dict(hedges[role])
+            client = HedgedChatCompletionClient(client, client_of(hedge.pop("secondary")), **hedge)
+        role_clients[role] = (name, client)
+    return RoutedChatCompletionClient((default, client_of(default)), role_clients)
+
+
+def create_model_client(name=None, routes=None):
+    """
+    Build the client of a registered model, or the routed client of a routes JSON file, with the tracing wrapper.
+    The underlying SDK clients are only created on their first model call.
+    """
+    if routes:
+        with open(routes, 'r') as f:
+            client = create_routed_client(json.load(f))
+    else:
+        client = build_client(name or DEFAULT_MODEL)
+
+    # Latency and token usage of every call are recorded as 'llm' spans
+    from .tracing import TracingChatCompletionClient, tracer
+    return TracingChatCompletionClient(client, tracer)
+
+
+def get_model_client(name=None, routes=None):
+    """The shared client of a model (or of a routes file, $CA_MODEL_ROUTES by default), created on first use."""
+    routes = routes or (None if name else os.getenv("CA_MODEL_ROUTES"))
+    key = routes or name or DEFAULT_MODEL
+    if key not in model_clients:
+        model_clients[key] = create_model_client(name, routes=routes)
+    return model_clients[key]
+
+
+def rate_limit_metrics():
+    """Queue depth, wait time, retry and coalescing counters of every model client built so far."""
+    return {name: client.metrics() for name, client in rate_limiters.items()}
+
+
+async def close_model_clients():
+    for client in model_clients.values():
+        await client.close()
+    model_clients.clear()
+
+
+def __getattr__(name):
+    # `from agents.model_api import model_client` keeps working and builds the default client on first access
+    if name == "model_client":
+        return get_model_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,171 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import contextmanager
+from .client_base import ChatCompletionClientWrapper
+from .tracing import current_span
+
+# Roles of the model calls of the workflow, each of which can be routed to its own model
+ROLES = ("relevance", "plan", "code", "save")
+current_role = contextvars.ContextVar("current_role", default=None)
+
+
+@contextmanager
+def model_role(role):
+    """Route the model calls made inside the block as calls of `role`."""
+    token = current_role.set(role)
+    try:
+        yield
+    finally:
+        current_role.reset(token)
+
+
+def annotate_llm_span(**args):
+    """Add args to the enclosing 'llm' span, if the call is traced."""
+    span = current_span.get()
+    if span is not None and span["cat"] == "llm":
+        span["args"].update(args)
+
+
+class LatencyTracker:
+    """Sliding window of latencies with quantiles."""
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def quantile(self, q):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def first_success(tasks):
+    """
+    Wait for the first task that finishes without an exception and cancel the others.
+    If every task fails, the exception of the first one to fail is raised.
+    """
+    pending, first_error = set(tasks), None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task
+                first_error = first_error or task.exception()
+        raise first_error
+    finally:
+        for task in pending:
+            task.cancel()
+        # Let the losers finish cancelling, e.g. before their stream is closed
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+class HedgedChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Send a duplicate of a slow call to a secondary client and take the first response.
+
+    The hedge is sent once the primary has not answered within the `quantile` latency of its
+    recent calls (time to first chunk for streams), so only the slowest calls are duplicated.
+    Until min_samples calls are measured, initial_delay is used, and None disables hedging.
+    """
+    def __init__(self, client, secondary, quantile=0.95, min_samples=20, initial_delay=None, min_delay=0.0, window=200):
+        super().__init__(client)
+        self.secondary = secondary
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.latencies = LatencyTracker(window)
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self):
+        if len(self.latencies.samples) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.latencies.quantile(self.quantile))
+
+    async def race(self, start_primary, start_secondary):
+        """Run start_primary(), adding start_secondary() after the hedge delay. Returns (winning task, index)."""
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(start_primary())]
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(start_secondary()))
+        winner = await first_success(tasks)
+        index = tasks.index(winner)
+        # A primary that lost was at least this slow, so the window still sees the slow tail
+        self.latencies.add(time.perf_counter() - start)
+        if index == 1:
+            self.hedge_wins += 1
+        if len(tasks) > 1:
+            annotate_llm_span(hedged=True, hedge_won=index == 1, hedge_delay=round(delay, 3))
+        return winner, index
+
+    async def create(self, messages, **kwargs):
+        winner, _ = await self.race(lambda: self.client.create(messages, **kwargs),
+                                    lambda: self.secondary.create(messages, **kwargs))
+        return winner.result()
+
+    async def create_stream(self, messages, **kwargs):
+        streams = [self.client.create_stream(messages, **kwargs), self.secondary.create_stream(messages, **kwargs)]
+        winner, index = await self.race(lambda: anext(streams[0]), lambda: anext(streams[1]))
+        # The losing stream is closed, the winning one is followed to the end
+        await streams[1 - index].aclose()
+        yield winner.result()
+        async for chunk in streams[index]:
+            yield chunk
+
+    async def close(self):
+        await self.client.close()
+        await self.secondary.close()
+
+
+class RoutedChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Send every call to the client of the current model role (see model_role), falling back to
+    the default client for calls made outside of a routed role.
+
+    Args:
+        default (tuple): (model name, client) used for unrouted roles.
+        routes (dict): Maps a role to its (model name, client).
+    """
+    def __init__(self, default, routes):
+        self.default = default
+        self.routes = routes
+
+    def route(self):
+        return self.routes.get(current_role.get(), self.default)
+
+    @property
+    def client(self):
+        return self.route()[1]
+
+    async def create(self, messages, **kwargs):
+        name, client = self.route()
+        annotate_llm_span(role=current_role.get(), model=name)
+        return await client.create(messages, **kwargs)
+
+    async def create_stream(self, messages, **kwargs):
+        name, client = self.route()
+        annotate_llm_span(role=current_role.get(), model=name)
+        async for chunk in client.create_stream(messages, **kwargs):
+            yield chunk
+
+    async def close(self):
+        clients = {id(client): client for _, client in [self.default] + list(self.routes.values())}
+        for client in clients.values():
+            await client.close()
+
+    @property
+    def capabilities(self):
+        return self.default[1].capabilities
+
+    @property
+    def model_info(self):
+        # Agents read the capabilities once when they are created, so all routes should share them
+        return self.default[1].model_info
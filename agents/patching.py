@@ -0,0 +1,171 @@
+import ast
+import os
+import re
+from .file_writer import PATH_TOKEN_RE, resolve_in_workspace
+
+SEARCH_MARKER = '<<<<<<< SEARCH'
+DIVIDER_MARKER = '======='
+REPLACE_MARKER = '>>>>>>> REPLACE'
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+class PatchError(ValueError):
+    """Raised when edits returned by the coder cannot be parsed or applied to the current files."""
+
+
+def edit_path_before(lines, index, default_path):
+    """The path named on the closest non-fence line above a SEARCH marker, or default_path."""
+    for line in reversed(lines[:index]):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('```'):
+            continue
+        match = PATH_TOKEN_RE.fullmatch(stripped.rstrip(':'))
+        return match.group(1) if match else default_path
+    return default_path
+
+
+def parse_search_replace(text, default_path):
+    """
+    Parse SEARCH/REPLACE blocks:
+
+        path/to/file.py
+        <<<<<<< SEARCH
+        old lines
+        =======
+        new lines
+        >>>>>>> REPLACE
+
+    Returns:
+        list: (path, search, replace, hint_line) tuples, hint_line is always None.
+    """
+    lines = text.splitlines(keepends=True)
+    edits, i, path = [], 0, default_path
+    while i < len(lines):
+        if lines[i].rstrip() != SEARCH_MARKER:
+            i += 1
+            continue
+        path = edit_path_before(lines, i, path)
+        search, replace, j = [], [], i + 1
+        while j < len(lines) and lines[j].rstrip() != DIVIDER_MARKER:
+            search.append(lines[j])
+            j += 1
+        k = j + 1
+        while k < len(lines) and lines[k].rstrip() != REPLACE_MARKER:
+            replace.append(lines[k])
+            k += 1
+        if k >= len(lines):
+            raise PatchError(f"Unterminated SEARCH/REPLACE block for {path}.")
+        edits.append((path, ''.join(search), ''.join(replace), None))
+        i = k + 1
+    return edits
+
+
+def parse_unified_diff(text):
+    """
+    Parse the hunks of unified diffs into (path, search, replace, hint_line) tuples.
+    A hunk becomes a search of its context and removed lines and a replace of its context and added lines.
+    """
+    lines = text.splitlines(keepends=True)
+    edits, i, path = [], 0, None
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith('+++ '):
+            target = line[4:].strip().split('\t')[0]
+            path = None if target == '/dev/null' else re.sub(r"^b/", "", target)
+            i += 1
+            continue
+        match = HUNK_RE.match(line)
+        if not match or path is None:
+            i += 1
+            continue
+        search, replace, i = [], [], i + 1
+        while i < len(lines) and not lines[i].startswith(('@@', '--- ', '```')):
+            hunk_line = lines[i]
+            if hunk_line.startswith('+'):
+                replace.append(hunk_line[1:])
+            elif hunk_line.startswith('-'):
+                search.append(hunk_line[1:])
+            elif hunk_line.startswith(' '):
+                search.append(hunk_line[1:])
+                replace.append(hunk_line[1:])
+            elif hunk_line.strip() == '':
+                # Models often drop the leading space of empty context lines
+                search.append('\n')
+                replace.append('\n')
+            elif not hunk_line.startswith('\\'):
+                break
+            i += 1
+        edits.append((path, ''.join(search), ''.join(replace), int(match.group(1))))
+    return edits
+
+
+def parse_edits(text, default_path):
+    """All SEARCH/REPLACE blocks and unified diff hunks of a coder output."""
+    return parse_search_replace(text, default_path) + parse_unified_diff(text)
+
+
+def strip_edits(text):
+    """Remove the fenced blocks that hold edits, leaving full files and prose."""
+    def keep(match):
+        body = match.group(0)
+        return '' if SEARCH_MARKER in body or re.search(r"^@@ -\d+", body, re.MULTILINE) else body
+    text = re.sub(r"```[^\n`]*\n.*?```", keep, text, flags=re.DOTALL)
+    # Edits that were not fenced
+    text = re.sub(rf"{re.escape(SEARCH_MARKER)}\n.*?{re.escape(REPLACE_MARKER)}[^\n]*", '', text, flags=re.DOTALL)
+    return text
+
+
+def apply_edit(content, search, replace, hint_line=None):
+    """Replace one occurrence of search in content, tolerating trailing whitespace differences."""
+    if search == '':
+        if content.strip():
+            raise PatchError("Empty SEARCH section for a file that is not empty.")
+        return replace
+    occurrences = [m.start() for m in re.finditer(re.escape(search), content)]
+    if len(occurrences) > 1 and hint_line is not None:
+        # Several matches: take the one closest to the line the hunk header names
+        occurrences = [min(occurrences, key=lambda pos: abs(content.count('\n', 0, pos) + 1 - hint_line))]
+    if len(occurrences) == 1:
+        return content[:occurrences[0]] + replace + content[occurrences[0] + len(search):]
+    if len(occurrences) > 1:
+        raise PatchError(f"SEARCH section matches {len(occurrences)} places:\n{search}")
+
+    content_lines = content.splitlines(keepends=True)
+    search_lines = [line.rstrip() for line in search.splitlines()]
+    stripped = [line.rstrip() for line in content_lines]
+    starts = [i for i in range(len(stripped) - len(search_lines) + 1) if stripped[i:i + len(search_lines)] == search_lines]
+    if len(starts) > 1 and hint_line is not None:
+        starts = [min(starts, key=lambda i: abs(i + 1 - hint_line))]
+    if len(starts) != 1:
+        raise PatchError(f"SEARCH section {'matches several places' if starts else 'not found'}:\n{search}")
+    start = starts[0]
+    return ''.join(content_lines[:start]) + replace + ''.join(content_lines[start + len(search_lines):])
+
+
+def apply_edits(workspace, edits):
+    """
+    Apply edits to the current files of the workspace in memory and validate the results.
+    Nothing is written, so a failing edit leaves the workspace untouched.
+
+    Returns:
+        dict: Maps each edited path to its new content.
+    """
+    patched = {}
+    for path, search, replace, hint_line in edits:
+        full_path = resolve_in_workspace(workspace, path)
+        if full_path is None:
+            raise PatchError(f"{path} is outside of the workspace.")
+        if path not in patched:
+            if os.path.isfile(full_path):
+                with open(full_path, 'r') as f:
+                    patched[path] = f.read()
+            else:
+                patched[path] = ''
+        patched[path] = apply_edit(patched[path], search, replace, hint_line)
+    for path, content in patched.items():
+        if path.endswith('.py'):
+            try:
+                ast.parse(content, filename=path)
+            except SyntaxError as e:
+                raise PatchError(f"{path} does not parse after applying the edits: {e}")
+    return patched
@@ -0,0 +1,145 @@
+import json
+import re
+
+PLAN_ARRAY_RE = re.compile(r'"plan"\s*:\s*\[')
+JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*\n(.*?)```", re.DOTALL)
+
+
+def strip_json_extras(text):
+    """Remove the # and // comments and trailing commas that models add to JSON, outside of strings."""
+    out, i, in_string = [], 0, False
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if ch == '\\':
+                out.append(text[i + 1:i + 2])
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch == '#' or text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = len(text) if newline < 0 else newline
+            continue
+        elif ch in '}]':
+            # Drop a comma that directly precedes the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def loads_lenient(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(strip_json_extras(text))
+
+
+def valid_step(step):
+    return isinstance(step, dict) and 'modification' in step and 'save_path' in step
+
+
+def parse_plan(text):
+    """
+    Parse a complete planner response into {"plan": [...]}.
+
+    Raises:
+        ValueError: If the response holds no JSON plan.
+    """
+    candidates = [m.group(1) for m in JSON_BLOCK_RE.finditer(text)] + [text]
+    for candidate in candidates:
+        start = min([i for i in (candidate.find('{'), candidate.find('[')) if i >= 0], default=-1)
+        if start < 0:
+            continue
+        try:
+            plan, _ = json.JSONDecoder().raw_decode(strip_json_extras(candidate[start:]))
+        except json.JSONDecodeError:
+            continue
+        if isinstance(plan, list):
+            plan = {"plan": plan}
+        if isinstance(plan, dict) and isinstance(plan.get("plan"), list):
+            return plan
+    raise ValueError("The planner response does not contain a JSON plan.")
+
+
+class PlanStreamParser:
+    """
+    Incrementally parse the steps of the "plan" array of a streamed planner response.
+    feed() takes the next chunk of text and returns the steps whose JSON object is complete,
+    so that they can be dispatched while the rest of the plan is still being generated.
+    Steps without a "step" number are numbered by their position in the array. Objects that do not
+    parse or miss "modification" or "save_path" are kept in `rejected` as (position, raw text).
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.done = False
+        self.in_string = False
+        self.depth = 0
+        self.object_start = None
+        self.objects = 0
+        self.steps = []
+        self.rejected = []
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        new_steps = []
+        if not self.in_array and not self.done:
+            match = PLAN_ARRAY_RE.search(self.buffer, max(0, self.pos - 16))
+            if match is None:
+                self.pos = len(self.buffer)
+                return new_steps
+            self.in_array, self.pos = True, match.end()
+        while self.in_array and self.pos < len(self.buffer):
+            i, ch = self.pos, self.buffer[self.pos]
+            if self.in_string:
+                if ch == '\\':
+                    if i + 1 >= len(self.buffer):
+                        break  # wait for the escaped character
+                    self.pos += 1
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '#' or self.buffer.startswith('//', i):
+                newline = self.buffer.find('\n', i)
+                if newline < 0:
+                    break  # wait for the end of the comment
+                self.pos = newline
+            elif ch == '{':
+                if self.depth == 0:
+                    self.object_start = i
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    step = self.parse_step(self.buffer[self.object_start:i + 1])
+                    if step is not None:
+                        new_steps.append(step)
+            elif ch == ']' and self.depth == 0:
+                self.in_array, self.done = False, True
+            self.pos += 1
+        return new_steps
+
+    def parse_step(self, text):
+        self.objects += 1
+        try:
+            step = loads_lenient(text)
+        except json.JSONDecodeError:
+            step = None
+        if not valid_step(step):
+            self.rejected.append((self.objects, text))
+            return None
+        step.setdefault('step', self.objects)
+        self.steps.append(step)
+        return step
@@ -3,25 +3,71 @@ import os
 from .common_agents import FileSystemAgent
 from .utils import print_colored
 import json
+import re
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent
 from autogen_agentchat.ui import Console
-import fnmatch
+from .tree_walker import IgnoreMatcher, walk_workspace
+from .tracing import tracer
+from .model_router import model_role
+from .workspace_io import WorkspaceIO
+from .plan_stream import PlanStreamParser, parse_plan, valid_step
+from .retrieval import RetrievalIndex
+from .file_tree import COLLAPSED, FileTree
+
+EXPAND_RE = re.compile(r"^\s*EXPAND:\s*(\[.*?\])", re.DOTALL)
 
 class PlannerAgent(AssistantAgent):
-    def __init__(self, name, model_client, tools, reflect_on_tool_use=True, workspace='./executions/test/', log_dir='ca_logs'):
+    def __init__(self, name, model_client, tools, reflect_on_tool_use=True, workspace='./executions/test/', log_dir='ca_logs', relevance='llm', top_k=30,
+                 structure_budget=4000, max_expansions=2):
         super().__init__(
-            name=name, model_client=model_client, tools=tools, reflect_on_tool_use=reflect_on_tool_use)
+            name=name, model_client=model_client, tools=tools, reflect_on_tool_use=reflect_on_tool_use,
+            model_client_stream=True)
         """
         1. Read the file structure of the code directory under workspace.
         2. Make a step-by-step plan to achieve the mission goal, specifying which files to read/modify/create.
+           The plan is streamed, and each step can be handed to the coder as soon as it is complete.
         3. Write the plan to a file named 'plan.json' under the workspace log_dir directory.
+
+        The relevant files of step 1 are chosen by the model from the whole file structure (relevance='llm'),
+        by the model from the top_k files of a local BM25 index (relevance='shortlist'), or taken directly
+        from the index without a model call (relevance='retrieval').
+
+        The file structure is sent as a compact tree (see agents.file_tree.FileTree) of at most structure_budget
+        tokens. In step 1 the model can ask to see collapsed directories, up to max_expansions times.
         """
+        assert relevance in ('llm', 'shortlist', 'retrieval'), f"Unknown relevance mode {relevance}."
         self.workspace = workspace
         self.log_dir = log_dir
+        self.relevance = relevance
+        self.top_k = top_k
+        self.structure_budget = structure_budget
+        self.max_expansions = max_expansions
+        self.io = WorkspaceIO(workspace)
+        self.retrieval_index = RetrievalIndex(workspace, os.path.join(workspace, log_dir, 'retrieval_index.json'))
         self.step1_prompt = f"""
             The mission goal is: MISSION_GOAL
             The file structure of the project is: FILE_STRUCTURE
             Based on the file structure, identify the most relevant files and directories to achieve the mission goal.
             List these as a JSON array of relative paths.
+            Each line of the file structure is a directory followed by its files. Parts marked {COLLAPSED} are summarized:
+            if you need to see some of them, answer only EXPAND: followed by a JSON array of their directory paths.
+            """
+        self.expansion_prompt = f"""
+            The requested directories are: SUBTREES
+            Now identify the most relevant files and directories to achieve the mission goal.
+            List these as a JSON array of relative paths.
+            """
+        self.no_expansion_prompt = f"""
+            No more directories can be expanded.
+            Identify the most relevant files and directories to achieve the mission goal from what you have seen.
+            List these as a JSON array of relative paths.
+            """
+        self.step1_shortlist_prompt = f"""
+            The mission goal is: MISSION_GOAL
+            The candidate files retrieved for the mission goal, best match first, are: CANDIDATES
+            Based on the candidates, identify the most relevant files and directories to achieve the mission goal.
+            List these as a JSON array of relative paths.
             """
         self.list_dir_agent = FileSystemAgent(
             name="list_dir_agent",
@@ -32,10 +78,12 @@ class PlannerAgent(AssistantAgent):
             The root code directory is {self.workspace}.
             """
         )
+        # Starts like step1_prompt, so that the provider can serve the file structure from its prompt prefix cache
         self.step2_prompt = f"""
             The mission goal is: MISSION_GOAL
-            The file structure is: FILE_STRUCTURE
+            The file structure of the project is: FILE_STRUCTURE
             The relevant files and directories are: RELEVANT_PATHS
+            EXPANDED_DIRECTORIES
             Now, make a step-by-step plan to achieve the mission goal.
             Each step should specify:
                 - files to read first ("dependencies": list)
@@ -44,18 +92,20 @@ class PlannerAgent(AssistantAgent):
                 - any extra info ("extra_info": dict)
                 - step number ("step": int, starting from 1)
             Each step should only contains creating directories or modifying files, not both.
-            Output the plan as:
+            extra_info.type is "create" for directories, and "add", "modify" or "create" for files.
+            extra_info.structure describes the modification of a file; its lists hold as many entries as needed.
+            Output the plan as valid JSON, without comments:
             ```json
             {{
                 "plan": [
                     {{
                         "step": 1,
-                        "dependencies": ["relative/path1", ...],
+                        "dependencies": ["relative/path1"],
                         "modification": "Describe the code change.",
                         "save_path": "relative/path/to/save.py",
                         "extra_info": {{
-                            "type": "modify", # "create" for directories, "add", "modify" or "create" for files
-                            "structure": [ # describe the modification for a file
+                            "type": "modify",
+                            "structure": {{
                                 "classes": [
                                     {{
                                         "name": "ClassName",
@@ -64,8 +114,7 @@ class PlannerAgent(AssistantAgent):
                                                 "name": "arg1",
                                                 "type": "str",
                                                 "default": "default_value"
-                                            }},
-                                            ...
+                                            }}
                                         ],
                                         "methods": [
                                             {{
@@ -75,15 +124,12 @@ class PlannerAgent(AssistantAgent):
                                                         "name": "arg1",
                                                         "type": "str",
                                                         "default": "default_value"
-                                                    }},
-                                                    ...
+                                                    }}
                                                 ],
                                                 "docstring": "Method docstring"
-                                            }},
-                                            ...
+                                            }}
                                         ]
-                                    }},
-                                    ...
+                                    }}
                                 ],
                                 "functions": [
                                     {{
@@ -93,73 +139,208 @@ class PlannerAgent(AssistantAgent):
                                                 "name": "arg1",
                                                 "type": "str",
                                                 "default": "default_value"
-                                            }},
-                                            ...
+                                            }}
                                         ],
                                         "docstring": "Function docstring"
-                                    }},
-                                    ...
+                                    }}
                                 ],
-                                "constants": [],
-                                ...
-                            ]
-                        }},
-                    }},
-                    ...
+                                "constants": []
+                            }}
+                        }}
+                    }}
                 ]
             }}
             ```
             """
-        self.save_file_prompt = f"""
-            Write a file named 'plan.json' under the workspace directory {self.workspace}/{self.log_dir} according to the following message: PLAN_MESSAGE
+        self.repair_steps_prompt = f"""
+            These steps of your plan are not valid JSON or miss "modification" or "save_path":
+            REJECTED_STEPS
+            Output only the corrected steps as valid JSON, without comments:
+            ```json
+            {{"plan": [...]}}
+            ```
             """
-        self.save_plan_agent = FileSystemAgent(
-            name="filesys_agent",
-            model_client=model_client,
-            workspace=workspace,
-            system_message="""Save files as requested. Use the correct function provided in workbench."""
-        )
 
-    async def run(self, mission_goal, stream_output=False):
+    def read_file_structure(self):
+        """The kept paths of the workspace and the set of those that are directories."""
+        matcher = IgnoreMatcher.from_file(os.path.join(self.workspace, ".caignore"))
+        os.makedirs(os.path.join(self.workspace, self.log_dir), exist_ok=True)
+        return walk_workspace(self.workspace, matcher, cache_path=os.path.join(self.workspace, self.log_dir, 'tree_cache.json'), with_dirs=True)
+
+    def shortlist(self, file_structure, mission_goal):
+        """Update the retrieval index from the file structure and return the top_k files for the mission goal."""
+        log_prefix = os.path.normpath(self.log_dir) + os.sep
+        self.retrieval_index.update([p for p in file_structure if not p.startswith(log_prefix)])
+        return [rel_path for rel_path, _ in self.retrieval_index.search(mission_goal, k=self.top_k)]
+
+    async def find_relevant_paths(self, step1_prompt, tree, stream_output=False):
+        """
+        Run the relevance prompt, answering up to max_expansions requests for collapsed directories.
+        A request beyond them (or for no known directory) is answered with no_expansion_prompt once,
+        and an expansion request is never returned as the relevant paths.
+
+        Returns:
+            tuple: (the relevant paths as answered by the model, the encodings of the expanded directories)
+        """
+        expanded, task, refused = [], step1_prompt, False
+        while True:
+            response = await Console(self.run_stream(task=task)) if stream_output else await super().run(task=task)
+            content = response.messages[-1].content
+            match = EXPAND_RE.match(content)
+            if match is None:
+                return content, expanded
+            if refused:
+                print_colored("[Planner] The model still asks for expansions, planning without relevant paths.", "red")
+                return "[]", expanded
+            try:
+                requested = json.loads(match.group(1))
+            except ValueError:
+                requested = []
+            roots = []
+            if len(expanded) < self.max_expansions:
+                subtrees, roots = tree.expand(requested if isinstance(requested, list) else [], self.structure_budget)
+            if roots:
+                print_colored(f"[Planner] Expanding {roots}", "yellow")
+                expanded.append(subtrees)
+                task = self.expansion_prompt.replace("SUBTREES", subtrees)
+            else:
+                task, refused = self.no_expansion_prompt, True
+
+    async def stream_plan(self, task, on_step=None, stream_output=False):
+        """
+        Run the plan prompt and call on_step with each step of the plan as soon as its JSON object is complete.
+        Steps only found once the whole response is parsed (e.g. from a client that does not stream) are passed at the end,
+        and steps that are not valid get a repair turn (see repair_steps) rather than being dropped.
+
+        Returns:
+            tuple: (the task result, the parsed plan)
+        """
+        parser = PlanStreamParser()
+
+        async def dispatch(events):
+            async for event in events:
+                if isinstance(event, ModelClientStreamingChunkEvent):
+                    for step in parser.feed(event.content):
+                        if on_step is not None:
+                            await on_step(step)
+                yield event
+
+        if stream_output:
+            response = await Console(dispatch(self.run_stream(task=task)))
+        else:
+            response = None
+            async for event in dispatch(self.run_stream(task=task)):
+                if isinstance(event, TaskResult):
+                    response = event
+        dispatched = {step['step'] for step in parser.steps}
+        try:
+            parsed = parse_plan(response.messages[-1].content)["plan"]
+        except ValueError:
+            if not parser.steps and not parser.rejected:
+                raise
+            # Only the streamed objects are known
+            remaining, rejected = [], parser.rejected
+        else:
+            # Matched by step number rather than by position, so that an object the stream rejected does not shift the others
+            remaining, rejected = [], []
+            for position, step in enumerate(parsed, start=1):
+                if (step.get('step', position) if isinstance(step, dict) else position) in dispatched:
+                    continue
+                if valid_step(step):
+                    step.setdefault('step', position)
+                    remaining.append(step)
+                else:
+                    rejected.append((position, json.dumps(step)))
+        if rejected:
+            remaining += await self.repair_steps(rejected, dispatched | {step['step'] for step in remaining})
+        # The streamed steps were already dispatched, keep them as they were
+        plan = {"plan": list(parser.steps)}
+        for step in remaining:
+            plan["plan"].append(step)
+            if on_step is not None:
+                await on_step(step)
+        return response, plan
+
+    async def repair_steps(self, rejected, taken):
+        """
+        Ask the model to correct the plan steps that do not parse or miss "modification" or "save_path".
+
+        Args:
+            rejected (list): (position in the plan, raw text) of the invalid steps.
+            taken (set): The step numbers already used by the plan.
+
+        Raises:
+            ValueError: If the corrected steps are still not valid.
+        """
+        print_colored(f"[Planner] {len(rejected)} plan steps are not valid, asking for a correction ...", "yellow")
+        task = self.repair_steps_prompt.replace("REJECTED_STEPS", "\n".join(text for _, text in rejected))
+        response = await super().run(task=task)
+        try:
+            repaired = parse_plan(response.messages[-1].content)["plan"]
+        except ValueError:
+            repaired = []
+        if len(repaired) != len(rejected) or not all(valid_step(step) for step in repaired):
+            raise ValueError("Plan steps are still not valid after a correction:\n" + "\n".join(text for _, text in rejected))
+        taken = set(taken)
+        for (position, _), step in zip(rejected, repaired):
+            step.setdefault('step', position)
+            if step['step'] in taken:
+                step['step'] = max(taken) + 1
+            taken.add(step['step'])
+        return repaired
+
+    async def run(self, mission_goal, stream_output=False, on_step=None, on_plan=None):
+        """
+        Plan the mission goal and write plan.json. If on_step is given, it is awaited with every step
+        of the plan while the rest of the plan is still being generated, and on_plan with the complete
+        plan once it is written.
+        """
         # Step 1: Read file structure
         code_root = self.workspace
-        file_structure = []
         assert os.path.exists(os.path.join(code_root, ".caignore")), f"Make sure the code root directory contains a .caignore file to ignore unnecessary files at {code_root}/.caignore, this saves tokens."
-        ignores = open(os.path.join(code_root, ".caignore"), 'r').read().splitlines()
-        ignores = [ignore.strip() for ignore in ignores if ignore.strip() and not ignore.strip().startswith('#')]
-        for root, dirs, files in os.walk(code_root):
-            # match folders
-            dir_names = os.path.normpath(root).split(os.sep)
-            if any(fnmatch.fnmatch(dir_name, pattern) for pattern in ignores for dir_name in dir_names) or os.path.basename(root).startswith('.'):
-                continue
-            rel_root = os.path.relpath(root, code_root)
-            # match files
-            files = [f for f in files if not f.startswith('.') and not any(fnmatch.fnmatch(os.path.basename(f), pattern) for pattern in ignores)]
-            for d in dirs:
-                file_structure.append(os.path.join(rel_root, d) if rel_root != '.' else d)
-            for f in files:
-                file_structure.append(os.path.join(rel_root, f) if rel_root != '.' else f)
-        file_structure = sorted(file_structure)
-        file_structure_str = json.dumps(file_structure, indent=2)
+        with tracer.span("planner: file structure", "stage"):
+            file_structure, directories = await self.io.run(self.read_file_structure)
+            tree = FileTree(file_structure, dirs=directories)
+            file_structure_str = tree.fit(self.structure_budget)
 
         print_colored("[Planner] Working on the mission goal:", "blue")
         print_colored(mission_goal, "green")
         print_colored("[Planner] Step 1: Identifying relevant files and directories...", "yellow")
-        step1_prompt = self.step1_prompt.replace("MISSION_GOAL", mission_goal).replace("FILE_STRUCTURE", file_structure_str)
-        relevant_paths_response = await Console(self.run_stream(task=step1_prompt)) if stream_output else await super().run(task=step1_prompt)
+        candidates, expanded = [], []
+        if self.relevance != 'llm':
+            with tracer.span("planner: retrieval", "stage"):
+                candidates = await self.io.run(self.shortlist, file_structure, mission_goal)
+            print_colored(f"[Planner] Retrieved {len(candidates)} candidate files", "yellow")
+        if self.relevance == 'retrieval' and candidates:
+            relevant_paths = json.dumps(candidates, indent=2)
+        else:
+            # Without any lexical match (e.g. a goal in another language) the model sees the whole file structure
+            if candidates:
+                step1_prompt = self.step1_shortlist_prompt.replace("MISSION_GOAL", mission_goal).replace("CANDIDATES", json.dumps(candidates, indent=2))
+            else:
+                step1_prompt = self.step1_prompt.replace("MISSION_GOAL", mission_goal).replace("FILE_STRUCTURE", file_structure_str)
+            with tracer.span("planner: relevance", "stage"), model_role("relevance"):
+                relevant_paths, expanded = await self.find_relevant_paths(step1_prompt, tree, stream_output=stream_output)
 
         print_colored("[Planner] Step 2: Making a step-by-step plan...", "yellow")
-        relevant_paths = relevant_paths_response.messages[-1].content
-        step2_prompt = self.step2_prompt.replace("MISSION_GOAL", mission_goal).replace("FILE_STRUCTURE", file_structure_str).replace("RELEVANT_PATHS", relevant_paths)
-        plan_response = await Console(self.run_stream(task=step2_prompt)) if stream_output else await super().run(task=step2_prompt)
+        # The plan prompt repeats the file structure and the relevant paths, so the relevance turns are not resent
+        await self.model_context.clear()
+        step2_prompt = self.step2_prompt.replace("MISSION_GOAL", mission_goal).replace("FILE_STRUCTURE", file_structure_str).replace("RELEVANT_PATHS", relevant_paths) \
+            .replace("EXPANDED_DIRECTORIES", ("The expanded directories are: " + "\n".join(expanded)) if expanded else "")
+        with tracer.span("planner: plan", "stage"), model_role("plan"):
+            plan_response, plan = await self.stream_plan(step2_prompt, on_step=on_step, stream_output=stream_output)
 
-        print_colored(f"[Planner] Step 3: Writing plan to {os.path.join(self.workspace, self.log_dir, 'plan.json')}", "yellow")
-        save_file_prompt = self.save_file_prompt.replace("PLAN_MESSAGE", plan_response.messages[-1].content)
-        save_file_response = await Console(self.save_plan_agent.run_stream(task=save_file_prompt)) if stream_output else await self.save_plan_agent.run(task=save_file_prompt)
+        plan_path = os.path.join(self.log_dir, 'plan.json')
+        print_colored(f"[Planner] Step 3: Writing plan to {os.path.join(self.workspace, plan_path)}", "yellow")
+        with tracer.span("planner: save plan", "stage"):
+            await self.io.write_json(plan_path, plan, indent=4)
+        if on_plan is not None:
+            await on_plan(plan)
 
         print_colored("[Planner] Planning finished", "green")
         return {
-            "relevant_paths_response": relevant_paths_response.messages[-1].content,
+            "relevant_paths_response": relevant_paths,
             "plan_response": plan_response.messages[-1].content,
-            "save_file_response": save_file_response.messages[-1].content
+            "plan_path": plan_path,
+            "steps": len(plan["plan"])
         }
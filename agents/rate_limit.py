@@ -0,0 +1,220 @@
+import asyncio
+import random
+import time
+from autogen_core.models import CreateResult
+from .client_base import ChatCompletionClientWrapper
+from .context_packer import count_tokens
+from .response_cache import request_key
+from .tracing import current_span
+from .utils import print_colored
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Transient errors of the OpenAI SDK, matched by name so that the SDK is not imported here
+RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+
+
+def status_of(error):
+    return getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def is_retryable(error):
+    """Timeouts, connection errors, 429s and 5xx responses are worth retrying, anything else is not."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    return status_of(error) in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error):
+    """The Retry-After delay a provider sent with the error, in seconds, or None."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def llm_span_args():
+    span = current_span.get()
+    return span["args"] if span is not None and span["cat"] == "llm" else {}
+
+
+class TokenBucket:
+    """A budget of per_minute units, refilled continuously and holding at most capacity units."""
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = None
+        self.lock_loop = None
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_lock(self):
+        # One lock per event loop, since a client can outlive the loop it was first used on
+        loop = asyncio.get_running_loop()
+        if self.lock_loop is not loop:
+            self.lock, self.lock_loop = asyncio.Lock(), loop
+        return self.lock
+
+    async def acquire(self, amount):
+        """Wait until amount units are available and take them. Waiters are served in arrival order."""
+        amount = min(amount, self.capacity)
+        async with self.get_lock():
+            self.refill()
+            while self.level < amount:
+                await asyncio.sleep((amount - self.level) / self.rate)
+                self.refill()
+            self.level -= amount
+
+    def adjust(self, amount):
+        """Take (or give back, if negative) units once the actual cost of a request is known."""
+        self.refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimitedChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Keep a model client within its request-per-minute and token-per-minute budgets, retry transient
+    failures with jittered exponential backoff, and merge identical requests that are in flight.
+
+    Every request waits for one request and its estimated tokens (prompt plus completion_reserve) from
+    token buckets; the estimate is corrected with the actual usage. Timeouts, connection errors, 429s
+    and 5xx responses are retried up to max_retries times, honoring Retry-After. A stream is only
+    retried until its first chunk arrives.
+    """
+    def __init__(self, client, requests_per_minute=None, tokens_per_minute=None, max_retries=5, base_delay=1.0,
+                 max_delay=60.0, timeout=None, completion_reserve=1024, coalesce=True, model_name=""):
+        super().__init__(client)
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.completion_reserve = completion_reserve
+        self.coalesce = coalesce
+        self.model_name = model_name
+        self.in_flight = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def estimate_tokens(self, messages):
+        return sum(count_tokens(str(message.content)) for message in messages) + self.completion_reserve
+
+    async def admit(self, tokens):
+        """Wait for the budgets of one request, recording the queue depth and the wait."""
+        start = time.monotonic()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            if self.request_bucket is not None:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket is not None:
+                await self.token_bucket.acquire(tokens)
+        finally:
+            self.queue_depth -= 1
+        waited = time.monotonic() - start
+        self.waits += 1
+        self.wait_time += waited
+        self.max_wait = max(self.max_wait, waited)
+        args = llm_span_args()
+        if waited > 0.001:
+            args["rate_limit_wait"] = round(args.get("rate_limit_wait", 0) + waited, 3)
+
+    def settle(self, estimated, result):
+        if self.token_bucket is not None and isinstance(result, CreateResult) and result.usage:
+            self.token_bucket.adjust(result.usage.prompt_tokens + result.usage.completion_tokens - estimated)
+
+    async def backoff(self, attempt, error):
+        """Sleep before the next attempt, or re-raise the error if it should not be retried."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            self.failures += 1
+            raise error
+        delay = max(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)), retry_after(error) or 0)
+        self.retries += 1
+        args = llm_span_args()
+        args["retries"] = args.get("retries", 0) + 1
+        print_colored(f"[Model] {type(error).__name__} ({status_of(error) or 'no status'}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s", "yellow")
+        await asyncio.sleep(delay)
+
+    async def with_timeout(self, awaitable):
+        return await (asyncio.wait_for(awaitable, self.timeout) if self.timeout else awaitable)
+
+    async def call(self, messages, kwargs):
+        estimated = self.estimate_tokens(messages)
+        attempt = 0
+        while True:
+            await self.admit(estimated)
+            try:
+                result = await self.with_timeout(self.client.create(messages, **kwargs))
+            except Exception as e:
+                await self.backoff(attempt, e)
+                attempt += 1
+                continue
+            self.settle(estimated, result)
+            return result
+
+    async def create(self, messages, *, tools=[], tool_choice="auto", json_output=None, extra_create_args={}, cancellation_token=None):
+        kwargs = dict(tools=tools, tool_choice=tool_choice, json_output=json_output,
+                      extra_create_args=extra_create_args, cancellation_token=cancellation_token)
+        self.requests += 1
+        if not self.coalesce:
+            return await self.call(messages, kwargs)
+        key = request_key(self.model_name, {}, messages, tools, tool_choice, json_output, extra_create_args)
+        if key in self.in_flight:
+            self.coalesced += 1
+            result = await asyncio.shield(self.in_flight[key])
+            return result.model_copy(deep=True)
+        future = asyncio.ensure_future(self.call(messages, kwargs))
+        self.in_flight[key] = future
+
+        def done(f):
+            self.in_flight.pop(key, None)
+            if not f.cancelled():
+                f.exception()  # retrieved here in case every caller was cancelled
+        future.add_done_callback(done)
+        # Shielded, so that one cancelled caller does not cancel the request of the others
+        return await asyncio.shield(future)
+
+    async def create_stream(self, messages, **kwargs):
+        self.requests += 1
+        estimated = self.estimate_tokens(messages)
+        attempt = 0
+        while True:
+            await self.admit(estimated)
+            stream = self.client.create_stream(messages, **kwargs)
+            try:
+                first = await self.with_timeout(anext(stream))
+                break
+            except Exception as e:
+                await self.backoff(attempt, e)
+                attempt += 1
+        self.settle(estimated, first)
+        yield first
+        async for chunk in stream:
+            self.settle(estimated, chunk)
+            yield chunk
+
+    def metrics(self):
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "mean_wait_s": round(self.wait_time / self.waits, 3) if self.waits else 0.0,
+            "max_wait_s": round(self.max_wait, 3),
+            "total_wait_s": round(self.wait_time, 3),
+        }
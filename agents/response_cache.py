@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import time
+from autogen_core.models import CreateResult
+from autogen_core.tools import Tool
+from pydantic import BaseModel
+from .client_base import ChatCompletionClientWrapper
+from .file_writer import atomic_write
+
+CACHE_MODES = ("read_through", "record", "replay")
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a request has no recorded completion."""
+
+
+class DiskResponseStore:
+    """
+    Completions stored as JSON files named by their key, evicted least-recently-used first
+    once the store grows past max_bytes. A hit refreshes the file mtime, which orders the LRU.
+    """
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in os.listdir(cache_dir):
+            if name.endswith('.json'):
+                stat = os.stat(os.path.join(cache_dir, name))
+                self.entries[name[:-5]] = (stat.st_mtime, stat.st_size)
+        self.total_bytes = sum(size for _, size in self.entries.values())
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        try:
+            with open(self.path(key), 'r') as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.discard(key)
+            return None
+        now = time.time()
+        os.utime(self.path(key), (now, now))
+        self.entries[key] = (now, self.entries[key][1])
+        return value
+
+    def set(self, key, value):
+        content = json.dumps(value)
+        self.discard(key)
+        atomic_write(self.path(key), content)
+        size = len(content.encode())
+        self.entries[key] = (time.time(), size)
+        self.total_bytes += size
+        self.evict()
+
+    def discard(self, key):
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+            if os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+
+    def evict(self):
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1][0]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.discard(key)
+
+
+def request_key(model_name, parameters, messages, tools=(), tool_choice="auto", json_output=None, extra_create_args=None):
+    """Content hash of a model request: model name, parameters, messages, tool schemas and output options."""
+    if isinstance(json_output, type) and issubclass(json_output, BaseModel):
+        json_output = json_output.model_json_schema()
+    data = {
+        "model": model_name,
+        "parameters": parameters,
+        "messages": [message.model_dump(mode='json') for message in messages],
+        "tools": [tool.schema if isinstance(tool, Tool) else tool for tool in tools],
+        "tool_choice": tool_choice if isinstance(tool_choice, str) else tool_choice.name,
+        "json_output": json_output,
+        "extra_create_args": extra_create_args or {},
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CachingChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Content-addressed response cache around a model client. Requests are keyed on the model name,
+    parameters, messages, tool schemas and output options.
+
+    Modes:
+        read_through: return cached completions and record misses.
+        record: always call the model and overwrite the stored completion.
+        replay: only return cached completions, raise CacheMissError on a miss (for CI dry-runs).
+    """
+    def __init__(self, client, store, model_name="", parameters=None, mode="read_through"):
+        super().__init__(client)
+        assert mode in CACHE_MODES, f"Unknown cache mode {mode}, expected one of {CACHE_MODES}."
+        self.store = store
+        self.model_name = model_name
+        self.parameters = parameters or {}
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(self, messages, tools=(), tool_choice="auto", json_output=None, extra_create_args=None):
+        return request_key(self.model_name, self.parameters, messages, tools, tool_choice, json_output, extra_create_args)
+
+    def lookup(self, key):
+        if self.mode == "record":
+            return None
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"No recorded completion for request {key} (replay mode).")
+            return None
+        self.hits += 1
+        result = CreateResult.model_validate(value)
+        result.cached = True
+        return result
+
+    async def create(self, messages, *, tools=[], tool_choice="auto", json_output=None, extra_create_args={}, cancellation_token=None):
+        key = self.cache_key(messages, tools, tool_choice, json_output, extra_create_args)
+        result = self.lookup(key)
+        if result is not None:
+            return result
+        result = await self.client.create(
+            messages, tools=tools, tool_choice=tool_choice, json_output=json_output,
+            extra_create_args=extra_create_args, cancellation_token=cancellation_token)
+        self.store.set(key, result.model_dump(mode='json'))
+        return result
+
+    async def create_stream(self, messages, *, tools=[], tool_choice="auto", json_output=None, extra_create_args={}, cancellation_token=None):
+        key = self.cache_key(messages, tools, tool_choice, json_output, extra_create_args)
+        result = self.lookup(key)
+        if result is not None:
+            yield result
+            return
+        async for chunk in self.client.create_stream(
+                messages, tools=tools, tool_choice=tool_choice, json_output=json_output,
+                extra_create_args=extra_create_args, cancellation_token=cancellation_token):
+            if isinstance(chunk, CreateResult):
+                self.store.set(key, chunk.model_dump(mode='json'))
+            yield chunk
@@ -0,0 +1,168 @@
+import json
+import math
+import os
+import re
+import stat
+from collections import Counter
+from .file_writer import atomic_write
+
+WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_]*")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# Python files are scanned with regexes rather than parsed: several times faster, and files with syntax errors are covered too
+DEF_RE = re.compile(r"^\s*(?:async\s+)?(?:def|class)\s+(\w+)", re.MULTILINE)
+ASSIGN_RE = re.compile(r"^([A-Za-z_]\w*)\s*(?::[^=\n]*)?=", re.MULTILINE)
+IMPORT_RE = re.compile(r"^\s*(?:from\s+([\w.]+)\s+)?import\s+([^\n#]+)", re.MULTILINE)
+DOCSTRING_RE = re.compile(r"(\"\"\"|\'\'\')(.*?)\1", re.DOTALL)
+COMMENT_RE = re.compile(r"#([^\n]*)")
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has in is it of on or that the this to was were will with
+    add all any can code create file files function functions make new should use when which
+    self cls none true false return import def class
+""".split())
+# Path terms say more about a file than the words of its body, so they are counted several times
+PATH_WEIGHT = 3
+NAME_WEIGHT = 2
+MAX_READ_BYTES = 256 * 1024
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms. Identifiers yield both themselves and their
+    snake_case/camelCase parts, so 'parse_code_output' also matches a query about 'output'.
+    """
+    terms = []
+    for word in WORD_RE.findall(text):
+        lower = word.lower()
+        parts = [p.lower() for piece in word.split('_') for p in CAMEL_RE.findall(piece)]
+        if len(parts) > 1 and lower not in STOPWORDS:
+            terms.append(lower)
+        terms.extend(p for p in parts if len(p) > 1 and p not in STOPWORDS)
+    return terms
+
+
+def python_terms(source):
+    """Terms of the names, imports, docstrings and comments of a Python file."""
+    names = DEF_RE.findall(source) + ASSIGN_RE.findall(source)
+    for module, imported in IMPORT_RE.findall(source):
+        names += [module, imported]
+    docs = [doc for _, doc in DOCSTRING_RE.findall(source)] + COMMENT_RE.findall(source)
+    return tokenize(' '.join(names)) * NAME_WEIGHT + tokenize(' '.join(docs))
+
+
+def document_terms(rel_path, data):
+    """
+    The term frequencies of one file: its path, and for Python files the names and docstrings of its
+    definitions, otherwise the words of its text. Binary files are only indexed by their path.
+    """
+    terms = tokenize(rel_path.replace('/', ' ').replace('.', ' ')) * PATH_WEIGHT
+    if b'\0' not in data[:8192]:
+        text = data.decode('utf-8', errors='ignore')
+        if rel_path.endswith('.py'):
+            terms += python_terms(text)
+        else:
+            terms += tokenize(text)
+    return dict(Counter(terms))
+
+
+def index_document(workspace, rel_path):
+    """
+    Build the index entry of one file, or return None if it is not a readable file.
+    """
+    full_path = os.path.join(workspace, rel_path)
+    try:
+        stat = os.stat(full_path)
+        with open(full_path, 'rb') as f:
+            data = f.read(MAX_READ_BYTES)
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError):
+        return None
+    terms = document_terms(rel_path, data)
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size, "length": sum(terms.values()), "terms": terms}
+
+
+class RetrievalIndex:
+    """
+    BM25 index over the paths, identifiers and docstrings of the files of a workspace, persisted as JSON.
+    Files are keyed by path, mtime and size, so an update only re-reads the files that changed.
+
+    Args:
+        workspace (str): The code root directory.
+        index_path (str): JSON file holding the index.
+        k1 (float): BM25 term frequency saturation.
+        b (float): BM25 document length normalization.
+    """
+    def __init__(self, workspace, index_path, k1=1.2, b=0.75):
+        self.workspace = workspace
+        self.index_path = index_path
+        self.k1 = k1
+        self.b = b
+        self.entries = {}
+        self.postings = None
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                self.entries = json.load(f).get("entries", {})
+
+    def save(self):
+        atomic_write(self.index_path, json.dumps({"entries": self.entries}))
+
+    def update(self, rel_paths):
+        """
+        Bring the index in line with the given files (e.g. the .caignore-filtered walk of the workspace):
+        new and changed files are indexed, files that are not listed any more are dropped.
+
+        Returns:
+            int: The number of files (re)indexed or dropped.
+        """
+        rel_paths = {os.path.normpath(p) for p in rel_paths}
+        changed = 0
+        for rel_path in list(self.entries):
+            if rel_path not in rel_paths:
+                del self.entries[rel_path]
+                changed += 1
+        for rel_path in sorted(rel_paths):
+            entry = self.entries.get(rel_path)
+            try:
+                file_stat = os.stat(os.path.join(self.workspace, rel_path))
+            except OSError:
+                continue
+            if stat.S_ISDIR(file_stat.st_mode):
+                continue
+            if entry is not None and entry["mtime"] == file_stat.st_mtime_ns and entry["size"] == file_stat.st_size:
+                continue
+            entry = index_document(self.workspace, rel_path)
+            if entry is not None:
+                self.entries[rel_path] = entry
+                changed += 1
+        if changed:
+            self.postings = None
+            self.save()
+        return changed
+
+    def build_postings(self):
+        postings = {}
+        for rel_path, entry in self.entries.items():
+            for term, count in entry["terms"].items():
+                postings.setdefault(term, []).append((rel_path, count))
+        self.postings = postings
+        self.mean_length = sum(e["length"] for e in self.entries.values()) / max(1, len(self.entries))
+
+    def search(self, query, k=30):
+        """
+        Rank the indexed files against the query with BM25.
+
+        Returns:
+            list: Up to k (relative path, score) tuples, best first. Files sharing no term with the query are left out.
+        """
+        if self.postings is None:
+            self.build_postings()
+        n = len(self.entries)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for rel_path, count in postings:
+                length = self.entries[rel_path]["length"]
+                norm = self.k1 * (1 - self.b + self.b * length / self.mean_length)
+                scores[rel_path] += idf * count * (self.k1 + 1) / (count + norm)
+        return [(rel_path, round(score, 3)) for rel_path, score in scores.most_common(k)]
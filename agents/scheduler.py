@@ -0,0 +1,109 @@
+import asyncio
+import os
+
+
+def _norm(path):
+    return os.path.normpath(path).strip(os.sep) if path else ""
+
+
+def _is_within(path, parent):
+    """Return True if `path` equals `parent` or lies below it."""
+    return path == parent or path.startswith(parent + os.sep)
+
+
+def step_waits(coding_steps, i):
+    """
+    Return the indices of the earlier steps that step i must wait for.
+
+    A step waits for an earlier step if it reads a path the earlier step writes,
+    writes a path the earlier step reads or writes, or writes inside a directory
+    the earlier step creates. Only earlier steps are considered, so the waits of a
+    step are known as soon as the steps before it are.
+    """
+    step = coding_steps[i]
+    reads = [_norm(d) for d in step.get('dependencies', [])]
+    write = _norm(step.get('save_path', ''))
+    waits = set()
+    for j in range(i):
+        prev = coding_steps[j]
+        prev_reads = [_norm(d) for d in prev.get('dependencies', [])]
+        prev_write = _norm(prev.get('save_path', ''))
+        if prev_write and (
+            any(_is_within(r, prev_write) or _is_within(prev_write, r) for r in reads)
+            or (write and (_is_within(write, prev_write) or _is_within(prev_write, write)))
+        ):
+            # read-after-write, write-after-write, or write inside a created directory
+            waits.add(j)
+        elif write and any(_is_within(write, r) or _is_within(r, write) for r in prev_reads):
+            # write-after-read: the earlier step must see the original file
+            waits.add(j)
+    return waits
+
+
+def build_step_graph(coding_steps):
+    """
+    Build the dependency graph of the coding steps in a plan.
+
+    Edges only point backwards in plan order, so the graph is always acyclic
+    and a sequential run gives the same result.
+
+    Args:
+        coding_steps (list): The 'plan' entries of plan.json.
+
+    Returns:
+        dict: Maps each step index (position in `coding_steps`) to the set of
+            indices it must wait for.
+    """
+    return {i: step_waits(coding_steps, i) for i in range(len(coding_steps))}
+
+
+async def run_steps(coding_steps, run_step, max_concurrency=1):
+    """
+    Run the coding steps of a plan, overlapping the ones that do not depend on each other.
+
+    Args:
+        coding_steps (list): The 'plan' entries of plan.json.
+        run_step (callable): Coroutine function called with a single coding step.
+        max_concurrency (int): Maximum number of steps running at the same time.
+
+    Returns:
+        list: The results of `run_step`, in plan order.
+    """
+    async def steps():
+        for step in coding_steps:
+            yield step
+    return await run_steps_streaming(steps(), run_step, max_concurrency=max_concurrency)
+
+
+async def run_steps_streaming(coding_steps, run_step, max_concurrency=1):
+    """
+    Run coding steps as they arrive from an async iterator, e.g. while the planner is still
+    generating the rest of the plan. Each step is scheduled on arrival behind the earlier
+    steps it depends on, which are all known by then.
+
+    Args:
+        coding_steps: Async iterator of the 'plan' entries, in plan order.
+        run_step (callable): Coroutine function called with a single coding step.
+        max_concurrency (int): Maximum number of steps running at the same time.
+
+    Returns:
+        list: The results of `run_step`, in plan order.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    steps, tasks = [], {}
+
+    async def run_one(i, waits):
+        if waits:
+            await asyncio.gather(*(tasks[j] for j in waits))
+        async with semaphore:
+            return await run_step(steps[i])
+
+    try:
+        async for step in coding_steps:
+            steps.append(step)
+            i = len(steps) - 1
+            tasks[i] = asyncio.ensure_future(run_one(i, step_waits(steps, i)))
+        return list(await asyncio.gather(*(tasks[i] for i in range(len(steps)))))
+    finally:
+        for task in tasks.values():
+            task.cancel()
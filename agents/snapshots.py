@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+import threading
+import time
+from .file_writer import atomic_write
+from .workspace_io import hash_file
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot does not exist or one of its blobs was modified."""
+
+
+class SnapshotStore:
+    """
+    Copy-on-write snapshots of the workspace at the boundaries of the coding steps.
+
+    A snapshot does not copy the workspace: it only records the files a step is about to write, right
+    before they are written. The prior content of each file is kept once as a content-addressed blob,
+    hardlinked from the workspace file when possible. Steps replace files through a rename (see
+    atomic_write), so the linked content stays as it was; finish() copies the blobs of files that were
+    not replaced. A file or directory that did not exist is recorded as absent. Rolling back restores
+    only the recorded files, so it costs O(changed files) whatever the size of the workspace.
+
+    Args:
+        workspace (str): The code root directory.
+        root (str): Directory of the manifest and the blobs.
+        keep (int): Number of most recent snapshots kept by gc().
+        link (bool): Hardlink blobs from the workspace files instead of copying them.
+    """
+    def __init__(self, workspace, root, keep=50, link=True):
+        self.workspace = workspace
+        self.root = root
+        self.keep = keep
+        self.link = link
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.lock = threading.Lock()
+        self.snapshots = []
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                self.snapshots = json.load(f).get("snapshots", [])
+
+    def save(self):
+        atomic_write(self.manifest_path, json.dumps({"snapshots": self.snapshots}, indent=1))
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[:2], digest)
+
+    def store_blob(self, full_path, link):
+        digest = hash_file(full_path)
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp_path = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(full_path, tmp_path) if link else shutil.copy2(full_path, tmp_path)
+            except OSError:
+                # e.g. the blobs are on another filesystem
+                shutil.copy2(full_path, tmp_path)
+            os.replace(tmp_path, blob)
+        return digest
+
+    def get(self, snapshot_id):
+        for snapshot in self.snapshots:
+            if snapshot["id"] == snapshot_id:
+                return snapshot
+        raise SnapshotError(f"No snapshot {snapshot_id} in {self.manifest_path}.")
+
+    def find(self, step, run=None):
+        """The snapshot of a step of a run, the most recent run by default."""
+        run = run or (self.snapshots[-1]["run"] if self.snapshots else None)
+        for snapshot in self.snapshots:
+            if snapshot["run"] == run and snapshot["step"] == step:
+                return snapshot
+        raise SnapshotError(f"No snapshot of step {step} in run {run}.")
+
+    def record(self, snapshot_id, rel_paths, run=None, step=None, link=None):
+        """
+        Record the current state of the paths a step is about to write in its snapshot, which is created
+        on first use. Paths already recorded by the snapshot keep their first state, i.e. the one before the step.
+        The missing parent directories of new files are recorded as absent too.
+        """
+        link = self.link if link is None else link
+        with self.lock:
+            snapshot = next((s for s in self.snapshots if s["id"] == snapshot_id), None)
+            if snapshot is None:
+                snapshot = {"id": snapshot_id, "run": run, "step": step, "created": time.time(), "files": {}}
+                self.snapshots.append(snapshot)
+            files = snapshot["files"]
+            for rel_path in rel_paths:
+                rel_path = os.path.normpath(rel_path)
+                full_path = os.path.join(self.workspace, rel_path)
+                if rel_path in files:
+                    continue
+                if os.path.isdir(full_path):
+                    files[rel_path] = "dir"
+                elif os.path.exists(full_path):
+                    files[rel_path] = self.store_blob(full_path, link)
+                else:
+                    files[rel_path] = None
+                    parent = os.path.dirname(rel_path)
+                    while parent and not os.path.exists(os.path.join(self.workspace, parent)):
+                        files.setdefault(parent, None)
+                        parent = os.path.dirname(parent)
+            self.save()
+
+    def finish(self, snapshot_id):
+        """Copy the blobs still linked to a workspace file that the step did not replace, so that editing it in place cannot change them."""
+        with self.lock:
+            snapshot = next((s for s in self.snapshots if s["id"] == snapshot_id), None)
+            for rel_path, digest in (snapshot["files"].items() if snapshot else ()):
+                if digest in (None, "dir"):
+                    continue
+                blob = self.blob_path(digest)
+                try:
+                    linked = os.path.samefile(blob, os.path.join(self.workspace, rel_path))
+                except OSError:
+                    continue
+                if linked:
+                    tmp_path = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    shutil.copy2(blob, tmp_path)
+                    os.replace(tmp_path, blob)
+
+    def restore(self, rel_path, digest):
+        full_path = os.path.join(self.workspace, rel_path)
+        if digest == "dir":
+            os.makedirs(full_path, exist_ok=True)
+        elif digest is None:
+            if os.path.isdir(full_path) and not os.path.islink(full_path):
+                try:
+                    os.rmdir(full_path)
+                except OSError:
+                    pass  # holds files that the snapshot did not create
+            elif os.path.lexists(full_path):
+                os.remove(full_path)
+        else:
+            blob = self.blob_path(digest)
+            if not os.path.exists(blob) or hash_file(blob) != digest:
+                raise SnapshotError(f"The snapshot content of {rel_path} is missing or was modified ({blob}).")
+            os.makedirs(os.path.dirname(full_path) or self.workspace, exist_ok=True)
+            tmp_path = os.path.join(os.path.dirname(full_path), f".{os.path.basename(full_path)}.restore.tmp")
+            shutil.copy2(blob, tmp_path)
+            os.replace(tmp_path, full_path)
+
+    def rollback(self, snapshot_id, include_later=True):
+        """
+        Restore the workspace files to their state before the step of snapshot_id.
+
+        Args:
+            snapshot_id (str): The snapshot to roll back to.
+            include_later (bool): Also undo every snapshot taken after it (a rollback to the step boundary).
+                Otherwise only this step is undone, and the paths that later snapshots also wrote are left as they are.
+
+        Returns:
+            dict: {"restored": [...], "skipped": [...]} relative paths.
+        """
+        with self.lock:
+            index = next((i for i, s in enumerate(self.snapshots) if s["id"] == snapshot_id), None)
+            if index is None:
+                raise SnapshotError(f"No snapshot {snapshot_id} in {self.manifest_path}.")
+            undone = self.snapshots[index:] if include_later else [self.snapshots[index]]
+            later = set() if include_later else {p for s in self.snapshots[index + 1:] for p in s["files"]}
+            # The first snapshot that recorded a path holds its state before all the undone steps
+            states = {}
+            for snapshot in undone:
+                for rel_path, digest in snapshot["files"].items():
+                    if rel_path not in later:
+                        states.setdefault(rel_path, digest)
+            # Files before directories, and deeper directories before their parents
+            for rel_path in sorted(states, key=lambda p: (states[p] is None and os.path.isdir(os.path.join(self.workspace, p)), -p.count(os.sep))):
+                self.restore(rel_path, states[rel_path])
+            self.snapshots = [s for s in self.snapshots if s not in undone]
+            self.save()
+        return {"restored": sorted(states), "skipped": sorted(later & {p for s in undone for p in s["files"]})}
+
+    def gc(self, keep=None):
+        """
+        Drop all but the `keep` most recent snapshots and delete the blobs no snapshot refers to.
+
+        Returns:
+            int: The number of deleted blobs.
+        """
+        keep = self.keep if keep is None else keep
+        with self.lock:
+            if len(self.snapshots) > keep:
+                self.snapshots = self.snapshots[len(self.snapshots) - keep:]
+                self.save()
+            referenced = {d for s in self.snapshots for d in s["files"].values() if d not in (None, "dir")}
+            removed = 0
+            blob_root = os.path.join(self.root, 'blobs')
+            for directory, _, names in os.walk(blob_root):
+                for name in names:
+                    if name not in referenced:
+                        os.remove(os.path.join(directory, name))
+                        removed += 1
+        return removed
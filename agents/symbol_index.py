@@ -0,0 +1,115 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from .definitions import empty_definitions, extract_definitions
+from .file_writer import atomic_write
+
+
+def index_file(workspace, rel_path):
+    """
+    Parse one file of the workspace into an index entry. Top-level so it can run in a process pool.
+
+    Returns:
+        dict or None: The entry, or None if the file does not exist.
+    """
+    full_path = os.path.join(workspace, rel_path)
+    try:
+        stat = os.stat(full_path)
+        with open(full_path, 'rb') as f:
+            data = f.read()
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+    entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha1": hashlib.sha1(data).hexdigest()}
+    entry["definitions"] = parse_definitions(rel_path, data)
+    return entry
+
+
+def parse_definitions(rel_path, data):
+    definitions = empty_definitions()
+    if rel_path.endswith('.py'):
+        try:
+            return extract_definitions(rel_path, data.decode('utf-8'))
+        except (SyntaxError, UnicodeDecodeError, ValueError):
+            pass
+    definitions["files"].append({"path": rel_path, "description": ""})
+    return definitions
+
+
+class SymbolIndex:
+    """
+    Incremental index of the classes, functions and files of a workspace, persisted as JSON
+    and keyed by path, mtime, size and content hash. Only files whose stat or hash changed are re-parsed.
+    """
+    def __init__(self, workspace, index_path, max_workers=None, parallel_threshold=32):
+        self.workspace = workspace
+        self.index_path = index_path
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        self.entries = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                self.entries = json.load(f).get("entries", {})
+
+    def save(self):
+        atomic_write(self.index_path, json.dumps({"entries": self.entries}))
+
+    def stale_paths(self, rel_paths):
+        """Return the paths whose mtime or size differ from the index."""
+        stale = []
+        for rel_path in rel_paths:
+            entry = self.entries.get(rel_path)
+            try:
+                stat = os.stat(os.path.join(self.workspace, rel_path))
+            except FileNotFoundError:
+                if entry is not None:
+                    stale.append(rel_path)
+                continue
+            if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                stale.append(rel_path)
+        return stale
+
+    def update(self, rel_paths):
+        """
+        Re-parse the given files if they changed since they were indexed, and persist the index.
+
+        Args:
+            rel_paths (list): Paths relative to the workspace. Directories are ignored.
+
+        Returns:
+            list: The paths whose definitions changed.
+        """
+        rel_paths = [os.path.normpath(p) for p in rel_paths if not os.path.isdir(os.path.join(self.workspace, p))]
+        stale = self.stale_paths(rel_paths)
+        if not stale:
+            return []
+        if len(stale) >= self.parallel_threshold and self.max_workers != 1:
+            # Spawned rather than forked: update runs in a worker thread of the event loop process (see WorkspaceIO)
+            with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                new_entries = list(pool.map(index_file, [self.workspace] * len(stale), stale, chunksize=16))
+        else:
+            new_entries = [index_file(self.workspace, rel_path) for rel_path in stale]
+        changed = []
+        for rel_path, entry in zip(stale, new_entries):
+            old = self.entries.get(rel_path)
+            if entry is None:
+                self.entries.pop(rel_path, None)
+                changed.append(rel_path)
+                continue
+            if old is None or old["sha1"] != entry["sha1"]:
+                changed.append(rel_path)
+            self.entries[rel_path] = entry
+        self.save()
+        return changed
+
+    def definitions(self):
+        """Return all indexed definitions in the extra_definitions.json schema."""
+        definitions = empty_definitions()
+        for rel_path in sorted(self.entries):
+            for key in definitions:
+                definitions[key].extend(self.entries[rel_path]["definitions"][key])
+        return definitions
+
+    def write_definitions(self, definitions_path):
+        atomic_write(definitions_path, json.dumps(self.definitions(), indent=4))
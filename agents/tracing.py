@@ -0,0 +1,189 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from autogen_core.models import CreateResult
+from .client_base import ChatCompletionClientWrapper
+from .utils import print_colored
+
+current_span = contextvars.ContextVar("current_span", default=None)
+current_run = contextvars.ContextVar("current_run", default=None)
+
+
+class Tracer:
+    """
+    Records spans (name, category, start, duration and free-form args such as token counts)
+    and exports them in the Chrome trace-event format (chrome://tracing, ui.perfetto.dev).
+    Spans of one asyncio task share a trace lane, so concurrent plan steps show side by side.
+    """
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.lanes = {}
+        self.lock = threading.Lock()
+
+    def lane(self):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else f"thread-{threading.get_ident()}"
+        with self.lock:
+            return self.lanes.setdefault(key, len(self.lanes) + 1)
+
+    @contextmanager
+    def span(self, name, cat, **args):
+        """
+        Record a span around a block. Yields the span dict, whose args can be updated inside the block.
+        A span of category 'run' tags every span opened below it with its name, for per-run summaries.
+        """
+        parent = current_span.get()
+        span = {
+            "name": name, "cat": cat, "args": dict(args), "tid": self.lane(),
+            "run": name if cat == "run" else current_run.get(),
+            "parent": parent["name"] if parent else None,
+        }
+        span_token = current_span.set(span)
+        run_token = current_run.set(span["run"])
+        span["start"] = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["args"]["error"] = repr(e)
+            raise
+        finally:
+            span["duration"] = time.perf_counter() - span["start"]
+            current_run.reset(run_token)
+            current_span.reset(span_token)
+            with self.lock:
+                self.spans.append(span)
+
+    def chrome_trace(self):
+        events = []
+        for span in self.spans:
+            events.append({
+                "name": span["name"], "cat": span["cat"], "ph": "X", "pid": 1, "tid": span["tid"],
+                "ts": round((span["start"] - self.origin) * 1e6), "dur": round(span["duration"] * 1e6),
+                "args": dict(span["args"], run=span["run"], parent=span["parent"]),
+            })
+        return {"traceEvents": sorted(events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self, run=None):
+        """
+        Aggregate the spans of a run per category and name.
+
+        Returns:
+            list: Rows with count, total/max seconds, prompt/completion tokens, prompt cache hits
+                (reported by the provider, and estimated from the repeated prompt prefixes) and retries.
+        """
+        rows = {}
+        for span in self.spans:
+            if run is not None and span["run"] != run:
+                continue
+            name = span["name"] if span["cat"] not in ("llm", "mcp", "io") else span["args"].get("caller") or span["name"]
+            row = rows.setdefault((span["cat"], name), {
+                "cat": span["cat"], "name": name, "count": 0, "total_s": 0.0, "max_s": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "prompt_cache_hit_tokens": 0, "prefix_reuse_tokens": 0, "retries": 0})
+            row["count"] += 1
+            row["total_s"] += span["duration"]
+            row["max_s"] = max(row["max_s"], span["duration"])
+            for key in ("prompt_tokens", "completion_tokens", "prompt_cache_hit_tokens", "prefix_reuse_tokens", "retries"):
+                row[key] += span["args"].get(key, 0) or 0
+        return sorted(rows.values(), key=lambda r: -r["total_s"])
+
+    def print_summary(self, run=None):
+        rows = self.summary(run)
+        print_colored("#"*50 + f"[Trace] Summary{' of ' + run if run else ''}" + "#"*50, "blue")
+        header = (f"{'category':<8} {'name':<32} {'count':>5} {'total s':>9} {'max s':>8} {'prompt tok':>10} {'compl tok':>9} "
+                  f"{'cache hit':>9} {'prefix %':>8} {'retries':>7}")
+        print_colored(header, "cyan")
+        for r in rows:
+            prefix = f"{100 * r['prefix_reuse_tokens'] / r['prompt_tokens']:.0f}" if r['prompt_tokens'] else "-"
+            print_colored(f"{r['cat']:<8} {r['name'][:32]:<32} {r['count']:>5} {r['total_s']:>9.2f} {r['max_s']:>8.2f} "
+                          f"{r['prompt_tokens']:>10} {r['completion_tokens']:>9} {r['prompt_cache_hit_tokens']:>9} {prefix:>8} {r['retries']:>7}", "green")
+
+    def clear(self):
+        self.spans.clear()
+        self.lanes.clear()
+
+
+def prompt_text(messages):
+    return '\n'.join(f"{type(m).__name__}: {m.content if isinstance(m.content, str) else m.content!r}" for m in messages)
+
+
+class PrefixReuse:
+    """
+    Estimate the share of each prompt that repeats the beginning of an earlier prompt, which is what a
+    provider's prompt prefix cache can serve. Prompts are hashed cumulatively in chunks of chunk_chars,
+    and at most max_prefixes hashes are kept.
+    """
+    def __init__(self, chunk_chars=256, max_prefixes=200000):
+        self.chunk_chars = chunk_chars
+        self.max_prefixes = max_prefixes
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def reused_fraction(self, text):
+        digest, matched, prefixes = hashlib.sha1(), 0, []
+        data = text.encode('utf-8', errors='ignore')
+        for start in range(0, len(data) - self.chunk_chars + 1, self.chunk_chars):
+            digest.update(data[start:start + self.chunk_chars])
+            prefixes.append(digest.digest())
+        with self.lock:
+            for prefix in prefixes:
+                if prefix not in self.seen:
+                    break
+                matched += self.chunk_chars
+            if len(self.seen) + len(prefixes) > self.max_prefixes:
+                self.seen.clear()
+            self.seen.update(prefixes)
+        return matched / len(data) if data else 0.0
+
+
+class TracingChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Records an 'llm' span with token usage around every model call, with the estimated number of
+    prompt tokens repeating the prefix of an earlier prompt (see PrefixReuse).
+    """
+    def __init__(self, client, tracer):
+        super().__init__(client)
+        self.tracer = tracer
+        self.prefix_reuse = PrefixReuse()
+
+    def caller(self):
+        parent = current_span.get()
+        return parent["name"] if parent else None
+
+    def record_usage(self, span, result, reused):
+        span["args"]["prompt_tokens"] = result.usage.prompt_tokens
+        span["args"]["completion_tokens"] = result.usage.completion_tokens
+        span["args"]["prefix_reuse_tokens"] = round(reused * result.usage.prompt_tokens)
+        span["args"]["cached"] = bool(result.cached)
+
+    async def create(self, messages, **kwargs):
+        with self.tracer.span("create", "llm", caller=self.caller(), retries=0) as span:
+            reused = self.prefix_reuse.reused_fraction(prompt_text(messages))
+            result = await self.client.create(messages, **kwargs)
+            self.record_usage(span, result, reused)
+            return result
+
+    async def create_stream(self, messages, **kwargs):
+        with self.tracer.span("create_stream", "llm", caller=self.caller(), retries=0) as span:
+            reused = self.prefix_reuse.reused_fraction(prompt_text(messages))
+            async for chunk in self.client.create_stream(messages, **kwargs):
+                if isinstance(chunk, CreateResult):
+                    self.record_usage(span, chunk, reused)
+                yield chunk
+
+
+# Shared by all agents of a process
+tracer = Tracer()
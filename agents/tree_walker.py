@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+from .file_writer import atomic_write
+
+
+def translate_pattern(pattern):
+    """
+    Translate one gitignore pattern into a regex over '/'-separated relative paths.
+    Directories are matched with a trailing '/', so directory-only patterns ('build/') skip files.
+
+    Returns:
+        tuple: (regex, negate)
+    """
+    negate = pattern.startswith('!')
+    if negate:
+        pattern = pattern[1:]
+    if pattern.startswith('\\'):
+        pattern = pattern[1:]
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    # A separator at the beginning or in the middle anchors the pattern to the root
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    regex, i = '', 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            # Everything inside the directory, but not the directory itself
+            regex += '/.+'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            regex += '[' + body.replace('\\', '\\\\') + ']'
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    prefix = '' if anchored else '(?:.*/)?'
+    return prefix + regex + ('/' if dir_only else '/?'), negate
+
+
+class IgnoreMatcher:
+    """
+    All patterns of a .caignore file compiled into a single regex with gitignore semantics:
+    the last matching pattern wins and '!' patterns re-include paths.
+    """
+    def __init__(self, patterns):
+        self.patterns = [p.rstrip() for p in patterns if p.strip() and not p.strip().startswith('#')]
+        translated = [translate_pattern(p) for p in self.patterns]
+        self.negations = [negate for _, negate in translated]
+        # Alternatives are tried in order, so reversing them makes the last pattern of the file win
+        alternatives = [f"(?P<p{i}>{regex})" for i, (regex, _) in reversed(list(enumerate(translated)))]
+        self.regex = re.compile('|'.join(alternatives)) if alternatives else None
+        self.digest = hashlib.sha1('\n'.join(self.patterns).encode()).hexdigest()
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as f:
+            return cls(f.read().splitlines())
+
+    def ignored(self, rel_path, is_dir=False):
+        if self.regex is None:
+            return False
+        match = self.regex.fullmatch(rel_path + '/' if is_dir else rel_path)
+        return match is not None and not self.negations[int(match.lastgroup[1:])]
+
+
+def walk_workspace(workspace, matcher, cache_path=None, with_dirs=False):
+    """
+    List the directories and files of the workspace that are not ignored, as sorted relative paths.
+    Ignored and hidden directories are pruned instead of walked. With a cache_path, the listing of
+    every directory is cached by its mtime, so later runs only rescan directories that changed.
+
+    Args:
+        workspace (str): The code root directory.
+        matcher (IgnoreMatcher): The compiled .caignore patterns.
+        cache_path (str): Optional JSON file holding the listing cache.
+        with_dirs (bool): Also return which of the paths are directories.
+
+    Returns:
+        list: Relative paths of the kept directories and files,
+            or a tuple (paths, set of the directory paths) with with_dirs=True.
+    """
+    old_cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if cached.get("patterns") == matcher.digest:
+            old_cache = cached.get("dirs", {})
+    new_cache = {}
+    file_structure = []
+    directories = set()
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop()
+        full_dir = os.path.join(workspace, rel_dir) if rel_dir else workspace
+        try:
+            mtime = os.stat(full_dir).st_mtime_ns
+        except OSError:
+            continue
+        listing = old_cache.get(rel_dir)
+        if listing is None or listing["mtime"] != mtime:
+            listing = {"mtime": mtime, "dirs": [], "links": [], "files": []}
+            with os.scandir(full_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    is_dir = entry.is_dir()
+                    if matcher.ignored(rel_path, is_dir=is_dir):
+                        continue
+                    if not is_dir:
+                        listing["files"].append(entry.name)
+                    elif entry.is_symlink():
+                        listing["links"].append(entry.name)
+                    else:
+                        listing["dirs"].append(entry.name)
+        new_cache[rel_dir] = listing
+        for name in listing["dirs"]:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            file_structure.append(rel_path)
+            directories.add(os.path.normpath(rel_path))
+            pending.append(rel_path)
+        for name in listing["links"] + listing["files"]:
+            file_structure.append(f"{rel_dir}/{name}" if rel_dir else name)
+    if cache_path:
+        atomic_write(cache_path, json.dumps({"patterns": matcher.digest, "dirs": new_cache}))
+    file_structure = sorted(os.path.normpath(p) for p in file_structure)
+    return (file_structure, directories) if with_dirs else file_structure
@@ -0,0 +1,291 @@
+import ast
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .file_writer import atomic_write
+
+# Handlers that make an import optional, e.g. `try: import ujson as json` / `except ImportError:`
+OPTIONAL_IMPORT_HANDLERS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+MAX_TEST_OUTPUT = 4000
+
+
+def guards_imports(handler):
+    if handler.type is None:
+        return True
+    types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(isinstance(t, ast.Name) and t.id in OPTIONAL_IMPORT_HANDLERS for t in types)
+
+
+def collect_imports(node, imports, optional=False):
+    """Append the imports under node as dicts, skipping the ones guarded by an except ImportError."""
+    if isinstance(node, ast.Try) or type(node).__name__ == 'TryStar':
+        guarded = optional or any(guards_imports(h) for h in node.handlers)
+        for child in node.body:
+            collect_imports(child, imports, guarded)
+        for child in node.handlers + node.orelse + node.finalbody:
+            collect_imports(child, imports, optional)
+        return
+    if isinstance(node, ast.Import) and not optional:
+        imports.extend({"module": alias.name, "names": [], "level": 0, "line": node.lineno} for alias in node.names)
+    elif isinstance(node, ast.ImportFrom) and not optional:
+        imports.append({"module": node.module or "", "names": [alias.name for alias in node.names],
+                        "level": node.level, "line": node.lineno})
+    for child in ast.iter_child_nodes(node):
+        collect_imports(child, imports, optional)
+
+
+def collect_names(body, names):
+    """Add the names bound at module level, also inside if/try/with blocks. Returns True if some names are dynamic."""
+    dynamic = False
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            dynamic |= node.name == '__getattr__'
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            for target in (node.targets if isinstance(node, ast.Assign) else [node.target]):
+                names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                dynamic |= alias.name == '*'
+                names.add(alias.asname or alias.name.split('.')[0])
+        elif isinstance(node, (ast.If, ast.For, ast.While, ast.With, ast.AsyncWith)):
+            dynamic |= collect_names(node.body + node.orelse if hasattr(node, 'orelse') else node.body, names)
+        elif isinstance(node, ast.Try) or type(node).__name__ == 'TryStar':
+            dynamic |= collect_names(node.body + node.orelse + node.finalbody, names)
+            for handler in node.handlers:
+                dynamic |= collect_names(handler.body, names)
+    return dynamic
+
+
+def check_file(full_path):
+    """
+    Compile one Python file and collect its imports and module-level names for import resolution.
+    Top-level so it can run in a process pool; nothing is written (unlike py_compile).
+
+    Returns:
+        dict: {"errors": [...], "imports": [...], "names": [...], "dynamic": bool}
+    """
+    result = {"errors": [], "imports": [], "names": [], "dynamic": False}
+    try:
+        with open(full_path, 'rb') as f:
+            source = f.read()
+        tree = ast.parse(source, filename=full_path)
+        compile(tree, full_path, 'exec', dont_inherit=True)
+    except (SyntaxError, ValueError) as e:
+        line = f"line {e.lineno}: " if getattr(e, 'lineno', None) else ""
+        result["errors"].append(f"{line}{type(e).__name__}: {getattr(e, 'msg', None) or e}")
+        return result
+    except OSError as e:
+        result["errors"].append(f"cannot be read: {e}")
+        return result
+    collect_imports(tree, result["imports"])
+    names = set()
+    result["dynamic"] = collect_names(tree.body, names)
+    result["names"] = sorted(names)
+    return result
+
+
+class Verifier:
+    """
+    Local checks of the Python files saved by a coding step: compilation, resolution of the imports of
+    workspace modules (modules and names that do not exist in the workspace) and an optional test command.
+    Files are checked in a process pool once there are parallel_threshold of them to check, and their
+    results are cached by content hash.
+
+    Args:
+        workspace (str): The code root directory.
+        cache_path (str): JSON file of the per-file results.
+        test_command (str): Optional shell command run in the workspace, failing on a non-zero exit code.
+        test_timeout (float): Seconds before the test command is stopped and counted as failed.
+        max_workers (int): Workers of the process pool, 1 always checks the files in a thread instead.
+        parallel_threshold (int): Fewer files than this are checked in a thread, which is cheaper than starting the pool.
+        source_roots (tuple): Directories of the workspace that top-level modules are imported from.
+    """
+    def __init__(self, workspace, cache_path, test_command=None, test_timeout=600, max_workers=None, parallel_threshold=8,
+                 source_roots=('', 'src')):
+        self.workspace = workspace
+        self.cache_path = cache_path
+        self.test_command = test_command
+        self.test_timeout = test_timeout
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        self.source_roots = source_roots
+        self.pool = None
+        self.test_lock = asyncio.Lock()
+        self.cache = {}
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r') as f:
+                self.cache = json.load(f).get("files", {})
+
+    def save(self):
+        atomic_write(self.cache_path, json.dumps({"files": self.cache}))
+
+    def hashes(self, rel_paths):
+        # Imported here so that the pool workers, which import this module, only load the standard library
+        from .workspace_io import hash_file
+        hashes = {}
+        for rel_path in rel_paths:
+            try:
+                hashes[rel_path] = hash_file(os.path.join(self.workspace, rel_path), 'sha1')
+            except OSError:
+                pass
+        return hashes
+
+    async def check_files(self, rel_paths):
+        """Return the check results of the given files, from the cache or computed in the process pool."""
+        loop = asyncio.get_running_loop()
+        hashes = await asyncio.to_thread(self.hashes, rel_paths)
+        missing = [p for p, h in hashes.items() if h not in self.cache]
+        if missing:
+            full_paths = [os.path.join(self.workspace, p) for p in missing]
+            if self.max_workers == 1 or len(missing) < self.parallel_threshold:
+                results = await asyncio.to_thread(lambda: [check_file(p) for p in full_paths])
+            else:
+                if self.pool is None:
+                    # Spawned rather than forked: the event loop process runs threads (I/O, MCP clients)
+                    self.pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+                chunksize = max(1, min(16, len(full_paths) // (4 * (self.max_workers or os.cpu_count() or 1))))
+                results = await loop.run_in_executor(None, lambda: list(self.pool.map(check_file, full_paths, chunksize=chunksize)))
+            for rel_path, result in zip(missing, results):
+                self.cache[hashes[rel_path]] = result
+            await asyncio.to_thread(self.save)
+        return {p: self.cache[h] for p, h in hashes.items()}
+
+    def module_candidates(self, module):
+        """Workspace paths that could hold a dotted module: (module file, package init, package directory) per source root."""
+        parts = module.split('.')
+        for root in self.source_roots:
+            base = os.path.join(root, *parts) if root else os.path.join(*parts)
+            yield base + '.py', os.path.join(base, '__init__.py'), base
+
+    def find_module(self, module):
+        """
+        Locate a dotted module in the workspace.
+
+        Returns:
+            tuple: (kind, rel_path) with kind 'file' for a module or package __init__, 'namespace' for a
+                directory without __init__.py, or (None, None) if the module is not in the workspace.
+        """
+        for file_path, init_path, dir_path in self.module_candidates(module):
+            if os.path.isfile(os.path.join(self.workspace, file_path)):
+                return 'file', os.path.normpath(file_path)
+            if os.path.isfile(os.path.join(self.workspace, init_path)):
+                return 'file', os.path.normpath(init_path)
+            if os.path.isdir(os.path.join(self.workspace, dir_path)):
+                return 'namespace', os.path.normpath(dir_path)
+        return None, None
+
+    def is_workspace_module(self, top):
+        """Whether a top-level module name refers to the workspace rather than to an installed package."""
+        for file_path, init_path, dir_path in self.module_candidates(top):
+            if os.path.isfile(os.path.join(self.workspace, file_path)) or os.path.isfile(os.path.join(self.workspace, init_path)):
+                return True
+            full_dir = os.path.join(self.workspace, dir_path)
+            # A directory of modules without __init__.py, unless it merely shares the name of a standard module
+            if os.path.isdir(full_dir) and top not in sys.stdlib_module_names and any(f.endswith('.py') for f in os.listdir(full_dir)):
+                return True
+        return False
+
+    def absolute_module(self, rel_path, entry):
+        """The absolute dotted name of an import, resolving relative imports against the package of rel_path."""
+        if not entry["level"]:
+            return entry["module"]
+        package = os.path.dirname(rel_path)
+        for root in self.source_roots:
+            if root and (package + os.sep).startswith(root + os.sep):
+                package = package[len(root) + 1:]
+                break
+        parts = [p for p in package.split(os.sep) if p]
+        parts = parts[:len(parts) - (entry["level"] - 1)] if entry["level"] > 1 else parts
+        return '.'.join(parts + ([entry["module"]] if entry["module"] else []))
+
+    def is_pending(self, module, pending):
+        """Whether a later step of the plan will create or change the module."""
+        for candidate in (c for candidates in self.module_candidates(module) for c in candidates):
+            candidate = os.path.normpath(candidate)
+            if candidate in pending or any(p.startswith(candidate + os.sep) for p in pending):
+                return True
+        return False
+
+    async def resolve_imports(self, results, pending):
+        """Check that the imported workspace modules exist and define the imported names."""
+        problems, wanted = [], {}
+        for rel_path, result in results.items():
+            for entry in result["imports"]:
+                module = self.absolute_module(rel_path, entry)
+                if not module or (not entry["level"] and not self.is_workspace_module(module.split('.')[0])):
+                    continue
+                if self.is_pending(module, pending):
+                    continue
+                kind, module_path = self.find_module(module)
+                if kind is None:
+                    problems.append(f"{rel_path}: line {entry['line']}: No module named '{module}' in the workspace")
+                    continue
+                for name in entry["names"]:
+                    if name == '*' or self.find_module(f"{module}.{name}")[0] is not None or self.is_pending(f"{module}.{name}", pending):
+                        continue
+                    wanted.setdefault(module_path, []).append((rel_path, entry["line"], module, name, kind))
+        targets = await self.check_files([p for p, imports in wanted.items() if imports[0][4] == 'file'])
+        for module_path, imports in wanted.items():
+            target = targets.get(module_path)
+            for rel_path, line, module, name, kind in imports:
+                if kind == 'file' and (target is None or target["errors"] or target["dynamic"] or name in target["names"]):
+                    continue
+                problems.append(f"{rel_path}: line {line}: cannot import name '{name}' from '{module}' ({module_path})")
+        return problems
+
+    async def run_tests(self):
+        """Run the test command in the workspace, one run at a time. Returns the problem, or None if it passes."""
+        async with self.test_lock:
+            process = await asyncio.create_subprocess_shell(
+                self.test_command, cwd=self.workspace, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+            try:
+                output, _ = await asyncio.wait_for(process.communicate(), self.test_timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return f"Test command `{self.test_command}` timed out after {self.test_timeout}s"
+        if process.returncode == 0:
+            return None
+        output = output.decode('utf-8', errors='replace')[-MAX_TEST_OUTPUT:]
+        return f"Test command `{self.test_command}` failed with exit code {process.returncode}:\n{output}"
+
+    async def verify(self, rel_paths, pending=(), run_tests=True, provisional_imports=False):
+        """
+        Verify the files saved by a step.
+
+        Args:
+            rel_paths (list): Saved paths relative to the workspace; only Python files are checked.
+            pending (set): Save paths of steps that are not finished yet, whose modules may not exist yet.
+            run_tests (bool): Also run the test command, if there is one.
+            provisional_imports (bool): Report unresolved imports as provisional rather than as problems,
+                e.g. while the steps that may create their modules are not all known yet.
+
+        Returns:
+            dict: {"ok": bool, "problems": [...], "provisional": [...], "checked": int,
+                "tests": "passed"|"failed"|"skipped", "duration_s": float}
+        """
+        start = time.perf_counter()
+        python_paths = [os.path.normpath(p) for p in rel_paths if p.endswith('.py')]
+        results = await self.check_files(python_paths)
+        problems = [f"{p}: {error}" for p, result in results.items() for error in result["errors"]]
+        imports = await self.resolve_imports({p: r for p, r in results.items() if not r["errors"]}, {os.path.normpath(p) for p in pending})
+        provisional = imports if provisional_imports else []
+        problems += [] if provisional_imports else imports
+        tests = "skipped"
+        if self.test_command and run_tests and not problems and not provisional:
+            failure = await self.run_tests()
+            tests = "failed" if failure else "passed"
+            if failure:
+                problems.append(failure)
+        return {"ok": not problems, "problems": problems, "provisional": provisional, "checked": len(results), "tests": tests,
+                "duration_s": round(time.perf_counter() - start, 3)}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+from .file_writer import atomic_write
+from .tracing import tracer
+
+MMAP_THRESHOLD = 1 << 20
+
+
+def hash_file(path, algorithm='sha256', mmap_threshold=MMAP_THRESHOLD):
+    """Hash a file, memory-mapping it instead of reading it into memory when it is large."""
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class WorkspaceIO:
+    """
+    Async reads and writes of workspace files for the agents. Blocking calls run in the default
+    thread pool so that slow filesystems do not stall other workflows on the event loop.
+    Reads are cached for the run by path, mtime and size; writes through this class replace the
+    cached content, and invalidate() drops paths written by anything else.
+    """
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.cache = {}
+
+    def full_path(self, rel_path):
+        return os.path.join(self.workspace, rel_path)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking function off the event loop."""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    def read_sync(self, rel_path):
+        full_path = self.full_path(rel_path)
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
+            self.cache.pop(rel_path, None)
+            return None
+        cached = self.cache.get(rel_path)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        with tracer.span("read", "io", path=rel_path, bytes=stat.st_size):
+            with open(full_path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        self.cache[rel_path] = ((stat.st_mtime_ns, stat.st_size), text)
+        return text
+
+    async def read_text(self, rel_path):
+        """
+        Read a file of the workspace through the cache.
+
+        Returns:
+            str or None: The content, or None if the file does not exist.
+        """
+        cached = self.cache.get(rel_path)
+        if cached is not None:
+            # A stat is much cheaper than a read, but can still block on network filesystems
+            try:
+                stat = await self.run(os.stat, self.full_path(rel_path))
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+                return cached[1]
+        return await self.run(self.read_sync, rel_path)
+
+    async def read_json(self, rel_path):
+        text = await self.read_text(rel_path)
+        if text is None:
+            raise FileNotFoundError(self.full_path(rel_path))
+        return json.loads(text)
+
+    def write_sync(self, rel_path, content):
+        full_path = self.full_path(rel_path)
+        self.cache.pop(rel_path, None)
+        atomic_write(full_path, content)
+        stat = os.stat(full_path)
+        self.cache[rel_path] = ((stat.st_mtime_ns, stat.st_size), content)
+
+    async def write_text(self, rel_path, content):
+        """Write a file atomically and keep its new content in the cache."""
+        await self.run(self.write_sync, rel_path, content)
+
+    async def write_json(self, rel_path, data, **kwargs):
+        await self.write_text(rel_path, json.dumps(data, **kwargs))
+
+    async def hash(self, rel_path):
+        """Content hash of a file, computed off the event loop."""
+        return await self.run(hash_file, self.full_path(rel_path))
+
+    def invalidate(self, rel_paths=None):
+        """Drop cached reads of rel_paths, or of every path if None."""
+        if rel_paths is None:
+            self.cache.clear()
+            return
+        for rel_path in rel_paths:
+            self.cache.pop(os.path.normpath(rel_path), None)
+            self.cache.pop(rel_path, None)
@@ -0,0 +1,101 @@
+"""
+Offline benchmark of role routing and hedged requests.
+
+Two scripted stand-in endpoints with occasional slow completions serve the 'code' role of a routed
+client, once without and once with hedging. Reports the latency quantiles of the calls, the number
+of hedges sent and won, and which model each role was routed to. No network access is needed.
+
+    python benchmarks/bench_hedging.py --calls 400 --latency 0.02 --tail-latency 0.5 --tail-probability 0.03
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autogen_core.models import UserMessage
+from benchmarks.scripted_client import ScriptedChatCompletionClient
+from agents.model_router import HedgedChatCompletionClient, RoutedChatCompletionClient, model_role
+from agents.tracing import TracingChatCompletionClient, tracer
+
+PROMPT = "Now you need to modify or create code. Create function generated_1 in generated/module_1.py"
+
+
+def quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stand_in(args, seed):
+    return ScriptedChatCompletionClient([], 1, latency=args.latency, tail_latency=args.tail_latency,
+                                        tail_probability=args.tail_probability, seed=seed)
+
+
+async def run_case(args, hedged):
+    primary, secondary, cheap = stand_in(args, 1), stand_in(args, 2), stand_in(args, 3)
+    code_client = HedgedChatCompletionClient(primary, secondary, quantile=args.quantile, min_samples=args.min_samples,
+                                             initial_delay=args.initial_delay) if hedged else primary
+    client = TracingChatCompletionClient(RoutedChatCompletionClient(("primary", primary), {
+        "code": ("primary" + (" + hedge" if hedged else ""), code_client),
+        "relevance": ("cheap", cheap),
+        "save": ("cheap", cheap),
+    }), tracer)
+    tracer.clear()
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def call(i):
+        role = "code" if i % 4 else "save"
+        async with semaphore:
+            with model_role(role):
+                start = time.perf_counter()
+                await client.create([UserMessage(content=PROMPT, source="user")])
+                if role == "code":
+                    latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call(i) for i in range(args.calls)))
+    routed = Counter((s["args"].get("role"), s["args"].get("model")) for s in tracer.spans if s["cat"] == "llm")
+    return {
+        "hedged": hedged,
+        "code_calls": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(quantile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(quantile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "hedges": getattr(code_client, "hedges", 0),
+        "hedge_wins": getattr(code_client, "hedge_wins", 0),
+        "routed": {f"{role} -> {model}": count for (role, model), count in sorted(routed.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of model routing and hedged requests")
+    parser.add_argument('--calls', type=int, default=400, help='Number of model calls, one in four is a save call')
+    parser.add_argument('--concurrency', type=int, default=8, help='Calls in flight at the same time')
+    parser.add_argument('--latency', type=float, default=0.02, help='Usual latency of a call, in seconds')
+    parser.add_argument('--tail-latency', type=float, default=0.5, help='Extra latency of a slow call, in seconds')
+    parser.add_argument('--tail-probability', type=float, default=0.03, help='Probability that a call is slow')
+    parser.add_argument('--quantile', type=float, default=0.95, help='Latency quantile after which a hedge is sent')
+    parser.add_argument('--min-samples', type=int, default=20, help='Calls measured before hedging starts')
+    parser.add_argument('--initial-delay', type=float, default=0.1, help='Hedge delay until min-samples calls are measured, in seconds')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = [asyncio.run(run_case(args, hedged)) for hedged in (False, True)]
+    print(f"{'hedged':>6} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hedges':>7} {'won':>5}")
+    for r in results:
+        print(f"{str(r['hedged']):>6} {r['code_calls']:>6} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8} "
+              f"{r['hedges']:>7} {r['hedge_wins']:>5}")
+    print("Routing:", json.dumps(results[-1]["routed"]))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Offline benchmark of the planner/coder orchestration.
+
+Runs the full workflow of customs/coder_custom.py against a scripted model client and a local
+filesystem stand-in over synthetic workspaces of increasing size, and reports wall time, CPU time,
+peak Python memory, the number of model calls per stage and the share of the prompt tokens
+that repeat an earlier prompt prefix (which a provider's prompt cache can serve). No network access is needed.
+
+    python benchmarks/bench_orchestration.py --sizes 10x5,200x20,2000x40 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from benchmarks.scripted_client import ScriptedChatCompletionClient, local_filesystem_workbench
+from customs.coder_custom import run_workflow
+from agents.mcp_pool import workbench_pool
+from agents.tracing import TracingChatCompletionClient, tracer
+
+
+def make_workspace(root, num_files, files_per_dir=50):
+    """Create num_files small Python modules spread over packages of files_per_dir modules."""
+    files = []
+    for i in range(num_files):
+        package = f"pkg_{i // files_per_dir}"
+        os.makedirs(os.path.join(root, package), exist_ok=True)
+        rel_path = f"{package}/mod_{i}.py"
+        with open(os.path.join(root, rel_path), 'w') as f:
+            f.write(f'"""Module {i}."""\n\n\nclass Thing{i}:\n    def __init__(self, value=0):\n        self.value = value\n\n'
+                    f'    def double(self):\n        return self.value * 2\n\n\ndef helper_{i}(x):\n    return x + {i}\n')
+        files.append(rel_path)
+    with open(os.path.join(root, ".caignore"), 'w') as f:
+        f.write("ca_logs/\n__pycache__/\n*.pyc\n")
+    return files
+
+
+def run_case(num_files, num_steps, latency, max_concurrency, latency_per_token=0.0, relevance='llm'):
+    with tempfile.TemporaryDirectory(prefix="ca_bench_") as workspace:
+        files = make_workspace(workspace, num_files)
+        client = ScriptedChatCompletionClient(files, num_steps, latency=latency, latency_per_token=latency_per_token)
+        tracer.clear()
+        tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        asyncio.run(run_workflow(workspace, "Add generated helper modules.", client=TracingChatCompletionClient(client, tracer),
+                                 max_concurrency=max_concurrency, stream_output=False, run_id=f"{num_files}x{num_steps}", relevance=relevance))
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        llm_spans = [s for s in tracer.spans if s["cat"] == "llm"]
+        reused = sum(s["args"].get("prefix_reuse_tokens", 0) for s in llm_spans)
+        return {
+            "files": num_files, "steps": num_steps, "latency_s": latency, "max_concurrency": max_concurrency,
+            "wall_s": round(wall, 3), "cpu_s": round(cpu, 3), "peak_mb": round(peak / 2**20, 2),
+            "model_calls": dict(client.calls), "total_model_calls": sum(client.calls.values()),
+            "prompt_tokens": client.usage.prompt_tokens, "completion_tokens": client.usage.completion_tokens,
+            "prefix_reuse_pct": round(100 * reused / max(1, sum(s["args"].get("prompt_tokens", 0) for s in llm_spans)), 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the agent orchestration")
+    parser.add_argument('--sizes', type=str, default="10x5,200x20,2000x40", help='Comma-separated FILESxSTEPS workspace sizes')
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial latency of every model call, in seconds')
+    parser.add_argument('--latency-per-token', type=float, default=0.0, help='Artificial generation time of every output token, in seconds')
+    parser.add_argument('--max-concurrency', type=int, default=4, help='Maximum number of plan steps coded at the same time')
+    parser.add_argument('--relevance', type=str, default='llm', choices=['llm', 'shortlist', 'retrieval'], help='How the planner finds the relevant files')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    workbench_pool.workbench_factory = local_filesystem_workbench
+    results = []
+    for size in args.sizes.split(','):
+        num_files, num_steps = (int(x) for x in size.lower().split('x'))
+        results.append(run_case(num_files, num_steps, args.latency, args.max_concurrency, args.latency_per_token, args.relevance))
+
+    print(f"{'files':>6} {'steps':>5} {'wall s':>8} {'cpu s':>8} {'peak MB':>8} {'calls':>6} {'prompt tok':>10} {'prefix %':>8}  calls per stage")
+    for r in results:
+        stages = ", ".join(f"{stage}={count}" for stage, count in sorted(r["model_calls"].items()))
+        print(f"{r['files']:>6} {r['steps']:>5} {r['wall_s']:>8.3f} {r['cpu_s']:>8.3f} {r['peak_mb']:>8.2f} "
+              f"{r['total_model_calls']:>6} {r['prompt_tokens']:>10} {r['prefix_reuse_pct']:>8}  {stages}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
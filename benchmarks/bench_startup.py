@@ -0,0 +1,77 @@
+"""
+Startup benchmark: import time of the entry points, each measured in a fresh interpreter.
+
+Every target is run --repeat times with `python -X importtime` and the median is compared to its
+budget; the slowest top-level imports are listed for targets over budget. Exits with status 1 if
+any target is over budget, so it can gate CI.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# name -> (python -c code, budget in milliseconds)
+TARGETS = {
+    "main --help": ("import runpy, sys; sys.argv = ['main.py', '--help']\ntry:\n    runpy.run_path('main.py', run_name='__main__')\nexcept SystemExit:\n    pass", 150),
+    "agents.model_api": ("import agents.model_api", 600),
+    "customs.coder_custom": ("import customs.coder_custom", 1500),
+}
+
+
+def measure(code):
+    """
+    Run code in a fresh interpreter with -X importtime.
+
+    Returns:
+        tuple: (total import time in ms, {top-level module: cumulative ms})
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    top_level = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        # Top-level imports are indented by a single space
+        if match and len(match.group(3)) == 1:
+            top_level[match.group(4)] = int(match.group(2)) / 1000
+    return sum(top_level.values()), top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget of the entry points")
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per target, the median is reported')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget, e.g. for slower machines')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results, over_budget = [], False
+    print(f"{'target':<24} {'median ms':>10} {'budget ms':>10}")
+    for name, (code, budget) in TARGETS.items():
+        runs = [measure(code) for _ in range(max(1, args.repeat))]
+        median = statistics.median(total for total, _ in runs)
+        budget *= args.scale
+        status = "ok" if median <= budget else "OVER"
+        over_budget |= status == "OVER"
+        print(f"{name:<24} {median:>10.1f} {budget:>10.0f}  {status}")
+        slowest = sorted(runs[-1][1].items(), key=lambda item: -item[1])[:5]
+        if status == "OVER":
+            for module, ms in slowest:
+                print(f"{'':<26}{module} {ms:.1f} ms")
+        results.append({"target": name, "median_ms": round(median, 1), "budget_ms": budget, "status": status,
+                        "slowest": dict(slowest)})
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
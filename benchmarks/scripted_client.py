@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import random
+import re
+from collections import Counter
+from autogen_core.models import ChatCompletionClient, CreateResult, FunctionExecutionResultMessage, ModelInfo, RequestUsage
+from autogen_core.tools import FunctionTool, StaticWorkbench
+
+# Prompt markers of every stage of the planner/coder workflow
+STAGES = [
+    ("planner: relevance", "identify the most relevant files"),
+    ("planner: plan", "make a step-by-step plan"),
+    ("coder: step", "Now you need to modify or create code"),
+    ("coder: save", "Now save the code to the specified path"),
+]
+
+
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+
+def text_of(message):
+    content = getattr(message, 'content', '')
+    return content if isinstance(content, str) else json.dumps([str(c) for c in content])
+
+
+class ScriptedChatCompletionClient(ChatCompletionClient):
+    """
+    Deterministic offline model client that answers the workflow prompts with canned responses.
+    The relevance step returns the first files of the workspace, the plan step returns a plan of
+    num_steps steps and each coding step returns one small module. Every call sleeps `latency` seconds plus `latency_per_token`
+    per generated token, and is counted per stage. create_stream yields the text line by line,
+    spreading the per-token latency over the lines. With tail_probability, a call is slowed down
+    by tail_latency seconds, to stand in for the occasional slow completion of a real endpoint.
+    """
+    def __init__(self, files, num_steps, latency=0.0, latency_per_token=0.0, tail_latency=0.0, tail_probability=0.0, seed=0):
+        self.files = files
+        self.num_steps = num_steps
+        self.latency = latency
+        self.latency_per_token = latency_per_token
+        self.tail_latency = tail_latency
+        self.tail_probability = tail_probability
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def stage(self, prompt):
+        for stage, marker in STAGES:
+            if marker in prompt:
+                return stage
+        return "other"
+
+    def plan(self):
+        steps = []
+        for i in range(1, self.num_steps + 1):
+            # Every third step reads the output of the previous one, the others are independent
+            dependencies = [f"generated/module_{i - 1}.py"] if i % 3 == 0 and i > 1 else self.files[i % max(1, len(self.files)):][:2]
+            steps.append({
+                "step": i,
+                "dependencies": dependencies,
+                "modification": f"Create function generated_{i} in generated/module_{i}.py",
+                "save_path": f"generated/module_{i}.py",
+                "extra_info": {"type": "create"},
+            })
+        return {"plan": steps}
+
+    def respond(self, messages):
+        prompt = next((text_of(m) for m in reversed(messages) if getattr(m, 'source', None) == 'user'), text_of(messages[-1]))
+        stage = self.stage(prompt)
+        if isinstance(messages[-1], FunctionExecutionResultMessage):
+            return stage + " (reflect)", "Saved. TERMINATE"
+        if stage == "planner: relevance":
+            return stage, "```json\n" + json.dumps(self.files[:10]) + "\n```"
+        if stage == "planner: plan":
+            return stage, "```json\n" + json.dumps(self.plan(), indent=2) + "\n```"
+        if stage == "coder: step":
+            index = re.search(r"Create function generated_(\d+)", prompt)
+            index = index.group(1) if index else "0"
+            code = f'"""Generated module {index}."""\n\n\ndef generated_{index}(value):\n    """Return value plus {index}."""\n    return value + {index}\n'
+            return stage, f"```python\n{code}```"
+        return stage, "TERMINATE"
+
+    def completion_tokens(self, content):
+        return estimate_tokens(content if isinstance(content, str) else json.dumps([c.arguments for c in content]))
+
+    def result(self, messages, content):
+        completion_tokens = self.completion_tokens(content)
+        prompt_tokens = sum(estimate_tokens(text_of(m)) for m in messages)
+        usage = RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self.usage = RequestUsage(prompt_tokens=self.usage.prompt_tokens + prompt_tokens,
+                                  completion_tokens=self.usage.completion_tokens + completion_tokens)
+        finish_reason = "stop" if isinstance(content, str) else "function_calls"
+        return CreateResult(finish_reason=finish_reason, content=content, usage=usage, cached=False)
+
+    def first_token_latency(self):
+        slow = self.tail_probability and self.random.random() < self.tail_probability
+        return self.latency + (self.tail_latency if slow else 0.0)
+
+    async def create(self, messages, *, tools=[], tool_choice="auto", json_output=None, extra_create_args={}, cancellation_token=None):
+        stage, content = self.respond(messages)
+        self.calls[stage] += 1
+        await asyncio.sleep(self.first_token_latency() + self.latency_per_token * self.completion_tokens(content))
+        return self.result(messages, content)
+
+    async def create_stream(self, messages, **kwargs):
+        stage, content = self.respond(messages)
+        self.calls[stage] += 1
+        await asyncio.sleep(self.first_token_latency())
+        if isinstance(content, str):
+            for line in content.splitlines(keepends=True):
+                await asyncio.sleep(self.latency_per_token * estimate_tokens(line))
+                yield line
+        else:
+            await asyncio.sleep(self.latency_per_token * self.completion_tokens(content))
+        yield self.result(messages, content)
+
+    async def close(self):
+        pass
+
+    def actual_usage(self):
+        return self.usage
+
+    def total_usage(self):
+        return self.usage
+
+    def count_tokens(self, messages, **kwargs):
+        return sum(estimate_tokens(text_of(m)) for m in messages)
+
+    def remaining_tokens(self, messages, **kwargs):
+        return 128000 - self.count_tokens(messages)
+
+    @property
+    def capabilities(self):
+        return self.model_info
+
+    @property
+    def model_info(self):
+        return ModelInfo(vision=False, function_calling=True, json_output=True, family="unknown", structured_output=False)
+
+
+def local_filesystem_workbench(workspace):
+    """A stand-in for the filesystem MCP server with the same write_file / create_directory / read_file tools."""
+    root = os.path.realpath(workspace)
+
+    def resolve(path):
+        full = os.path.realpath(path if os.path.isabs(path) else os.path.join(root, path))
+        assert full == root or full.startswith(root + os.sep), f"{path} is outside of {root}"
+        return full
+
+    def write_file(path: str, content: str) -> str:
+        """Create a new file or overwrite an existing file with new content."""
+        full = resolve(path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, 'w') as f:
+            f.write(content)
+        return f"Successfully wrote to {path}"
+
+    def create_directory(path: str) -> str:
+        """Create a new directory or ensure a directory exists."""
+        os.makedirs(resolve(path), exist_ok=True)
+        return f"Successfully created directory {path}"
+
+    def read_file(path: str) -> str:
+        """Read the complete contents of a file."""
+        with open(resolve(path), 'r') as f:
+            return f.read()
+
+    return StaticWorkbench([FunctionTool(f, description=f.__doc__) for f in (write_file, create_directory, read_file)])
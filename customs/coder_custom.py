@@ -4,47 +4,219 @@ import random
 import datetime
 import shutil
 import asyncio
+import time
+import traceback
 from agents.planner import PlannerAgent
 from agents.coder import CoderAgent
-from agents.model_api import model_client
+from agents.model_api import close_model_clients, get_model_client, rate_limit_metrics
+from agents.mcp_pool import workbench_pool
+from agents.utils import print_colored
+from agents.tracing import tracer
 
-def modify_code(workspace=None, request=None):
+async def plan_and_code(planner_agent, coder_agent, mission_goal, stream_output=True):
+    """
+    Run the planner and the coder together: every plan step is handed to the coder as soon as the
+    planner has generated it, so coding the first steps overlaps with generating the rest of the plan.
+    The complete plan follows the steps once it is written, so the coder knows that planning succeeded.
+    """
+    steps = asyncio.Queue()
+
+    async def plan():
+        try:
+            return await planner_agent.run(mission_goal, stream_output=stream_output, on_step=steps.put, on_plan=steps.put)
+        finally:
+            # Also ends the coder's plan when planning fails, without the complete plan
+            await steps.put(None)
+
+    async def plan_steps():
+        while (step := await steps.get()) is not None:
+            yield step
+
+    planner_task = asyncio.ensure_future(plan())
+    try:
+        coder_logs = await coder_agent.run(mission_goal, stream_output=stream_output, plan_steps=plan_steps())
+    except BaseException:
+        planner_task.cancel()
+        raise
+    return [await planner_task, coder_logs]
+
+async def run_workflow(workspace, request, client=None, max_concurrency=1, stream_output=True, run_id=None, resume=False, edit_mode='full', model=None, routes=None, relevance='llm', verify=True, test_command=None, prewarm_mcp=False):
+    """
+    Plan and code one request in its workspace, returning the planner and coder logs.
+    The model client is not closed so that it can be shared by several workflows.
+    Every span of the workflow is tagged with run_id, and its summary is printed at the end.
+    With resume=True an existing plan is reused and the coding steps it already finished are skipped.
+    With edit_mode='diff' the coder returns edits of existing files instead of full files.
+    relevance selects how the planner finds the relevant files: 'llm', 'shortlist' or 'retrieval' (see PlannerAgent).
+    With verify=True the files saved by every step are checked locally (and test_command run) before the step ends.
+    The filesystem MCP server only backs the save agent fallback, so it is started on first use,
+    or while the planner runs with prewarm_mcp=True.
+    Without a client, the shared client of the registered model is used (the default model if None),
+    or the client of a routes file that maps each model role to its own model.
+    """
+    client = client or get_model_client(model, routes=routes)
+    # Prepare workspace and copy codebase if needed
+    if not os.path.exists(workspace):
+        os.makedirs(workspace, exist_ok=True)
+
+    log_dir = 'ca_logs'
+    planner_agent = PlannerAgent(
+        name="planner",
+        model_client=client,
+        tools=[],
+        reflect_on_tool_use=True,
+        workspace=workspace,
+        log_dir=log_dir,
+        relevance=relevance,
+    )
+    coder_agent = CoderAgent(
+        name="coder",
+        model_client=client,
+        tools=[],
+        reflect_on_tool_use=True,
+        workspace=workspace,
+        log_dir=log_dir,
+        max_concurrency=max_concurrency,
+        edit_mode=edit_mode,
+        verify=verify,
+        test_command=test_command,
+    )
+
+    mission_goal = str(request)
+    logs = []
+    if prewarm_mcp:
+        # Start the filesystem MCP server while the planner waits for the model
+        workbench_pool.prewarm(workspace)
+    run_id = run_id or os.path.basename(os.path.normpath(workspace))
+    try:
+        with tracer.span(run_id, "run", workspace=workspace):
+            if resume and os.path.exists(os.path.join(workspace, log_dir, 'plan.json')):
+                print_colored(f"[Workflow] Resuming from {os.path.join(workspace, log_dir, 'plan.json')}", "yellow")
+                logs.append({"resumed": True})
+                logs.append(await coder_agent.run(mission_goal, stream_output=stream_output, resume=resume))
+            else:
+                logs.extend(await plan_and_code(planner_agent, coder_agent, mission_goal, stream_output=stream_output))
+    finally:
+        await workbench_pool.release(workspace)
+        tracer.print_summary(run_id)
+    with open(os.path.join(workspace, log_dir, 'logs.json'), 'w') as f:
+        json.dump(logs, f, indent=4)
+    return logs
+
+def print_rate_limit_metrics():
+    for name, metrics in rate_limit_metrics().items():
+        print_colored(f"[Model] {name}: " + ", ".join(f"{key}={value}" for key, value in metrics.items()), "green")
+
+def modify_code(workspace=None, request=None, max_concurrency=1, trace_path=None, resume=False, edit_mode='full', model=None, routes=None, relevance='llm', verify=True, test_command=None, prewarm_mcp=False):
     """
     Modify the code based on the provided plan.
+    If trace_path is given, the spans of the run are exported there in Chrome trace-event format.
     """
     assert workspace is not None, "Workspace must be provided."
     assert request is not None, "Request must be provided."
 
     async def workflow():
-        # Prepare workspace and copy codebase if needed
-        if not os.path.exists(workspace):
-            os.makedirs(workspace, exist_ok=True)
-
-        log_dir = 'ca_logs'
-        planner_agent = PlannerAgent(
-            name="planner",
-            model_client=model_client,
-            tools=[],
-            reflect_on_tool_use=True,
-            workspace=workspace,
-            log_dir=log_dir,
-        )
-        coder_agent = CoderAgent(
-            name="coder",
-            model_client=model_client,
-            tools=[],
-            reflect_on_tool_use=True,
-            workspace=workspace,
-            log_dir=log_dir,
-        )
-
-        mission_goal = str(request)
-        logs = []
-        logs.append(await planner_agent.run(mission_goal, stream_output=True))
-        logs.append(await coder_agent.run(mission_goal, stream_output=True))
-        with open(os.path.join(workspace, log_dir, 'logs.json'), 'w') as f:
-            json.dump(logs, f, indent=4)
-        await model_client.close()
+        try:
+            await run_workflow(workspace, request, max_concurrency=max_concurrency, resume=resume, edit_mode=edit_mode, model=model, routes=routes, relevance=relevance,
+                               verify=verify, test_command=test_command, prewarm_mcp=prewarm_mcp)
+        finally:
+            await workbench_pool.close()
+            await close_model_clients()
+            if trace_path:
+                tracer.export_chrome(trace_path)
+            print_rate_limit_metrics()
 
     asyncio.run(workflow())
 
+def rollback_workspace(workspace=None, step=None, log_dir='ca_logs'):
+    """
+    Restore the files of a workspace to their state before a coding step of its last run,
+    undoing that step and every step after it (see agents.snapshots.SnapshotStore).
+    """
+    from agents.snapshots import SnapshotStore
+    assert workspace is not None, "Workspace must be provided."
+    store = SnapshotStore(workspace, os.path.join(workspace, log_dir, 'snapshots'))
+    snapshot = store.find(step)
+    result = store.rollback(snapshot["id"])
+    print_colored(f"[Rollback] Restored {len(result['restored'])} paths of {workspace} to their state before step {step} of run {snapshot['run']}:", "green")
+    print_colored("\n".join(result["restored"]), "green")
+    return result
+
+def load_batch_requests(requests_path, default_workspace):
+    """
+    Read a JSONL file of requests. Each line has a "request" (or a "title" and "body"), and optionally
+    a "request_id" and a "workspace"; requests without a workspace get one under default_workspace.
+    """
+    requests = []
+    with open(requests_path, 'r') as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            request_id = str(record.get("request_id", f"request-{line_no}"))
+            request = record.get("request") or "\n".join(str(record[k]) for k in ("title", "body") if record.get(k))
+            assert request, f"Line {line_no} of {requests_path} has no request, title or body."
+            workspace = record.get("workspace") or os.path.join(default_workspace, request_id)
+            requests.append({"request_id": request_id, "request": request, "workspace": workspace})
+    workspaces = [r["workspace"] for r in requests]
+    assert len(set(map(os.path.realpath, workspaces))) == len(workspaces), "Each request of a batch needs its own workspace."
+    return requests
+
+def modify_code_batch(requests_path=None, workspace='./executions/', max_workflows=4, max_concurrency=1, results_path=None, trace_path=None, resume=False, edit_mode='full', model=None, routes=None, relevance='llm', verify=True, test_command=None, prewarm_mcp=False):
+    """
+    Run every request of a JSONL file as its own planner/coder workflow in a single event loop,
+    with at most max_workflows running at the same time on the shared model client.
+    One result record per request is appended to results_path as soon as it finishes.
+    """
+    assert requests_path is not None, "Requests file must be provided."
+    requests = load_batch_requests(requests_path, workspace)
+    results_path = results_path or os.path.splitext(requests_path)[0] + '.results.jsonl'
+
+    async def batch():
+        semaphore = asyncio.Semaphore(max(1, max_workflows))
+        results_lock = asyncio.Lock()
+        open(results_path, 'w').close()
+
+        async def run_one(item):
+            async with semaphore:
+                print_colored(f"[Batch] Starting {item['request_id']} in {item['workspace']}", "cyan")
+                start = time.perf_counter()
+                result = {"request_id": item["request_id"], "workspace": item["workspace"]}
+                try:
+                    logs = await run_workflow(item["workspace"], item["request"], max_concurrency=max_concurrency,
+                                              stream_output=False, run_id=item["request_id"], resume=resume, edit_mode=edit_mode, model=model, routes=routes, relevance=relevance,
+                                              verify=verify, test_command=test_command, prewarm_mcp=prewarm_mcp)
+                    result.update(status="ok", steps=len(logs[-1]),
+                                  unverified=sum(1 for output in logs[-1] if not (output.get("verification") or {}).get("ok", True)))
+                except Exception as e:
+                    result.update(status="error", error=repr(e), traceback=traceback.format_exc())
+                result["duration_s"] = round(time.perf_counter() - start, 3)
+                async with results_lock:
+                    with open(results_path, 'a') as f:
+                        f.write(json.dumps(result) + '\n')
+                color = "green" if result["status"] == "ok" else "red"
+                print_colored(f"[Batch] {item['request_id']} finished with {result['status']} in {result['duration_s']}s", color)
+                return result
+
+        start = time.perf_counter()
+        try:
+            results = await asyncio.gather(*(run_one(item) for item in requests))
+        finally:
+            await workbench_pool.close()
+            await close_model_clients()
+            if trace_path:
+                tracer.export_chrome(trace_path)
+        wall_time = time.perf_counter() - start
+        succeeded = [r for r in results if r["status"] == "ok"]
+        print_colored("#"*50 + "[Batch] Summary" + "#"*50, "blue")
+        print_colored(f"Requests: {len(results)}, succeeded: {len(succeeded)}, failed: {len(results) - len(succeeded)}", "green")
+        print_colored(f"Wall time: {wall_time:.1f}s, throughput: {len(results) / wall_time * 60 if wall_time else 0:.2f} requests/min", "green")
+        if results:
+            print_colored(f"Mean request time: {sum(r['duration_s'] for r in results) / len(results):.1f}s, "
+                          f"steps coded: {sum(r.get('steps', 0) for r in succeeded)}, "
+                          f"failing verification: {sum(r.get('unverified', 0) for r in succeeded)}", "green")
+        print_rate_limit_metrics()
+        print_colored(f"Results written to {results_path}", "green")
+        return results
+
+    return asyncio.run(batch())
@@ -9,26 +9,67 @@ def get_request_and_agent():
     select the custom agent/workflow to use, and collect extra args.
     """
     parser = argparse.ArgumentParser(description="Run custom agent workflow")
-    parser.add_argument('--request', type=str, required=True, help='Mission goal or request')
+    requests = parser.add_mutually_exclusive_group(required=True)
+    requests.add_argument('--request', type=str, help='Mission goal or request')
+    requests.add_argument('--batch', type=str, help='JSONL file of requests to run in one process')
+    requests.add_argument('--rollback', type=int, metavar='STEP', help='Undo the coding steps of the last run in the workspace from this step on, then exit')
     parser.add_argument('--agent', type=str, default='coder_custom', help='Custom agent/workflow to use')
     parser.add_argument('--workspace', type=str, default='./executions/test/', help='Workspace directory')
+    parser.add_argument('--max-concurrency', type=int, default=1, help='Maximum number of independent plan steps coded at the same time')
+    parser.add_argument('--max-workflows', type=int, default=4, help='Maximum number of batch requests running at the same time')
+    parser.add_argument('--results', type=str, default=None, help='JSONL file for the batch results (default: next to the batch file)')
+    parser.add_argument('--trace', type=str, default=None, help='Export the latency/token trace of the run to this file (Chrome trace-event JSON)')
+    parser.add_argument('--resume', action='store_true', help='Reuse the existing plan and skip the coding steps already finished')
+    parser.add_argument('--model', type=str, default=None, help='Registered model to use (default: $CA_MODEL or deepseek-chat)')
+    parser.add_argument('--routes', type=str, default=None, help='JSON file routing each model role to its own model, with optional hedging (default: $CA_MODEL_ROUTES)')
+    parser.add_argument('--edit-mode', type=str, default='full', choices=['full', 'diff'], help='Have the coder return full files or edits of existing files')
+    parser.add_argument('--relevance', type=str, default='llm', choices=['llm', 'shortlist', 'retrieval'],
+                        help='Find the relevant files with the model over the whole file structure, with the model over a local BM25 shortlist, or with the shortlist alone')
+    parser.add_argument('--no-verify', action='store_true', help='Do not compile and check the imports of the files saved by each step')
+    parser.add_argument('--test-command', type=str, default=None, help='Shell command run in the workspace to verify the steps, e.g. "pytest -x -q"')
+    parser.add_argument('--prewarm-mcp', action='store_true', help='Start the filesystem MCP server of the workspace while the planner runs instead of on first use')
     # Add more arguments as needed
 
     args = parser.parse_args()
     request = args.request
     agent_name = args.agent
-    extra_args = {"workspace": args.workspace}
+    extra_args = {"workspace": args.workspace, "max_concurrency": args.max_concurrency,
+                  "batch": args.batch, "max_workflows": args.max_workflows, "results": args.results, "trace": args.trace, "resume": args.resume,
+                  "edit_mode": args.edit_mode, "model": args.model, "routes": args.routes, "relevance": args.relevance,
+                  "verify": not args.no_verify, "test_command": args.test_command, "rollback": args.rollback,
+                  "prewarm_mcp": args.prewarm_mcp}
     # Add more extra_args if needed
 
     return request, agent_name, extra_args
 
+def run_coder_custom(request, extra_args):
+    from customs.coder_custom import modify_code, modify_code_batch, rollback_workspace
+    workspace = extra_args.get("workspace", "./executions/test/")
+    if extra_args.get("rollback") is not None:
+        rollback_workspace(workspace=workspace, step=extra_args["rollback"])
+    elif extra_args.get("batch"):
+        modify_code_batch(requests_path=extra_args["batch"], workspace=workspace, max_workflows=extra_args.get("max_workflows", 4),
+                          max_concurrency=extra_args.get("max_concurrency", 1), results_path=extra_args.get("results"),
+                          trace_path=extra_args.get("trace"), resume=extra_args.get("resume", False),
+                          edit_mode=extra_args.get("edit_mode", "full"), model=extra_args.get("model"), routes=extra_args.get("routes"),
+                          relevance=extra_args.get("relevance", "llm"), verify=extra_args.get("verify", True),
+                          test_command=extra_args.get("test_command"), prewarm_mcp=extra_args.get("prewarm_mcp", False))
+    else:
+        modify_code(workspace=workspace, request=request, max_concurrency=extra_args.get("max_concurrency", 1),
+                    trace_path=extra_args.get("trace"), resume=extra_args.get("resume", False),
+                    edit_mode=extra_args.get("edit_mode", "full"), model=extra_args.get("model"), routes=extra_args.get("routes"),
+                    relevance=extra_args.get("relevance", "llm"), verify=extra_args.get("verify", True),
+                    test_command=extra_args.get("test_command"), prewarm_mcp=extra_args.get("prewarm_mcp", False))
+
+# Agent/workflow name -> entry point. Entry points import their workflow (and the agent stack) only when called,
+# so that --help and argument errors return without loading autogen or building a model client.
+AGENTS = {
+    "coder_custom": run_coder_custom,
+}
+
 if __name__ == "__main__":
     request, agent_name, extra_args = get_request_and_agent()
-    # Dynamically import and call the custom agent/workflow
     # import debugpy;debugpy.listen(("localhost", 5678));print("waiting for debugger attach ...");debugpy.wait_for_client()
-    if agent_name == "coder_custom":
-        from customs.coder_custom import modify_code
-        workspace = extra_args.get("workspace", "./executions/test/")
-        modify_code(workspace=workspace, request=request)
-    else:
+    if agent_name not in AGENTS:
         raise NotImplementedError(f"Agent {agent_name} not implemented.")
+    AGENTS[agent_name](request, extra_args)
@@ -0,0 +1,129 @@
+import asyncio
+import gzip
+import json
+from openai import DefaultAsyncHttpxClient
+from agents.cache_hits import sdk_httpx, transport_class
+from agents.model_api import StreamUsageChatCompletionClient
+from agents.tracing import tracer
+
+
+def completion_body(usage):
+    return {"id": "1", "object": "chat.completion", "created": 1, "model": "m", "usage": usage,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "hi"}, "finish_reason": "stop"}]}
+
+
+def post(handler, stream=False, path="/v1/chat/completions", body=None):
+    """
+    Send one request through a CacheHitTransport over a mock transport and return the args of its 'llm' span.
+    If body is given, the response the client decodes must be that body.
+    """
+    httpx = sdk_httpx()
+    client = DefaultAsyncHttpxClient(transport=transport_class(httpx)(httpx.MockTransport(handler)))
+
+    async def call():
+        with tracer.span("create", "llm") as span:
+            async with client.stream("POST", f"http://model.test{path}", json={"stream": stream},
+                                     headers={"Accept-Encoding": "gzip, deflate, br"}) as response:
+                received = b"".join([chunk async for chunk in response.aiter_bytes()])
+        await client.aclose()
+        return span["args"], received
+    args, received = asyncio.run(call())
+    if body is not None:
+        assert received == body
+    return args
+
+
+def test_the_sdk_client_accepts_the_transport():
+    # Fails if the SDK stops taking a transport, or builds its client on another httpx package
+    httpx = sdk_httpx()
+    assert isinstance(DefaultAsyncHttpxClient(transport=transport_class(httpx)()), httpx.AsyncClient)
+
+
+def test_records_deepseek_cache_hits_of_a_response():
+    httpx = sdk_httpx()
+    seen = {}
+
+    def handler(request):
+        seen["encoding"] = request.headers.get("Accept-Encoding")
+        return httpx.Response(200, json=completion_body({"prompt_tokens": 100, "prompt_cache_hit_tokens": 64}))
+    assert post(handler)["prompt_cache_hit_tokens"] == 64
+    assert seen["encoding"] == "gzip, deflate"
+
+
+def test_records_cache_hits_of_a_compressed_response():
+    httpx = sdk_httpx()
+    body = json.dumps(completion_body({"prompt_tokens": 100, "prompt_cache_hit_tokens": 32})).encode()
+
+    async def chunks():
+        compressed = gzip.compress(body)
+        for i in range(0, len(compressed), 9):
+            yield compressed[i:i + 9]
+
+    def handler(request):
+        return httpx.Response(200, headers={"Content-Encoding": "gzip"}, content=chunks())
+    assert post(handler, body=body)["prompt_cache_hit_tokens"] == 32
+
+
+def test_other_requests_pass_through():
+    httpx = sdk_httpx()
+    seen = {}
+
+    def handler(request):
+        seen["encoding"] = request.headers.get("Accept-Encoding")
+        return httpx.Response(200, json={"usage": {"prompt_cache_hit_tokens": 5}})
+    assert "prompt_cache_hit_tokens" not in post(handler, path="/v1/models")
+    assert seen["encoding"] == "gzip, deflate, br"
+
+
+def test_records_openai_cache_hits_of_a_stream_split_mid_field():
+    httpx = sdk_httpx()
+    last = {"choices": [], "usage": {"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 80}}}
+    raw = b"data: {\"choices\": []}\n\ndata: " + json.dumps(last).encode() + b"\n\ndata: [DONE]\n\n"
+
+    async def chunks():
+        for i in range(0, len(raw), 7):
+            yield raw[i:i + 7]
+
+    def handler(request):
+        return httpx.Response(200, content=chunks())
+    assert post(handler, stream=True)["prompt_cache_hit_tokens"] == 80
+
+
+def test_no_usage_records_nothing():
+    httpx = sdk_httpx()
+    assert "prompt_cache_hit_tokens" not in post(lambda request: httpx.Response(200, json=completion_body({"prompt_tokens": 3})))
+
+
+def test_stream_options_are_only_sent_with_streams():
+    from autogen_core.models import UserMessage
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+    httpx = sdk_httpx()
+    bodies = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        bodies.append(body)
+        if not body.get("stream"):
+            return httpx.Response(200, json=completion_body({"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}))
+        chunk = {"id": "1", "object": "chat.completion.chunk", "created": 1, "model": "m",
+                 "choices": [{"index": 0, "delta": {"role": "assistant", "content": "hi"}, "finish_reason": "stop"}]}
+        usage = {"id": "1", "object": "chat.completion.chunk", "created": 1, "model": "m", "choices": [],
+                 "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4}}
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"},
+                              content=f"data: {json.dumps(chunk)}\n\ndata: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode())
+
+    info = {"vision": False, "function_calling": True, "json_output": True, "family": "unknown", "structured_output": False}
+    client = StreamUsageChatCompletionClient(OpenAIChatCompletionClient(
+        model="m", base_url="http://model.test/v1", api_key="key", model_info=info,
+        http_client=DefaultAsyncHttpxClient(transport=httpx.MockTransport(handler))))
+
+    async def call():
+        messages = [UserMessage(content="hello", source="user")]
+        await client.create(messages)
+        results = [item async for item in client.create_stream(messages)]
+        await client.close()
+        return results[-1]
+    result = asyncio.run(call())
+    assert result.usage.prompt_tokens == 3
+    assert "stream_options" not in bodies[0]
+    assert bodies[1]["stream_options"] == {"include_usage": True}
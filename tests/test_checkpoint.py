@@ -0,0 +1,84 @@
+import json
+import threading
+from agents.checkpoint import RunCheckpoint, hash_path
+
+PLAN = {"plan": [{"step": 1, "modification": "a", "save_path": "a.py", "dependencies": ["dep.py"]},
+                 {"step": 2, "modification": "b", "save_path": "b.py", "dependencies": ["a.py"]}]}
+
+
+def finish(checkpoint, workspace, step, content):
+    inputs = checkpoint.hash_inputs(str(workspace), step)
+    (workspace / step["save_path"]).write_text(content)
+    checkpoint.record(str(workspace), step, inputs, {"saved_paths": [step["save_path"]], "step": step["step"]})
+
+
+def test_a_resumed_run_skips_the_finished_steps(tmp_path):
+    (tmp_path / "dep.py").write_text("dep = 1\n")
+    log_path = tmp_path / "logs"
+    log_path.mkdir()
+    checkpoint = RunCheckpoint(str(log_path), PLAN)
+    finish(checkpoint, tmp_path, PLAN["plan"][0], "a = 1\n")
+    finish(checkpoint, tmp_path, PLAN["plan"][1], "b = 1\n")
+    resumed = RunCheckpoint(str(log_path), PLAN, resume=True)
+    assert all(resumed.is_done(str(tmp_path), step) for step in PLAN["plan"])
+    assert resumed.output(PLAN["plan"][1]) == {"saved_paths": ["b.py"], "step": 2}
+    # Each finished step was streamed to the run log
+    with open(log_path / "run_log.jsonl") as f:
+        assert [json.loads(line)["step"] for line in f] == [1, 2]
+
+
+def test_changed_inputs_or_outputs_are_not_done(tmp_path):
+    (tmp_path / "dep.py").write_text("dep = 1\n")
+    checkpoint = RunCheckpoint(str(tmp_path), PLAN)
+    finish(checkpoint, tmp_path, PLAN["plan"][0], "a = 1\n")
+    finish(checkpoint, tmp_path, PLAN["plan"][1], "b = 1\n")
+    (tmp_path / "b.py").write_text("b = 2\n")
+    assert not checkpoint.is_done(str(tmp_path), PLAN["plan"][1])
+    (tmp_path / "dep.py").write_text("dep = 2\n")
+    assert not checkpoint.is_done(str(tmp_path), PLAN["plan"][0])
+
+
+def test_an_input_rewritten_by_a_finished_step_is_still_done(tmp_path):
+    # Step 1 writes a.py, which step 2 read before it, so its recorded input differs from what is on disk
+    plan = {"plan": [{"step": 1, "modification": "b", "save_path": "b.py", "dependencies": ["a.py"]},
+                     {"step": 2, "modification": "a", "save_path": "a.py", "dependencies": []}]}
+    (tmp_path / "a.py").write_text("a = 0\n")
+    checkpoint = RunCheckpoint(str(tmp_path), plan)
+    finish(checkpoint, tmp_path, plan["plan"][0], "b = 1\n")
+    finish(checkpoint, tmp_path, plan["plan"][1], "a = 1\n")
+    assert checkpoint.is_done(str(tmp_path), plan["plan"][0])
+
+
+def test_another_plan_or_an_unverified_step_is_not_resumed(tmp_path):
+    (tmp_path / "dep.py").write_text("dep = 1\n")
+    checkpoint = RunCheckpoint(str(tmp_path), PLAN)
+    step = PLAN["plan"][0]
+    checkpoint.record(str(tmp_path), step, checkpoint.hash_inputs(str(tmp_path), step), {"saved_paths": []}, done=False)
+    assert not checkpoint.is_done(str(tmp_path), step)
+    finish(checkpoint, tmp_path, step, "a = 1\n")
+    other = {"plan": PLAN["plan"][:1]}
+    assert RunCheckpoint(str(tmp_path), other, resume=True).finished == {}
+
+
+def test_a_streamed_plan_is_recorded_when_complete(tmp_path):
+    (tmp_path / "dep.py").write_text("dep = 1\n")
+    checkpoint = RunCheckpoint(str(tmp_path), None)
+    finish(checkpoint, tmp_path, PLAN["plan"][0], "a = 1\n")
+    assert RunCheckpoint(str(tmp_path), PLAN, resume=True).finished == {}
+    checkpoint = RunCheckpoint(str(tmp_path), None)
+    finish(checkpoint, tmp_path, PLAN["plan"][0], "a = 1\n")
+    checkpoint.set_plan(PLAN)
+    assert list(RunCheckpoint(str(tmp_path), PLAN, resume=True).finished) == ["1"]
+
+
+def test_concurrent_records(tmp_path):
+    plan = {"plan": [{"step": i, "modification": "m", "save_path": f"m{i}.py"} for i in range(1, 41)]}
+    checkpoint = RunCheckpoint(str(tmp_path), plan)
+    threads = [threading.Thread(target=finish, args=(checkpoint, tmp_path, step, "x = 1\n")) for step in plan["plan"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(RunCheckpoint(str(tmp_path), plan, resume=True).finished) == 40
+    assert hash_path(str(tmp_path), "m1.py") == hash_path(str(tmp_path), "m2.py")
+    assert hash_path(str(tmp_path), ".") == "dir" and hash_path(str(tmp_path), "missing.py") is None
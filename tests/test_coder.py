@@ -0,0 +1,132 @@
+import asyncio
+import json
+import pytest
+from autogen_core.models import ModelInfo
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from agents.checkpoint import RunCheckpoint
+from agents.coder import CoderAgent
+from agents.patching import PatchError
+
+EDIT = "a.py\n```python\n<<<<<<< SEARCH\nx = 1\n=======\nx = 2\n>>>>>>> REPLACE\n```\n"
+
+
+MODEL_INFO = ModelInfo(vision=False, function_calling=True, json_output=False, family="unknown", structured_output=False)
+
+
+def make_coder(workspace, responses=(), **kwargs):
+    client = ReplayChatCompletionClient(list(responses), model_info=MODEL_INFO)
+    return CoderAgent("coder", client, tools=[], workspace=str(workspace), **kwargs)
+
+
+@pytest.fixture
+def coder(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    return make_coder(tmp_path, edit_mode='diff', snapshots=False)
+
+
+def test_save_edits_writes_edits_and_named_files(coder, tmp_path):
+    output = EDIT + "\npkg/helpers.py\n```python\ndef helper():\n    return 1\n```\n"
+    assert coder.save_edits(output, "a.py", {}) == ["a.py", "pkg/helpers.py"]
+    assert (tmp_path / "a.py").read_text() == "x = 2\n"
+    assert (tmp_path / "pkg" / "helpers.py").read_text() == "def helper():\n    return 1\n"
+
+
+def test_save_edits_rejects_a_file_without_a_path(coder, tmp_path):
+    output = EDIT + "\nAnd a new helper:\n```python\ndef helper():\n    return 1\n```\n"
+    with pytest.raises(PatchError, match="file paths"):
+        coder.save_edits(output, "a.py", {})
+    # Nothing is written, so the full-file retry starts from the current files
+    assert (tmp_path / "a.py").read_text() == "x = 1\n"
+
+
+def test_save_edits_ignores_shell_blocks(coder, tmp_path):
+    output = EDIT + "\nRun the tests with:\n```bash\npytest -q\n```\n"
+    assert coder.save_edits(output, "a.py", {}) == ["a.py"]
+
+
+def test_save_edits_without_edits(coder):
+    assert coder.save_edits("```python\nx = 3\n```\n", "a.py", {}) is None
+
+
+def run_streamed(coder, items):
+    """Run the coder over a streamed plan, as plan_and_code does."""
+    async def plan_steps():
+        for item in items:
+            yield item
+    return asyncio.run(coder.run("goal", stream_output=False, plan_steps=plan_steps()))
+
+
+def checkpoint_of(workspace):
+    with open(workspace / "ca_logs" / "checkpoint.json") as f:
+        return json.load(f)
+
+
+STEP = {"step": 1, "modification": "Add b", "save_path": "b.py", "dependencies": []}
+
+
+def test_a_streamed_plan_is_recorded_once_complete(tmp_path):
+    coder = make_coder(tmp_path, ["```python\nb = 1\n```"])
+    outputs = run_streamed(coder, [STEP, {"plan": [STEP]}])
+    assert [o["saved_paths"] for o in outputs] == [["b.py"]]
+    assert coder.plan_complete
+    # A resumed run of the same plan skips the finished step
+    assert list(RunCheckpoint(str(tmp_path / "ca_logs"), {"plan": [STEP]}, resume=True).finished) == ["1"]
+
+
+def test_a_failed_plan_is_not_recorded(tmp_path):
+    # The plan of an earlier run is still on disk
+    (tmp_path / "ca_logs").mkdir()
+    (tmp_path / "ca_logs" / "plan.json").write_text(json.dumps({"plan": [STEP]}))
+    coder = make_coder(tmp_path, ["```python\nb = 1\n```"])
+    run_streamed(coder, [STEP])
+    assert not coder.plan_complete
+    assert checkpoint_of(tmp_path)["plan_hash"] is None
+    assert RunCheckpoint(str(tmp_path / "ca_logs"), {"plan": [STEP]}, resume=True).finished == {}
+
+
+def streamed_import_coder(tmp_path, responses):
+    """A coder whose steps import pkg modules, and an event set after each verification."""
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    coder = make_coder(tmp_path, responses)
+    verified = asyncio.Event()
+    verify = coder.verifier.verify
+
+    async def verify_and_signal(*args, **kwargs):
+        result = await verify(*args, **kwargs)
+        verified.set()
+        return result
+    coder.verifier.verify = verify_and_signal
+    return coder, verified
+
+
+MAIN = {"step": 1, "modification": "Add main", "save_path": "pkg/main.py", "dependencies": []}
+HELPERS = {"step": 2, "modification": "Add helpers", "save_path": "pkg/helpers.py", "dependencies": []}
+MAIN_CODE = "```python\nfrom pkg.helpers import helper\n\nprint(helper())\n```"
+
+
+def test_an_import_of_a_module_of_a_step_not_streamed_yet_is_not_repaired(tmp_path):
+    coder, verified = streamed_import_coder(tmp_path, [MAIN_CODE, "```python\ndef helper():\n    return 1\n```"])
+
+    async def plan_steps():
+        yield MAIN
+        # The next step is only generated once the first one was verified
+        await verified.wait()
+        yield HELPERS
+        yield {"plan": [MAIN, HELPERS]}
+    outputs = asyncio.run(coder.run("goal", stream_output=False, plan_steps=plan_steps()))
+    assert [(o["verification"]["ok"], o["verification"]["repairs"], o["verification"]["provisional"]) for o in outputs] == \
+        [(True, 0, []), (True, 0, [])]
+    assert (tmp_path / "pkg" / "main.py").read_text().startswith("from pkg.helpers import helper")
+
+
+def test_an_import_that_no_step_creates_is_repaired_once_the_plan_is_complete(tmp_path):
+    coder, verified = streamed_import_coder(tmp_path, [MAIN_CODE, "```python\nprint(1)\n```"])
+
+    async def plan_steps():
+        yield MAIN
+        await verified.wait()
+        yield {"plan": [MAIN]}
+    [output] = asyncio.run(coder.run("goal", stream_output=False, plan_steps=plan_steps()))
+    assert output["verification"]["ok"] and output["verification"]["repairs"] == 1
+    assert (tmp_path / "pkg" / "main.py").read_text() == "print(1)\n"
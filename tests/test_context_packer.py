@@ -0,0 +1,80 @@
+import os
+from agents.context_packer import OUTLINE_NOTE, TRUNCATED_NOTE, ContextPacker, count_tokens, outline_source
+
+MODULE = '''"""Geometry helpers."""
+import math
+
+UNIT = 1.0
+
+
+class Circle:
+    """A circle."""
+    sides = 0
+
+    def __init__(self, radius):
+        self.radius = radius
+
+    def area(self):
+        """Area of the circle."""
+        return math.pi * self.radius ** 2
+
+
+def perimeter(radius):
+    return 2 * math.pi * radius
+''' + "\n\ndef describe(circle):\n" + "".join(f"    print('line {i}', circle.radius * {i})\n" for i in range(40))
+
+
+def write(workspace, rel_path, content):
+    path = os.path.join(workspace, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_outline_keeps_signatures_and_the_named_symbols():
+    outline = outline_source(MODULE, {"perimeter"})
+    assert outline.startswith(OUTLINE_NOTE + '"""Geometry helpers."""\nimport math\nUNIT = 1.0\n')
+    assert '    def area(self):\n        """Area of the circle."""\n        ...\n' in outline
+    assert "math.pi * self.radius" not in outline
+    assert "    return 2 * math.pi * radius\n" in outline
+    assert "    sides = 0\n" in outline
+    assert outline_source("def broken(:\n", set()) is None
+
+
+def test_everything_fits(tmp_path):
+    write(str(tmp_path), "geometry.py", MODULE)
+    write(str(tmp_path), "pkg/a.txt", "a")
+    packer = ContextPacker(str(tmp_path))
+    assert packer.pack(["geometry.py", "pkg", "missing.py"], "Use perimeter") == {
+        "geometry.py": MODULE, "pkg": "Directory containing: a.txt", "missing.py": "missing.py Not found"}
+
+
+def test_large_files_are_outlined_first(tmp_path):
+    write(str(tmp_path), "geometry.py", MODULE)
+    write(str(tmp_path), "small.py", "x = 1\n")
+    outline = outline_source(MODULE, {"Circle"})
+    budget = count_tokens(outline) + count_tokens("x = 1\n")
+    assert budget < count_tokens(MODULE) + count_tokens("x = 1\n")
+    packed = ContextPacker(str(tmp_path), budget_tokens=budget).pack(["geometry.py", "small.py"], "Fix Circle.area")
+    assert packed["small.py"] == "x = 1\n"
+    # The class named by the modification is kept in full
+    assert packed["geometry.py"] == outline
+    assert "math.pi * self.radius" in outline and "return 2 * math.pi * radius" not in outline
+
+
+def test_kept_files_are_never_reduced_and_the_rest_is_truncated(tmp_path):
+    write(str(tmp_path), "target.py", MODULE)
+    write(str(tmp_path), "notes.txt", "\n".join(f"note {i}" for i in range(200)))
+    packed = ContextPacker(str(tmp_path), budget_tokens=count_tokens(MODULE) + 40).pack(
+        ["target.py", "notes.txt"], "Rewrite everything", keep_full=["./target.py"])
+    assert packed["target.py"] == MODULE
+    assert packed["notes.txt"].startswith("note 0\n") and packed["notes.txt"].endswith(TRUNCATED_NOTE)
+    assert count_tokens(packed["notes.txt"]) <= 40
+
+
+def test_files_are_read_again_when_they_change(tmp_path):
+    write(str(tmp_path), "a.py", "x = 1\n")
+    packer = ContextPacker(str(tmp_path))
+    assert packer.pack(["a.py"], "")["a.py"] == "x = 1\n"
+    write(str(tmp_path), "a.py", "x = 22\n")
+    assert packer.pack(["a.py"], "")["a.py"] == "x = 22\n"
@@ -0,0 +1,35 @@
+from agents.file_tree import COLLAPSED, FileTree
+
+PATHS = ["README.md", "pkg", "pkg/a.py", "pkg/b.py", "pkg/deep", "pkg/deep/er", "pkg/deep/er/c.py", "pkg/deep/er/d.json", "empty"]
+
+
+def test_encode_lists_each_directory_once():
+    tree = FileTree(PATHS, dirs=["pkg", "pkg/deep", "pkg/deep/er", "empty"])
+    assert tree.encode() == "./: README.md\nempty/: (empty)\npkg/: a.py, b.py\npkg/deep/er/: c.py, d.json"
+
+
+def test_empty_directories_are_not_files():
+    tree = FileTree(["a.py", "empty", "pkg/empty"], dirs=["empty", "pkg", "pkg/empty"])
+    assert tree.is_dir("empty") and tree.is_dir("pkg/empty")
+    assert tree.files[""] == ["a.py"]
+    assert tree.encode() == "./: a.py\nempty/: (empty)\npkg/empty/: (empty)"
+    assert tree.totals[""][:2] == (1, 3)
+
+
+def test_deep_directories_and_long_listings_are_collapsed():
+    tree = FileTree(PATHS, dirs=["pkg", "pkg/deep", "pkg/deep/er", "empty"])
+    assert tree.encode(max_depth=1).splitlines()[-1] == f"pkg/deep/: 2 files in 1 directories (.py 1, .json 1) {COLLAPSED}"
+    assert tree.encode(root="pkg", max_files=1).splitlines()[0] == f"pkg/: a.py, ... (+1 files: .py 1) {COLLAPSED}"
+
+
+def test_fit_lowers_the_detail_to_the_budget():
+    tree = FileTree([f"pkg/m{i}/f{j}.py" for i in range(20) for j in range(20)])
+    assert tree.fit(10000) == tree.encode(max_depth=6, max_files=50)
+    assert len(tree.fit(20)) < len(tree.fit(10000))
+
+
+def test_expand_only_takes_directories():
+    tree = FileTree(PATHS, dirs=["pkg", "pkg/deep", "pkg/deep/er", "empty"])
+    text, expanded = tree.expand(["pkg/deep/", "pkg/a.py", "missing", 3], 1000)
+    assert expanded == ["pkg/deep"]
+    assert text == "pkg/deep/er/: c.py, d.json"
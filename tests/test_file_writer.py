@@ -0,0 +1,60 @@
+import os
+from agents.file_writer import atomic_write, block_path, parse_code_output, resolve_in_workspace, write_code_output
+
+
+def test_a_single_block_goes_to_the_save_path():
+    assert parse_code_output("Here it is:\n```python\nx = 1\n```\n", "pkg/a.py") == ({"pkg/a.py": "x = 1\n"}, [])
+
+
+def test_several_blocks_are_mapped_to_their_paths():
+    output = ("`pkg/a.py`:\n```python\na = 1\n```\n"
+              "```python:pkg/b.py\nb = 1\n```\n"
+              "```python\n# file: pkg/c.py\nc = 1\n```\n")
+    assert parse_code_output(output, "pkg/a.py") == ({"pkg/a.py": "a = 1\n", "pkg/b.py": "b = 1\n", "pkg/c.py": "c = 1\n"}, [])
+
+
+def test_unmapped_or_repeated_blocks_are_ambiguous():
+    assert parse_code_output("```python\na = 1\n```\n```python\nb = 1\n```\n", "a.py") is None
+    assert parse_code_output("a.py\n```python\na = 1\n```\na.py\n```python\nb = 1\n```\n", "a.py") is None
+    assert parse_code_output("```python\na = 1\n```\n", "a.py", require_paths=True) is None
+
+
+def test_directories_from_the_step_and_mkdir_commands():
+    output = "```bash\nmkdir -p pkg/sub 'other dir'\nls\n```\n"
+    assert parse_code_output(output, "pkg/", {}) == ({}, ["pkg", "pkg/sub", "other dir"])
+    assert parse_code_output("Done.", "pkg", {"type": "create"}) == ({}, ["pkg"])
+    assert parse_code_output("No code here.", "a.py") is None
+
+
+def test_block_path_prefers_the_info_string():
+    assert block_path("python pkg/a.py", "x = 1\n", "See **other.py**") == "pkg/a.py"
+    assert block_path("python", "x = 1\n", "Save it as **pkg/b.py**:") == "pkg/b.py"
+    assert block_path("python", "x = 1\n", "Here is the code:") is None
+
+
+def test_write_code_output(tmp_path):
+    calls = []
+    saved = write_code_output(str(tmp_path), "pkg/a.py\n```python\nx = 1\n```\n```bash\nmkdir data\n```\n", "pkg/a.py",
+                              before_write=calls.append)
+    assert saved == ["pkg/a.py", "data"]
+    assert calls == [["pkg/a.py", "data"]]
+    assert (tmp_path / "pkg" / "a.py").read_text() == "x = 1\n"
+    assert (tmp_path / "data").is_dir()
+
+
+def test_write_code_output_refuses_paths_outside_the_workspace(tmp_path):
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    assert write_code_output(str(workspace), "```python\nx = 1\n```\n", "../a.py") is None
+    assert not (tmp_path / "a.py").exists()
+    assert resolve_in_workspace(str(workspace), "pkg/../a.py") == os.path.join(os.path.realpath(workspace), "a.py")
+
+
+def test_atomic_write_keeps_the_mode(tmp_path):
+    path = tmp_path / "run.sh"
+    path.write_text("old")
+    os.chmod(path, 0o755)
+    atomic_write(str(path), "new")
+    assert path.read_text() == "new"
+    assert os.stat(path).st_mode & 0o777 == 0o755
+    assert os.listdir(tmp_path) == ["run.sh"]
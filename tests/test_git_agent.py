@@ -0,0 +1,61 @@
+import asyncio
+import subprocess
+import pytest
+from autogen_core.models import ModelInfo
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from agents.git_agent import GitAgent, close_git_processes, git_add, git_commit, git_log, git_repos, git_show_file, git_status
+
+
+@pytest.fixture
+def repo(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    subprocess.run(["git", "-C", str(tmp_path), "config", "user.email", "test@example.com"], check=True)
+    subprocess.run(["git", "-C", str(tmp_path), "config", "user.name", "test"], check=True)
+    (tmp_path / "a.txt").write_text("one\n")
+    return str(tmp_path)
+
+
+def test_show_file_reads_through_one_process_until_closed(repo):
+    async def run():
+        assert (await git_add("a.txt", cwd=repo))["success"]
+        assert (await git_commit("first", cwd=repo))["success"]
+        assert await git_show_file("a.txt", cwd=repo) == {"success": True, "output": "one\n"}
+        assert not (await git_show_file("missing.txt", cwd=repo))["success"]
+        process = next(iter(git_repos.values())).cat_file.process
+        assert (await git_show_file("a.txt", cwd=repo))["success"]
+        assert next(iter(git_repos.values())).cat_file.process is process
+        await close_git_processes()
+        assert process.returncode is not None and git_repos == {}
+    asyncio.run(run())
+
+
+def test_cached_outputs_follow_commits(repo):
+    async def run():
+        try:
+            await git_add("a.txt", cwd=repo)
+            await git_commit("first", cwd=repo)
+            assert (await git_log(cwd=repo))["output"].endswith("first")
+            assert "nothing to commit" in (await git_status(cwd=repo))["output"]
+            with open(f"{repo}/b.txt", "w") as f:
+                f.write("two\n")
+            await git_add("b.txt", cwd=repo)
+            await git_commit("second", cwd=repo)
+            assert (await git_log(n=1, cwd=repo))["output"].endswith("second")
+            assert len((await git_log(cwd=repo))["output"].splitlines()) == 2
+        finally:
+            await close_git_processes()
+    asyncio.run(run())
+
+
+def test_git_agent_close_stops_the_cat_file_processes(repo):
+    model_info = ModelInfo(vision=False, function_calling=True, json_output=False, family="unknown", structured_output=False)
+    agent = GitAgent(name="git_agent", model_client=ReplayChatCompletionClient([], model_info=model_info), workspace=repo)
+
+    async def run():
+        await git_add("a.txt", cwd=repo)
+        await git_commit("first", cwd=repo)
+        await git_show_file("a.txt", cwd=repo)
+        process = next(iter(git_repos.values())).cat_file.process
+        await agent.close()
+        return process
+    assert asyncio.run(run()).returncode is not None
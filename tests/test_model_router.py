@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from autogen_core.models import CreateResult, RequestUsage
+from agents.model_router import HedgedChatCompletionClient, LatencyTracker, RoutedChatCompletionClient, first_success, model_role
+from agents.tracing import tracer
+
+
+def result(content):
+    return CreateResult(finish_reason="stop", content=content, usage=RequestUsage(prompt_tokens=1, completion_tokens=1), cached=False)
+
+
+class DelayedClient:
+    """Answers every call with its name after delay seconds, or raises error."""
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.closed_streams = 0
+
+    async def create(self, messages, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return result(self.name)
+
+    async def create_stream(self, messages, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+            yield f"{self.name} chunk"
+            yield result(self.name)
+        finally:
+            self.closed_streams += 1
+
+    async def close(self):
+        pass
+
+
+def test_latency_tracker_quantiles():
+    tracker = LatencyTracker(window=10)
+    for seconds in range(20):
+        tracker.add(seconds)
+    assert list(tracker.samples) == list(range(10, 20))
+    assert tracker.quantile(0.5) == 15 and tracker.quantile(1.0) == 19
+
+
+def test_first_success_skips_failures_and_cancels_the_rest():
+    async def run():
+        async def fail():
+            raise ValueError("first")
+
+        slow = asyncio.ensure_future(asyncio.sleep(10))
+        winner = await first_success([asyncio.ensure_future(fail()), asyncio.ensure_future(asyncio.sleep(0.01, "ok")), slow])
+        return winner.result(), slow.cancelled()
+    assert asyncio.run(run()) == ("ok", True)
+
+    async def all_fail():
+        async def fail(message, delay):
+            await asyncio.sleep(delay)
+            raise ValueError(message)
+        await first_success([asyncio.ensure_future(fail("second", 0.02)), asyncio.ensure_future(fail("first", 0))])
+    with pytest.raises(ValueError, match="first"):
+        asyncio.run(all_fail())
+
+
+def test_a_fast_primary_is_not_hedged():
+    primary, secondary = DelayedClient("primary"), DelayedClient("secondary")
+    client = HedgedChatCompletionClient(primary, secondary, initial_delay=0.5)
+    assert asyncio.run(client.create([])).content == "primary"
+    assert (secondary.calls, client.hedges) == (0, 0)
+
+
+def test_a_slow_primary_is_hedged_and_loses():
+    primary, secondary = DelayedClient("primary", delay=5), DelayedClient("secondary")
+    client = HedgedChatCompletionClient(primary, secondary, initial_delay=0.01)
+
+    async def run():
+        with tracer.span("create", "llm") as span:
+            answer = await client.create([])
+        return answer, span["args"]
+    answer, args = asyncio.run(run())
+    assert answer.content == "secondary"
+    assert (client.hedges, client.hedge_wins, primary.cancelled) == (1, 1, 1)
+    assert args["hedged"] and args["hedge_won"]
+
+
+def test_without_a_delay_calls_are_not_hedged():
+    primary, secondary = DelayedClient("primary", delay=0.02), DelayedClient("secondary")
+    client = HedgedChatCompletionClient(primary, secondary)
+    assert asyncio.run(client.create([])).content == "primary"
+    assert client.hedge_delay() is None and secondary.calls == 0
+
+
+def test_the_delay_follows_the_measured_latencies():
+    client = HedgedChatCompletionClient(DelayedClient("primary"), DelayedClient("secondary"), quantile=0.5, min_samples=3,
+                                        initial_delay=9, min_delay=0.2)
+    assert client.hedge_delay() == 9
+    for seconds in (0.1, 0.3, 0.5):
+        client.latencies.add(seconds)
+    assert client.hedge_delay() == 0.3
+    client.latencies.samples.clear()
+    for seconds in (0.01, 0.01, 0.01):
+        client.latencies.add(seconds)
+    assert client.hedge_delay() == 0.2
+
+
+def test_a_hedged_stream_follows_the_winner_and_closes_the_loser():
+    primary, secondary = DelayedClient("primary", delay=5), DelayedClient("secondary")
+    client = HedgedChatCompletionClient(primary, secondary, initial_delay=0.01)
+
+    async def run():
+        return [chunk async for chunk in client.create_stream([])]
+    chunks = asyncio.run(run())
+    assert chunks[0] == "secondary chunk" and chunks[-1].content == "secondary"
+    assert primary.closed_streams == 1
+
+
+def test_calls_are_routed_by_role():
+    default, fast = DelayedClient("default"), DelayedClient("fast")
+    client = RoutedChatCompletionClient(("big", default), {"save": ("small", fast)})
+
+    async def run():
+        answers = []
+        with tracer.span("create", "llm") as span:
+            with model_role("save"):
+                answers.append((await client.create([])).content)
+        answers.append((await client.create([])).content)
+        with model_role("code"):
+            answers.append((await client.create([])).content)
+        return answers, span["args"]
+    answers, args = asyncio.run(run())
+    assert answers == ["fast", "default", "default"]
+    assert args == {"role": "save", "model": "small"}
@@ -0,0 +1,78 @@
+import os
+import pytest
+from agents.patching import PatchError, apply_edit, apply_edits, parse_edits, strip_edits
+
+SOURCE = "def f():\n    return 1\n\n\ndef g():\n    return 1\n"
+
+
+def write(tmp_path, rel_path, content):
+    path = tmp_path / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return path
+
+
+def test_parse_search_replace_blocks():
+    text = ("pkg/a.py\n```python\n<<<<<<< SEARCH\nx = 1\n=======\nx = 2\n>>>>>>> REPLACE\n```\n"
+            "<<<<<<< SEARCH\ny = 1\n=======\ny = 2\n>>>>>>> REPLACE\n")
+    assert parse_edits(text, "default.py") == [("pkg/a.py", "x = 1\n", "x = 2\n", None),
+                                               ("pkg/a.py", "y = 1\n", "y = 2\n", None)]
+
+
+def test_parse_unified_diff():
+    text = "--- a/a.py\n+++ b/a.py\n@@ -5,2 +5,2 @@\n def g():\n-    return 1\n+    return 2\n"
+    assert parse_edits(text, "default.py") == [("a.py", "def g():\n    return 1\n", "def g():\n    return 2\n", 5)]
+
+
+def test_unterminated_block_is_rejected():
+    with pytest.raises(PatchError):
+        parse_edits("<<<<<<< SEARCH\nx = 1\n=======\nx = 2\n", "a.py")
+
+
+def test_strip_edits_keeps_full_files():
+    text = "```python\nfull = 1\n```\n```\n<<<<<<< SEARCH\nx\n=======\ny\n>>>>>>> REPLACE\n```\n"
+    assert strip_edits(text) == "```python\nfull = 1\n```\n\n"
+
+
+def test_apply_edit_tolerates_trailing_whitespace():
+    assert apply_edit("a = 1   \nb = 2\n", "a = 1\nb = 2\n", "a = 3\n") == "a = 3\n"
+
+
+def test_apply_edit_rejects_a_missing_search():
+    with pytest.raises(PatchError, match="not found"):
+        apply_edit(SOURCE, "return 3\n", "return 4\n")
+
+
+def test_apply_edit_rejects_an_ambiguous_search_without_a_hint():
+    with pytest.raises(PatchError, match="2 places"):
+        apply_edit(SOURCE, "    return 1\n", "    return 2\n")
+    # The hunk line picks the closest match
+    assert apply_edit(SOURCE, "    return 1\n", "    return 2\n", hint_line=6).endswith("def g():\n    return 2\n")
+
+
+def test_apply_edit_rejects_an_empty_search_in_a_file_with_content():
+    assert apply_edit("", "", "x = 1\n") == "x = 1\n"
+    with pytest.raises(PatchError):
+        apply_edit(SOURCE, "", "x = 1\n")
+
+
+def test_apply_edits_does_not_write(tmp_path):
+    path = write(tmp_path, "a.py", SOURCE)
+    patched = apply_edits(str(tmp_path), [("a.py", "def f():\n    return 1\n", "def f():\n    return 0\n", None),
+                                          ("new.py", "", "x = 1\n", None)])
+    assert patched == {"a.py": SOURCE.replace("return 1", "return 0", 1), "new.py": "x = 1\n"}
+    assert path.read_text() == SOURCE
+    assert not os.path.exists(tmp_path / "new.py")
+
+
+def test_apply_edits_rejects_python_that_does_not_parse(tmp_path):
+    write(tmp_path, "a.py", SOURCE)
+    with pytest.raises(PatchError, match="does not parse"):
+        apply_edits(str(tmp_path), [("a.py", "    return 1\n\n\n", "    return (\n\n\n", 2)])
+
+
+def test_apply_edits_rejects_paths_outside_the_workspace(tmp_path):
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    with pytest.raises(PatchError, match="outside"):
+        apply_edits(str(workspace), [("../a.py", "", "x = 1\n", None)])
@@ -0,0 +1,65 @@
+import json
+import pytest
+from agents.plan_stream import PlanStreamParser, parse_plan, strip_json_extras
+
+
+def feed_in_chunks(text, size=5):
+    parser = PlanStreamParser()
+    steps = []
+    for i in range(0, len(text), size):
+        steps.extend(parser.feed(text[i:i + size]))
+    return parser, steps
+
+
+def test_steps_are_returned_as_their_objects_complete():
+    parser = PlanStreamParser()
+    assert parser.feed('{"plan": [{"modification": "a", "save_path": "a.py"}, {"modif') == \
+        [{"modification": "a", "save_path": "a.py", "step": 1}]
+    assert parser.feed('ication": "b", "save_path": "b.py"}]}') == [{"modification": "b", "save_path": "b.py", "step": 2}]
+    assert parser.done
+
+
+def test_braces_quotes_and_comments_in_strings():
+    plan = {"plan": [{"step": 7, "modification": 'use {} and "#" // here', "save_path": "a.py"}]}
+    parser, steps = feed_in_chunks(json.dumps(plan), size=3)
+    assert steps == plan["plan"]
+    assert parser.rejected == []
+
+
+def test_malformed_objects_are_rejected_with_their_position():
+    text = """{"plan": [
+        {"modification": "a", "save_path": "a.py"},
+        {"modification": "b", "save_path": },
+        {"modification": "c"},
+        {"modification": "d", "save_path": "d.py",},  # trailing comma and comment
+    ]}"""
+    parser, steps = feed_in_chunks(text)
+    assert [(s["step"], s["save_path"]) for s in steps] == [(1, "a.py"), (4, "d.py")]
+    assert [position for position, _ in parser.rejected] == [2, 3]
+    assert parser.rejected[1][1] == '{"modification": "c"}'
+    assert parser.objects == 4
+
+
+def test_text_before_the_plan_is_skipped():
+    parser, steps = feed_in_chunks('Here is the plan: {"structure": {"a": [1]}, "plan": [{"modification": "a", "save_path": "a.py"}]}')
+    assert [s["save_path"] for s in steps] == ["a.py"]
+
+
+def test_parse_plan_of_a_fenced_response():
+    text = 'Plan:\n```json\n{"plan": [\n  {"step": 1, "modification": "a", "save_path": "a.py"}, // first\n]}\n```'
+    assert parse_plan(text) == {"plan": [{"step": 1, "modification": "a", "save_path": "a.py"}]}
+
+
+def test_parse_plan_of_a_bare_array():
+    assert parse_plan('[{"modification": "a", "save_path": "a.py"}]') == {"plan": [{"modification": "a", "save_path": "a.py"}]}
+
+
+def test_parse_plan_without_a_plan():
+    with pytest.raises(ValueError):
+        parse_plan("I could not make a plan.")
+    with pytest.raises(ValueError):
+        parse_plan('{"structure": {}}')
+
+
+def test_strip_json_extras_keeps_strings():
+    assert json.loads(strip_json_extras('{"a": "x, ] # y",  # note\n "b": [1, 2,],}')) == {"a": "x, ] # y", "b": [1, 2]}
@@ -0,0 +1,127 @@
+import asyncio
+import time
+import types
+import pytest
+from autogen_core.models import CreateResult, RequestUsage, UserMessage
+from agents.rate_limit import RateLimitedChatCompletionClient, TokenBucket, is_retryable, retry_after
+
+MESSAGES = [UserMessage(content="hello", source="user")]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class FlakyClient:
+    """Raises the given errors on the first calls, then answers."""
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def create(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return CreateResult(finish_reason="stop", content=f"{len(messages)} messages",
+                            usage=RequestUsage(prompt_tokens=10, completion_tokens=5), cached=False)
+
+    async def create_stream(self, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        yield "chunk"
+        yield CreateResult(finish_reason="stop", content="streamed", usage=RequestUsage(prompt_tokens=10, completion_tokens=5), cached=False)
+
+
+def limited(inner, **kwargs):
+    return RateLimitedChatCompletionClient(inner, base_delay=0.001, **kwargs)
+
+
+def test_retryable_errors():
+    assert is_retryable(StatusError(429)) and is_retryable(StatusError(503)) and is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(StatusError(400)) and not is_retryable(ValueError())
+    assert retry_after(StatusError(429, {"retry-after": "0.5"})) == 0.5
+    assert retry_after(StatusError(429, {"retry-after": "soon"})) is None
+
+
+def test_transient_errors_are_retried():
+    inner = FlakyClient([StatusError(429), StatusError(502)])
+    client = limited(inner)
+    assert asyncio.run(client.create(MESSAGES)).content == "1 messages"
+    assert inner.calls == 3
+    assert (client.retries, client.failures) == (2, 0)
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    client = limited(FlakyClient([StatusError(400)]))
+    with pytest.raises(StatusError, match="400"):
+        asyncio.run(client.create(MESSAGES))
+    assert (client.retries, client.failures) == (0, 1)
+    client = limited(FlakyClient([StatusError(503)] * 3), max_retries=2)
+    with pytest.raises(StatusError, match="503"):
+        asyncio.run(client.create(MESSAGES))
+    assert (client.retries, client.failures) == (2, 1)
+
+
+def test_identical_requests_in_flight_are_coalesced():
+    inner = FlakyClient(delay=0.02)
+    client = limited(inner)
+
+    async def run():
+        return await asyncio.gather(client.create(MESSAGES), client.create(MESSAGES), client.create(MESSAGES[:0]))
+    first, second, other = asyncio.run(run())
+    assert inner.calls == 2 and client.coalesced == 1
+    assert first.content == second.content and first is not second
+    assert other.content != first.content
+    assert client.in_flight == {}
+
+
+def test_a_cancelled_caller_does_not_cancel_the_coalesced_request():
+    inner = FlakyClient(delay=0.05)
+    client = limited(inner)
+
+    async def run():
+        first = asyncio.ensure_future(client.create(MESSAGES))
+        second = asyncio.ensure_future(client.create(MESSAGES))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+    assert asyncio.run(run()).content == "1 messages" and inner.calls == 1
+
+
+def test_streams_are_retried_until_their_first_chunk():
+    client = limited(FlakyClient([StatusError(429)]))
+
+    async def run():
+        return [chunk async for chunk in client.create_stream(MESSAGES)]
+    chunks = asyncio.run(run())
+    assert chunks[0] == "chunk" and chunks[-1].content == "streamed" and client.retries == 1
+
+
+def test_token_bucket_waits_for_its_refill():
+    async def run():
+        bucket = TokenBucket(per_minute=600, capacity=1)
+        start = time.monotonic()
+        await bucket.acquire(1)
+        await bucket.acquire(1)
+        await bucket.acquire(1)
+        return time.monotonic() - start
+    # 10 units a second: the second and third acquisitions wait about 0.1s each
+    assert 0.15 <= asyncio.run(run()) < 1.0
+
+
+def test_requests_wait_for_the_budgets():
+    client = limited(FlakyClient(), requests_per_minute=600, tokens_per_minute=600000, completion_reserve=0)
+    client.request_bucket.level = 0
+
+    async def run():
+        start = time.monotonic()
+        await client.create(MESSAGES)
+        return time.monotonic() - start
+    assert asyncio.run(run()) >= 0.05
+    assert client.metrics()["requests"] == 1 and client.metrics()["max_wait_s"] >= 0.05
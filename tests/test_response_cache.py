@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from autogen_core.models import CreateResult, SystemMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from agents.response_cache import CacheMissError, CachingChatCompletionClient, DiskResponseStore, request_key
+
+MESSAGES = [SystemMessage(content="system"), UserMessage(content="hello", source="user")]
+
+
+def entry(size):
+    return {"content": "x" * size}
+
+
+def test_store_evicts_the_least_recently_used(tmp_path):
+    store = DiskResponseStore(str(tmp_path), max_bytes=100)
+    store.set("a", entry(30))
+    store.set("b", entry(30))
+    assert store.get("a") == entry(30)
+    store.set("c", entry(30))
+    # "b" is the least recently used
+    assert store.get("b") is None
+    assert store.get("a") == entry(30) and store.get("c") == entry(30)
+    assert store.total_bytes <= 100
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.json", "c.json"]
+
+
+def test_store_is_reloaded_and_survives_lost_files(tmp_path):
+    store = DiskResponseStore(str(tmp_path))
+    store.set("a", entry(1))
+    store.set("b", entry(1))
+    reloaded = DiskResponseStore(str(tmp_path))
+    assert reloaded.get("a") == entry(1)
+    (tmp_path / "b.json").write_text("{broken")
+    assert reloaded.get("b") is None
+    assert "b" not in reloaded.entries and not (tmp_path / "b.json").exists()
+
+
+def test_request_key_covers_the_request():
+    key = request_key("m", {"temperature": 0}, MESSAGES)
+    assert key == request_key("m", {"temperature": 0}, list(MESSAGES))
+    assert key != request_key("other", {"temperature": 0}, MESSAGES)
+    assert key != request_key("m", {"temperature": 1}, MESSAGES)
+    assert key != request_key("m", {"temperature": 0}, MESSAGES[1:])
+    assert key != request_key("m", {"temperature": 0}, MESSAGES, extra_create_args={"seed": 1})
+
+
+def caching_client(tmp_path, responses, mode):
+    return CachingChatCompletionClient(ReplayChatCompletionClient(responses), DiskResponseStore(str(tmp_path)), model_name="m", mode=mode)
+
+
+def test_read_through_calls_the_model_once(tmp_path):
+    client = caching_client(tmp_path, ["first", "second"], "read_through")
+
+    async def run():
+        return await client.create(MESSAGES), await client.create(MESSAGES)
+    first, again = asyncio.run(run())
+    # The model would have answered "second"
+    assert (first.content, again.content, again.cached) == ("first", "first", True)
+    assert (client.hits, client.misses) == (1, 1)
+
+
+def test_record_overwrites_and_replay_reads(tmp_path):
+    recorder = caching_client(tmp_path, ["first", "second"], "record")
+
+    async def record():
+        await recorder.create(MESSAGES)
+        return await recorder.create(MESSAGES)
+    assert asyncio.run(record()).content == "second"
+    replayer = caching_client(tmp_path, [], "replay")
+    assert asyncio.run(replayer.create(MESSAGES)).content == "second"
+    with pytest.raises(CacheMissError):
+        asyncio.run(replayer.create(MESSAGES[1:]))
+
+
+def test_streams_are_cached_as_their_result(tmp_path):
+    client = caching_client(tmp_path, ["streamed answer"], "read_through")
+
+    async def stream():
+        return [chunk async for chunk in client.create_stream(MESSAGES)]
+    first = asyncio.run(stream())
+    assert isinstance(first[-1], CreateResult) and len(first) > 1
+    [cached] = asyncio.run(stream())
+    assert cached.content == "streamed answer" and cached.cached
@@ -0,0 +1,74 @@
+import os
+import pytest
+from agents.retrieval import RetrievalIndex, document_terms, tokenize
+
+FILES = {
+    "parser/code_output.py": '"""Parse the code blocks of a model answer."""\ndef parse_code_output(text):\n    return text\n',
+    "storage/cache.py": '"""Disk cache of responses."""\nclass DiskResponseStore:\n    pass\n',
+    "README.md": "A project that writes code with agents.\n",
+    "logo.png": b"\x89PNG\0\0binary",
+}
+
+
+def write(workspace, rel_path, content):
+    path = workspace / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(content, bytes):
+        path.write_bytes(content)
+    else:
+        path.write_text(content)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "code"
+    for rel_path, content in FILES.items():
+        write(root, rel_path, content)
+    return root
+
+
+def test_identifiers_are_split_into_their_parts():
+    assert tokenize("parse_code_output") == ["parse_code_output", "parse", "output"]
+    assert tokenize("DiskResponseStore HTTPServer") == ["diskresponsestore", "disk", "response", "store",
+                                                        "httpserver", "http", "server"]
+    assert tokenize("the code of a file") == []
+
+
+def test_paths_and_names_weigh_more_than_text():
+    terms = document_terms("parser/code_output.py", FILES["parser/code_output.py"].encode())
+    assert terms["parser"] == 3 and terms["output"] == 3 + 2
+    assert terms["blocks"] == 1
+    assert document_terms("logo.png", FILES["logo.png"]) == {"logo": 3, "png": 3}
+
+
+def test_search_ranks_the_matching_files(workspace, tmp_path):
+    index = RetrievalIndex(str(workspace), str(tmp_path / "index.json"))
+    assert index.update(FILES) == len(FILES)
+    results = index.search("fix the parser of code output")
+    assert results[0][0] == os.path.normpath("parser/code_output.py")
+    assert [path for path, _ in results] == [os.path.normpath("parser/code_output.py")]
+    assert index.search("response store cache")[0][0] == os.path.normpath("storage/cache.py")
+    assert index.search("nothing matches zebra") == []
+    assert len(index.search("agents parse cache", k=2)) == 2
+
+
+def test_update_only_reindexes_changed_files(workspace, tmp_path):
+    index_path = str(tmp_path / "index.json")
+    index = RetrievalIndex(str(workspace), index_path)
+    index.update(FILES)
+    reloaded = RetrievalIndex(str(workspace), index_path)
+    assert reloaded.entries == index.entries
+    assert reloaded.update(FILES) == 0
+
+    write(workspace, "storage/cache.py", '"""Cache of embeddings on disk."""\n')
+    kept = [p for p in FILES if p != "README.md"]
+    assert reloaded.update(kept) == 2
+    assert "README.md" not in reloaded.entries
+    assert reloaded.search("embeddings")[0][0] == os.path.normpath("storage/cache.py")
+    assert reloaded.search("agents") == []
+
+
+def test_missing_files_and_directories_are_skipped(workspace, tmp_path):
+    index = RetrievalIndex(str(workspace), str(tmp_path / "index.json"))
+    assert index.update(["parser", "missing.py", "README.md"]) == 1
+    assert list(index.entries) == ["README.md"]
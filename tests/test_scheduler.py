@@ -0,0 +1,60 @@
+import asyncio
+from agents.scheduler import build_step_graph, run_steps, step_waits
+
+
+def step(save_path, *dependencies):
+    return {"save_path": save_path, "dependencies": list(dependencies)}
+
+
+def test_independent_steps_do_not_wait():
+    steps = [step("a.py"), step("b.py", "c.py"), step("d/e.py")]
+    assert build_step_graph(steps) == {0: set(), 1: set(), 2: set()}
+
+
+def test_read_after_write():
+    steps = [step("pkg/a.py"), step("b.py", "pkg/a.py")]
+    assert step_waits(steps, 1) == {0}
+
+
+def test_reading_a_directory_waits_for_the_writes_inside_it():
+    steps = [step("pkg/a.py"), step("b.py", "pkg")]
+    assert step_waits(steps, 1) == {0}
+
+
+def test_write_after_read():
+    # The earlier step must see the original file
+    steps = [step("b.py", "a.py"), step("a.py")]
+    assert step_waits(steps, 1) == {0}
+
+
+def test_write_after_write():
+    steps = [step("a.py"), step("./a.py")]
+    assert step_waits(steps, 1) == {0}
+
+
+def test_write_inside_a_created_directory():
+    steps = [step("pkg/"), step("pkg/sub/a.py"), step("pkgs/b.py")]
+    assert step_waits(steps, 1) == {0}
+    # A shared name prefix is not a parent directory
+    assert step_waits(steps, 2) == set()
+
+
+def test_only_earlier_steps_are_waited_for():
+    steps = [step("b.py", "a.py"), step("a.py"), step("c.py", "a.py", "b.py")]
+    assert build_step_graph(steps) == {0: set(), 1: {0}, 2: {0, 1}}
+
+
+def test_run_steps_orders_dependent_steps_and_overlaps_the_others():
+    steps = [step("a.py"), step("b.py"), step("c.py", "a.py")]
+    events = []
+
+    async def run_step(coding_step):
+        events.append(("start", coding_step["save_path"]))
+        await asyncio.sleep(0.01)
+        events.append(("end", coding_step["save_path"]))
+        return coding_step["save_path"]
+
+    results = asyncio.run(run_steps(steps, run_step, max_concurrency=3))
+    assert results == ["a.py", "b.py", "c.py"]
+    assert events.index(("end", "a.py")) < events.index(("start", "c.py"))
+    assert events.index(("start", "b.py")) < events.index(("end", "a.py"))
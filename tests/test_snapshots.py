@@ -0,0 +1,108 @@
+import os
+import pytest
+from agents.file_writer import atomic_write
+from agents.snapshots import SnapshotError, SnapshotStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("a = 1\n")
+    return SnapshotStore(str(workspace), str(tmp_path / "snapshots"))
+
+
+def read(store, rel_path):
+    with open(os.path.join(store.workspace, rel_path)) as f:
+        return f.read()
+
+
+def write(store, rel_path, content):
+    full_path = os.path.join(store.workspace, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    atomic_write(full_path, content)
+
+
+def test_rollback_restores_files_and_removes_created_ones(store):
+    store.record("run-1", ["a.py", "pkg/sub/b.py"], run="run", step=1)
+    write(store, "a.py", "a = 2\n")
+    write(store, "pkg/sub/b.py", "b = 1\n")
+    store.finish("run-1")
+    files = store.get("run-1")["files"]
+    # The new file and its missing parent directories are recorded as absent
+    assert {p for p, digest in files.items() if digest is None} == {"pkg", os.path.join("pkg", "sub"), os.path.join("pkg", "sub", "b.py")}
+    result = store.rollback("run-1")
+    assert result == {"restored": ["a.py", "pkg", os.path.join("pkg", "sub"), os.path.join("pkg", "sub", "b.py")], "skipped": []}
+    assert read(store, "a.py") == "a = 1\n"
+    assert os.listdir(store.workspace) == ["a.py"]
+    assert store.snapshots == []
+
+
+def test_a_path_keeps_its_state_before_the_step(store):
+    store.record("run-1", ["a.py"], run="run", step=1)
+    write(store, "a.py", "a = 2\n")
+    store.record("run-1", ["a.py"])
+    write(store, "a.py", "a = 3\n")
+    store.rollback("run-1")
+    assert read(store, "a.py") == "a = 1\n"
+
+
+def test_rollback_to_a_step_boundary_undoes_the_later_steps(store):
+    for step, content in ((1, "a = 2\n"), (2, "a = 3\n")):
+        store.record(f"run-{step}", ["a.py", f"s{step}.py"], run="run", step=step)
+        write(store, "a.py", content)
+        write(store, f"s{step}.py", "")
+    assert store.find(1)["id"] == "run-1"
+    store.rollback(store.find(1)["id"])
+    assert read(store, "a.py") == "a = 1\n"
+    assert sorted(os.listdir(store.workspace)) == ["a.py"]
+
+
+def test_undoing_one_step_skips_the_paths_of_later_steps(store):
+    store.record("run-1", ["a.py", "s1.py"], run="run", step=1)
+    write(store, "a.py", "a = 2\n")
+    write(store, "s1.py", "")
+    store.record("run-2", ["a.py"], run="run", step=2)
+    write(store, "a.py", "a = 3\n")
+    assert store.rollback("run-1", include_later=False) == {"restored": ["s1.py"], "skipped": ["a.py"]}
+    assert read(store, "a.py") == "a = 3\n"
+    assert not os.path.exists(os.path.join(store.workspace, "s1.py"))
+    assert [s["id"] for s in store.snapshots] == ["run-2"]
+
+
+def test_finish_detaches_blobs_from_files_edited_in_place(store):
+    store.record("run-1", ["a.py"], run="run", step=1)
+    store.finish("run-1")
+    with open(os.path.join(store.workspace, "a.py"), "a") as f:
+        f.write("b = 2\n")
+    store.rollback("run-1")
+    assert read(store, "a.py") == "a = 1\n"
+
+
+def test_a_modified_blob_is_not_restored(store):
+    store.record("run-1", ["a.py"], run="run", step=1)
+    store.finish("run-1")
+    with open(store.blob_path(store.get("run-1")["files"]["a.py"]), "w") as f:
+        f.write("tampered\n")
+    with pytest.raises(SnapshotError):
+        store.rollback("run-1")
+
+
+def test_the_manifest_is_reloaded(store):
+    store.record("run-1", ["a.py"], run="run", step=1)
+    reloaded = SnapshotStore(store.workspace, store.root)
+    assert reloaded.find(1, run="run")["id"] == "run-1"
+    with pytest.raises(SnapshotError):
+        reloaded.find(2)
+    with pytest.raises(SnapshotError):
+        reloaded.rollback("run-9")
+
+
+def test_gc_keeps_the_most_recent_snapshots_and_their_blobs(store):
+    for step in range(1, 4):
+        store.record(f"run-{step}", ["a.py"], run="run", step=step)
+        write(store, "a.py", f"a = {step + 1}\n")
+    assert store.gc(keep=1) == 2
+    assert [s["id"] for s in store.snapshots] == ["run-3"]
+    store.rollback("run-3")
+    assert read(store, "a.py") == "a = 3\n"
@@ -0,0 +1,81 @@
+import os
+from agents.definitions import extract_definitions
+from agents.symbol_index import SymbolIndex
+
+SOURCE = '''"""Shapes.
+
+More text."""
+
+
+class Square:
+    """A square."""
+    def __init__(self, side: float = 1.0):
+        self.side = side
+
+    def area(self):
+        return self.side ** 2
+
+
+async def load(path, *args, mode="r", **kwargs):
+    """Load a shape."""
+'''
+
+
+def write(workspace, rel_path, content):
+    path = os.path.join(workspace, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_extract_definitions():
+    definitions = extract_definitions("shapes.py", SOURCE)
+    [square] = definitions["classes"]
+    assert square["init args"] == [{"name": "side", "type": "float", "default": "1.0"}]
+    assert [m["name"] for m in square["methods"]] == ["area"] and square["methods"][0]["args"] == []
+    assert [a["name"] for a in definitions["functions"][0]["args"]] == ["path", "*args", "mode", "**kwargs"]
+    assert definitions["functions"][0]["args"][2]["default"] == "'r'"
+    assert definitions["files"] == [{"path": "shapes.py", "description": "Shapes."}]
+
+
+def test_update_only_reparses_changed_files(tmp_path):
+    workspace = str(tmp_path)
+    write(workspace, "shapes.py", SOURCE)
+    write(workspace, "notes.txt", "notes")
+    index = SymbolIndex(workspace, str(tmp_path / "index.json"))
+    assert sorted(index.update(["shapes.py", "notes.txt", "missing.py"])) == ["notes.txt", "shapes.py"]
+    assert index.update(["shapes.py", "notes.txt"]) == []
+    write(workspace, "shapes.py", SOURCE + "\n\ndef perimeter(side):\n    return 4 * side\n")
+    assert index.update(["shapes.py", "notes.txt"]) == ["shapes.py"]
+    assert [f["name"] for f in index.definitions()["functions"]] == ["load", "perimeter"]
+    assert [f["path"] for f in index.definitions()["files"]] == ["notes.txt", "shapes.py"]
+
+
+def test_removed_and_unparsable_files(tmp_path):
+    workspace = str(tmp_path)
+    write(workspace, "a.py", "def f():\n    pass\n")
+    index = SymbolIndex(workspace, str(tmp_path / "index.json"))
+    index.update(["a.py"])
+    write(workspace, "a.py", "def f(:\n")
+    assert index.update(["a.py"]) == ["a.py"]
+    assert index.definitions()["functions"] == [] and index.definitions()["files"] == [{"path": "a.py", "description": ""}]
+    os.remove(os.path.join(workspace, "a.py"))
+    assert index.update(["a.py"]) == ["a.py"]
+    assert index.entries == {}
+
+
+def test_the_index_is_persisted(tmp_path):
+    workspace = str(tmp_path)
+    write(workspace, "a.py", "def f():\n    pass\n")
+    SymbolIndex(workspace, str(tmp_path / "index.json")).update(["a.py"])
+    assert SymbolIndex(workspace, str(tmp_path / "index.json")).update(["a.py"]) == []
+
+
+def test_many_files_are_parsed_in_a_process_pool(tmp_path):
+    workspace = str(tmp_path)
+    paths = [f"pkg/m{i}.py" for i in range(4)]
+    for i, rel_path in enumerate(paths):
+        write(workspace, rel_path, f"def f{i}():\n    pass\n")
+    index = SymbolIndex(workspace, str(tmp_path / "index.json"), max_workers=2, parallel_threshold=2)
+    assert sorted(index.update(paths)) == paths
+    assert [f["name"] for f in index.definitions()["functions"]] == ["f0", "f1", "f2", "f3"]
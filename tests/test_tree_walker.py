@@ -0,0 +1,64 @@
+import os
+from agents.tree_walker import IgnoreMatcher, walk_workspace
+
+
+def test_unanchored_patterns_match_at_any_depth():
+    matcher = IgnoreMatcher(["*.pyc", "__pycache__/"])
+    assert matcher.ignored("a.pyc")
+    assert matcher.ignored("pkg/sub/a.pyc")
+    assert matcher.ignored("pkg/__pycache__", is_dir=True)
+    assert not matcher.ignored("a.py")
+
+
+def test_directory_patterns_skip_files():
+    matcher = IgnoreMatcher(["build/"])
+    assert matcher.ignored("build", is_dir=True)
+    assert not matcher.ignored("build")
+
+
+def test_anchored_patterns_match_from_the_root():
+    matcher = IgnoreMatcher(["/dist", "docs/*.md"])
+    assert matcher.ignored("dist", is_dir=True)
+    assert not matcher.ignored("pkg/dist", is_dir=True)
+    assert matcher.ignored("docs/a.md")
+    assert not matcher.ignored("docs/sub/a.md")
+    assert not matcher.ignored("pkg/docs/a.md")
+
+
+def test_double_star_patterns():
+    matcher = IgnoreMatcher(["**/fixtures/*.json", "logs/**"])
+    assert matcher.ignored("fixtures/a.json")
+    assert matcher.ignored("a/b/fixtures/a.json")
+    assert matcher.ignored("logs/2024/a.txt")
+    assert not matcher.ignored("logs", is_dir=True)
+
+
+def test_the_last_matching_pattern_wins():
+    matcher = IgnoreMatcher(["*.log", "!keep.log", "keep*.log"])
+    assert matcher.ignored("a.log")
+    assert matcher.ignored("keep.log")
+    assert not IgnoreMatcher(["*.log", "!keep.log"]).ignored("pkg/keep.log")
+    assert IgnoreMatcher(["!keep.log", "*.log"]).ignored("keep.log")
+
+
+def test_comments_and_blank_lines_are_skipped():
+    matcher = IgnoreMatcher(["# *.py", "", "   ", "\\#notes"])
+    assert not matcher.ignored("a.py")
+    assert matcher.ignored("#notes")
+    assert not IgnoreMatcher([]).ignored("a.py")
+
+
+def test_walk_workspace_prunes_ignored_directories(tmp_path):
+    for rel_path in ["a.py", "a.log", "build/out.py", "pkg/b.py", "pkg/keep.log"]:
+        os.makedirs(tmp_path / os.path.dirname(rel_path), exist_ok=True)
+        (tmp_path / rel_path).write_text("")
+    os.makedirs(tmp_path / "empty")
+    paths, dirs = walk_workspace(str(tmp_path), IgnoreMatcher(["build/", "*.log", "!keep.log"]), with_dirs=True)
+    assert sorted(p.replace(os.sep, "/") for p in paths) == ["a.py", "empty", "pkg", "pkg/b.py", "pkg/keep.log"]
+    assert dirs == {"empty", "pkg"}
+
+
+def test_files_inside_a_directory_pattern_can_be_re_included():
+    matcher = IgnoreMatcher(["logs/**", "!logs/keep.txt"])
+    assert matcher.ignored("logs/a.txt")
+    assert not matcher.ignored("logs/keep.txt")
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import shlex
+import sys
+import pytest
+from agents.verify import Verifier, check_file
+
+FILES = {
+    "app/__init__.py": "",
+    "app/models.py": "class User:\n    pass\n\nVERSION = 1\n",
+    "app/views.py": "from .models import User\nfrom . import models\nimport app.models\nimport os, json\n",
+    "app/dynamic.py": "def __getattr__(name):\n    return name\n",
+    "main.py": "from app.models import User, VERSION\nfrom app.dynamic import anything\n",
+}
+
+
+def write(workspace, rel_path, content):
+    path = workspace / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "code"
+    for rel_path, content in FILES.items():
+        write(root, rel_path, content)
+    return root
+
+
+def make_verifier(workspace, **kwargs):
+    return Verifier(str(workspace), str(workspace.parent / "verify.json"), **kwargs)
+
+
+def verify(verifier, *args, **kwargs):
+    async def run():
+        try:
+            return await verifier.verify(*args, **kwargs)
+        finally:
+            verifier.close()
+    return asyncio.run(run())
+
+
+def test_valid_files_pass(workspace):
+    result = verify(make_verifier(workspace), list(FILES) + ["README.md"])
+    assert result["ok"] and result["problems"] == [] and result["checked"] == len(FILES)
+    assert result["tests"] == "skipped"
+
+
+def test_compile_errors_are_reported(workspace):
+    write(workspace, "broken.py", "def f(:\n    pass\n")
+    write(workspace, "outside.py", "return 1\n")
+    result = verify(make_verifier(workspace), ["broken.py", "outside.py"])
+    assert not result["ok"]
+    assert result["problems"][0].startswith("broken.py: line 1: SyntaxError")
+    assert result["problems"][1].startswith("outside.py: line 1: SyntaxError")
+
+
+def test_missing_workspace_modules_and_names_are_reported(workspace):
+    write(workspace, "main.py", "from app.models import User, Missing\nimport app.services\nfrom .. import nothing\nimport requests\n")
+    problems = verify(make_verifier(workspace), ["main.py"])["problems"]
+    assert problems == [
+        "main.py: line 2: No module named 'app.services' in the workspace",
+        "main.py: line 1: cannot import name 'Missing' from 'app.models' (app/models.py)",
+    ]
+
+
+def test_relative_imports_are_resolved_against_their_package(workspace):
+    write(workspace, "app/views.py", "from .models import Missing\nfrom .forms import Form\nfrom . import models, helpers\n")
+    problems = verify(make_verifier(workspace), ["app/views.py"])["problems"]
+    assert problems == [
+        "app/views.py: line 2: No module named 'app.forms' in the workspace",
+        "app/views.py: line 1: cannot import name 'Missing' from 'app.models' (app/models.py)",
+        "app/views.py: line 3: cannot import name 'helpers' from 'app' (app/__init__.py)",
+    ]
+
+
+def test_src_layout_is_a_source_root(workspace):
+    write(workspace, "src/lib/core.py", "VALUE = 1\n")
+    write(workspace, "src/lib/__init__.py", "from .core import VALUE, OTHER\n")
+    write(workspace, "use.py", "from lib.core import VALUE\n")
+    problems = verify(make_verifier(workspace), ["use.py", "src/lib/__init__.py"])["problems"]
+    assert problems == ["src/lib/__init__.py: line 1: cannot import name 'OTHER' from 'lib.core' (src/lib/core.py)"]
+
+
+def test_pending_modules_are_not_reported(workspace):
+    write(workspace, "main.py", "from app.services import Service\nimport app.jobs.queue\nfrom app import forms\n")
+    pending = {"app/services.py", "app/jobs/queue.py", "app/forms/__init__.py"}
+    assert verify(make_verifier(workspace), ["main.py"], pending=pending)["ok"]
+    assert len(verify(make_verifier(workspace), ["main.py"])["problems"]) == 3
+
+
+def test_optional_imports_are_not_reported(workspace):
+    write(workspace, "main.py", "try:\n    from app.speedups import fast\nexcept ImportError:\n    fast = None\n"
+                                "try:\n    import app.extra\nexcept (ValueError, ModuleNotFoundError):\n    pass\n"
+                                "try:\n    import app.required\nexcept ValueError:\n    pass\n")
+    assert verify(make_verifier(workspace), ["main.py"])["problems"] == [
+        "main.py: line 10: No module named 'app.required' in the workspace"]
+
+
+def test_module_level_names_include_conditional_definitions(workspace):
+    write(workspace, "app/compat.py", "import sys\nif sys.version_info >= (3, 11):\n    import tomllib as toml\nelse:\n    toml = None\n"
+                                      "try:\n    from json import loads\nexcept ImportError:\n    def loads(s):\n        return s\n")
+    write(workspace, "main.py", "from app.compat import toml, loads, sys\n")
+    assert verify(make_verifier(workspace), ["main.py"])["ok"]
+    assert check_file(str(workspace / "app/compat.py"))["names"] == ["loads", "sys", "toml"]
+
+
+def test_provisional_imports_are_kept_apart(workspace):
+    write(workspace, "main.py", "from app.services import Service\n")
+    result = verify(make_verifier(workspace, test_command="exit 1"), ["main.py"], provisional_imports=True)
+    assert result["ok"] and result["problems"] == []
+    assert result["provisional"] == ["main.py: line 1: No module named 'app.services' in the workspace"]
+    assert result["tests"] == "skipped"
+
+
+def test_test_command_runs_when_the_checks_pass(workspace):
+    python = shlex.quote(sys.executable)
+    result = verify(make_verifier(workspace, test_command=f"{python} -c 'print(1)'"), ["main.py"])
+    assert result["ok"] and result["tests"] == "passed"
+    failing = f"{python} -c 'import sys; print(\"boom\"); sys.exit(3)'"
+    result = verify(make_verifier(workspace, test_command=failing), ["main.py"])
+    assert not result["ok"] and result["tests"] == "failed"
+    assert "failed with exit code 3" in result["problems"][0] and "boom" in result["problems"][0]
+    assert verify(make_verifier(workspace, test_command=failing), ["main.py"], run_tests=False)["tests"] == "skipped"
+    slow = make_verifier(workspace, test_command=f"{python} -c 'import time; time.sleep(5)'", test_timeout=0.2)
+    assert "timed out" in verify(slow, ["main.py"])["problems"][0]
+
+
+def test_results_are_cached_by_content(workspace):
+    verifier = make_verifier(workspace)
+    verify(verifier, ["main.py"])
+    with open(verifier.cache_path) as f:
+        cached = json.load(f)["files"]
+    assert len(cached) == 3  # main.py and the two modules it imports names from
+    reloaded = make_verifier(workspace)
+    assert reloaded.cache == cached
+    write(workspace, "main.py", "def f(:\n")
+    assert not verify(reloaded, ["main.py"])["ok"]
+    assert len(reloaded.cache) == 4
+
+
+def test_many_files_are_checked_in_a_process_pool(workspace):
+    for i in range(4):
+        write(workspace, f"pkg/mod{i}.py", f"from app.models import User\nVALUE = {i}\n" if i else "def f(:\n")
+    verifier = make_verifier(workspace, max_workers=2, parallel_threshold=2)
+    result = verify(verifier, [f"pkg/mod{i}.py" for i in range(4)])
+    assert result["checked"] == 4 and len(result["problems"]) == 1
+    assert result["problems"][0].startswith("pkg/mod0.py: line 1: SyntaxError")
+    assert verifier.pool is None